@@ -1,15 +1,55 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
 import app_managers.core.types as types
 import app_managers.helpers as helpers
 import yaml
 
+LOGGER = logging.getLogger(__name__)
+
+# The libyaml based loader is many times faster for large definitions files. PyYAML falls back to the
+# pure python loader if it was built without libyaml.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+DEFINITION_FILE_EXTENSIONS = (".yaml", ".yml")
+
+
+def load_yaml_file(file_path: str):
+    with open(file_path, "r") as yaml_file:
+        output = yaml.load(yaml_file, Loader=YAML_LOADER)
+    helpers.env_parse_replace(output)
+    return output
+
+
+# The definitions could either be a single file or a directory of definition files (for example one per team).
+def find_definition_files(def_yaml_path: str) -> List[str]:
+    if not os.path.isdir(def_yaml_path):
+        return [def_yaml_path]
+    output = sorted(
+        os.path.join(def_yaml_path, item)
+        for item in os.listdir(def_yaml_path)
+        if item.endswith(DEFINITION_FILE_EXTENSIONS) and os.path.isfile(os.path.join(def_yaml_path, item))
+    )
+    if not output:
+        raise Exception("No definition files were found in the directory " + def_yaml_path)
+    return output
+
+
+# Multiple definition files are parsed in parallel worker processes, as YAML parsing is CPU bound.
+def load_definition_files(def_files: List[str]) -> List[Tuple[str, Dict]]:
+    if len(def_files) == 1:
+        return [(def_files[0], load_yaml_file(def_files[0]))]
+    with ProcessPoolExecutor(max_workers=min(len(def_files), os.cpu_count() or 1)) as executor:
+        return list(zip(def_files, executor.map(load_yaml_file, def_files)))
+
 
 def initialize(
-    config_yaml_path: str, def_yaml_path: str, generate_def_yaml: bool = False
+    config_yaml_path: str, def_yaml_path: str, generate_def_yaml: bool = False, scope: types.CSMScope = None
 ) -> types.CSMYAMLConfigBundle:
-    print("Trying to parse Configuration File: " + config_yaml_path)
-    with open(config_yaml_path, "r") as config_file:
-        csm_config = yaml.safe_load(config_file)
-    helpers.env_parse_replace(csm_config)
+    scope = scope if scope else types.CSMScope()
+    LOGGER.info("Trying to parse Configuration File: %s", config_yaml_path)
+    csm_config = load_yaml_file(config_yaml_path)
 
     temp = csm_config["configs"]["ccloud_configs"]
     csm_ccloud_configs = types.CSMYAMLCCloudConfigs(
@@ -25,8 +65,20 @@ def initialize(
         if "detect_ignore_ccloud_internal_accounts" in temp
         else False,
         enable_sa_cleanup=temp["enable_sa_cleanup"] if "enable_sa_cleanup" in temp else False,
+        enable_sa_cascade_delete=temp.get("enable_sa_cascade_delete", False),
+        sa_cascade_delete_batch_size=int(temp.get("sa_cascade_delete_batch_size", 100)),
         enable_api_key_cleanup=temp["enable_api_key_cleanup"] if "enable_api_key_cleanup" in temp else False,
+        enable_rest_proxy_user_cleanup=temp.get("enable_rest_proxy_user_cleanup", False),
         old_api_keys_deletion_wait_mins=temp.get("old_api_keys_deletion_wait_mins", 30),
+        rest_proxy_secret_shards=int(temp.get("rest_proxy_secret_shards", 1)),
+        enable_columnar_api_key_inventory=temp.get("enable_columnar_api_key_inventory", False),
+        inventory_db_path=temp.get("inventory_db_path", None),
+        api_key_rotation_max_age_days=int(temp.get("api_key_rotation_max_age_days", 0)),
+        api_key_rotation_wave_size=int(temp.get("api_key_rotation_wave_size", 10)),
+        api_key_rotation_wave_interval_secs=int(temp.get("api_key_rotation_wave_interval_secs", 60)),
+        api_key_rotation_grace_period_secs=int(temp.get("api_key_rotation_grace_period_secs", 300)),
+        plan_max_calls=int(temp.get("plan_max_calls", 0)),
+        plan_max_eta_mins=float(temp.get("plan_max_eta_mins", 0)),
     )
 
     temp = csm_config["configs"]["secret_store"]
@@ -36,39 +88,76 @@ def initialize(
         configs=temp["configs"],
         prefix=temp.get("prefix", ""),
         separator=temp.get("separator", "/"),
+        value_cache_max_entries=int(temp.get("value_cache_max_entries", 256)),
+        value_cache_ttl_secs=int(temp.get("value_cache_ttl_secs", 300)),
+        metadata_snapshot_path=temp.get("metadata_snapshot_path", ""),
+        metadata_full_sweep_hours=float(temp.get("metadata_full_sweep_hours", 24)),
     )
 
     csm_configs = types.CSMYAMLConfigs(ccloud=csm_ccloud_configs, secretstore=csm_secret_store_configs)
 
     if not generate_def_yaml:
-        print("Trying to parse Definitions File: " + def_yaml_path)
-        with open(def_yaml_path, "r") as definitions_file:
-            input_definition = yaml.safe_load(definitions_file)
-        helpers.env_parse_replace(input_definition)
-
+        def_files = find_definition_files(def_yaml_path)
+        LOGGER.info("Trying to parse Definitions File(s): %s", ", ".join(def_files))
         csm_definitions = types.CSMYAMLDefinitions()
-        for item in input_definition["service_accounts"]:
-            rp_user = item.get("is_rest_proxy_user", False)
-            rp_access = item.get("enable_rest_proxy_access", False)
-            if (rp_access or rp_user) and not csm_configs.ccloud.rest_proxy_secret_name:
-                raise Exception(
-                    "rest_proxy_secret_name is required in secret configuration if enable_rest_proxy_access or is_rest_proxy_user is turned on in definitions."
-                )
-            csm_sa = types.CSMYAMLServiceAccounts(
-                name=item["name"],
-                description=item["description"],
-                email_address=item.get("team_email_address", None),
-                cluster_list=item["api_key_access"],
-                is_rp_user=rp_user,
-                rp_access=True if rp_user else rp_access,
-            )
-            csm_definitions.add_service_account(csm_sa=csm_sa)
-        return types.CSMYAMLConfigBundle(csm_configs=csm_configs, csm_definitions=csm_definitions)
+        sa_sources: Dict[str, str] = {}
+        for def_file, input_definition in load_definition_files(def_files):
+            for item in (input_definition or {}).get("service_accounts", None) or []:
+                if item["name"] in sa_sources:
+                    raise Exception(
+                        f"Service Account {item['name']} is defined in both {sa_sources[item['name']]} and {def_file}."
+                    )
+                sa_sources[item["name"]] = def_file
+                add_service_account_definition(csm_configs, csm_definitions, item)
+        LOGGER.info("Parsed %s Service Account definition(s).", len(csm_definitions.sa))
+        apply_scope(csm_definitions, scope)
+        return types.CSMYAMLConfigBundle(csm_configs=csm_configs, csm_definitions=csm_definitions, csm_scope=scope)
     else:
-        print("Not parsing Definitions file as generate flag is turned on.")
-        return types.CSMYAMLConfigBundle(csm_configs=csm_configs, csm_definitions=None)
+        LOGGER.info("Not parsing Definitions file as generate flag is turned on.")
+        return types.CSMYAMLConfigBundle(csm_configs=csm_configs, csm_definitions=None, csm_scope=scope)
+
+
+# Drops the Service Accounts outside the scope from the definitions. The REST Proxy users are added to the scope
+# if any Service Account in scope needs REST Proxy access, as their REST Proxy secrets carry its API Keys.
+def apply_scope(csm_definitions: types.CSMYAMLDefinitions, scope: types.CSMScope):
+    if scope.is_scoped():
+        LOGGER.info("Run is scoped to %s", scope)
+    if not scope.limits_sa():
+        return
+    for item in scope.sa_names:
+        if item not in csm_definitions.sa:
+            LOGGER.warning("Service Account %s is in scope but not in the definitions.", item)
+    if scope.adds_rest_proxy_users and any(v.rp_access for k, v in csm_definitions.sa.items() if k in scope.sa_names):
+        scope.sa_names.extend(
+            [v.name for v in csm_definitions.sa.values() if v.is_rp_user and v.name not in scope.sa_names]
+        )
+    csm_definitions.sa = {k: v for k, v in csm_definitions.sa.items() if scope.includes_sa(k)}
+    LOGGER.info("%s Service Account definition(s) in scope.", len(csm_definitions.sa))
+
+
+def add_service_account_definition(
+    csm_configs: types.CSMYAMLConfigs, csm_definitions: types.CSMYAMLDefinitions, item: Dict
+):
+    rp_user = item.get("is_rest_proxy_user", False)
+    rp_access = item.get("enable_rest_proxy_access", False)
+    if (rp_access or rp_user) and not csm_configs.ccloud.rest_proxy_secret_name:
+        raise Exception(
+            "rest_proxy_secret_name is required in secret configuration if enable_rest_proxy_access or is_rest_proxy_user is turned on in definitions."
+        )
+    csm_sa = types.CSMYAMLServiceAccounts(
+        name=item["name"],
+        description=item["description"],
+        email_address=item.get("team_email_address", None),
+        cluster_list=item["api_key_access"],
+        is_rp_user=rp_user,
+        rp_access=True if rp_user else rp_access,
+    )
+    csm_definitions.add_service_account(csm_sa=csm_sa)
 
 
 if __name__ == "__main__":
+    import app_managers.logger as CSMLogger
+
+    CSMLogger.setup_logging()
     csm_bundle = initialize("config.yaml", "definitions.yaml")
-    print("")
+    LOGGER.info("Parsed %d Service Account definition(s).", len(csm_bundle.csm_definitions.sa))
@@ -1,8 +1,10 @@
+import hashlib
 from dataclasses import dataclass, field
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 from app_managers.helpers import check_pair
 from app_managers.helpers import pretty as pp
+from app_managers.inventory_store import CSMInventoryStore
 
 
 class SupportedSecretStores:
@@ -31,12 +33,38 @@ class CSMYAMLCCloudConfigs:
     ignore_service_account_list: List[str] = field(default_factory=list)
     detect_ignore_ccloud_internal_accounts: bool = False
     enable_sa_cleanup: bool = False
+    enable_sa_cascade_delete: bool = False
+    sa_cascade_delete_batch_size: int = 100
     enable_api_key_cleanup: bool = False
+    enable_rest_proxy_user_cleanup: bool = False
     old_api_keys_deletion_wait_mins: int = 30
+    rest_proxy_secret_shards: int = 1
+    enable_columnar_api_key_inventory: bool = False
+    inventory_db_path: str = None
+    # 0 turns the API Key rotation off.
+    api_key_rotation_max_age_days: int = 0
+    api_key_rotation_wave_size: int = 10
+    api_key_rotation_wave_interval_secs: int = 60
+    api_key_rotation_grace_period_secs: int = 300
+    # Ceilings for the estimated plan of a run. 0 turns a ceiling off.
+    plan_max_calls: int = 0
+    plan_max_eta_mins: float = 0
 
     def __post_init__(self) -> None:
         check_pair("api_key", self.api_key, "api_secret", self.api_secret)
         check_pair("ccloud_user", self.ccloud_user, "ccloud_password", self.ccloud_password)
+        if self.rest_proxy_secret_shards < 1:
+            raise Exception("rest_proxy_secret_shards must be a positive integer.")
+        if self.sa_cascade_delete_batch_size < 1:
+            raise Exception("sa_cascade_delete_batch_size must be a positive integer.")
+        if self.api_key_rotation_max_age_days < 0:
+            raise Exception("api_key_rotation_max_age_days cannot be negative.")
+        if self.api_key_rotation_wave_size < 1:
+            raise Exception("api_key_rotation_wave_size must be a positive integer.")
+        if self.api_key_rotation_wave_interval_secs < 0:
+            raise Exception("api_key_rotation_wave_interval_secs cannot be negative.")
+        if self.api_key_rotation_grace_period_secs < 0:
+            raise Exception("api_key_rotation_grace_period_secs cannot be negative.")
 
 
 @dataclass(kw_only=True)
@@ -46,8 +74,15 @@ class CSMYAMLSecretStoreConfigs:
     configs: dict = field(default_factory=dict)
     prefix: str = field(default="")
     separator: str = field(default="/")
+    value_cache_max_entries: int = field(default=256)
+    value_cache_ttl_secs: int = field(default=300)
+    # The metadata of the secrets (never the values) is kept in this file between runs, if set.
+    metadata_snapshot_path: str = field(default="")
+    metadata_full_sweep_hours: float = field(default=24)
 
     def __post_init__(self) -> None:
+        if self.metadata_full_sweep_hours < 0:
+            raise Exception("metadata_full_sweep_hours cannot be negative.")
         temp, store_enabled = SUPPORTED_STORES.validate_store(self.store_type)
         if store_enabled:
             self.store_type = temp
@@ -90,24 +125,80 @@ class CSMYAMLServiceAccounts:
     rp_access: bool = field(default=False)
 
 
+# The Service Accounts are keyed by their name, which is the primary key for the definitions.
 @dataclass
 class CSMYAMLDefinitions:
-    sa: List[CSMYAMLServiceAccounts] = field(default_factory=list)
+    sa: Dict[str, CSMYAMLServiceAccounts] = field(default_factory=dict)
 
     def __str__(self) -> str:
         pp.pprint(self.sa)
 
     def add_service_account(self, csm_sa: CSMYAMLServiceAccounts):
-        self.sa.append(csm_sa)
+        if csm_sa.name in self.sa:
+            raise Exception(f"Service Account {csm_sa.name} is defined more than once in the definitions.")
+        self.sa[csm_sa.name] = csm_sa
 
     def find_service_account(self, sa_name: str):
-        for item in self.sa:
-            if item.name == sa_name:
-                return item
-        return None
+        return self.sa.get(sa_name, None)
+
+
+# Stable partition of a name (the same on every host and Python process, unlike hash()) into one of the shards.
+def find_shard_index(value: str, shards_count: int) -> int:
+    return int.from_bytes(hashlib.sha256(value.encode("utf-8")).digest()[:8], "big") % shards_count
+
+
+# Limits a run to a subset of the environments, clusters and Service Accounts. An empty list means no limit.
+# Nothing outside the scope is loaded from CCloud or the Secret Store, so it is never a deletion candidate either.
+@dataclass(kw_only=True)
+class CSMScope:
+    env_ids: List[str] = field(default_factory=list)
+    cluster_ids: List[str] = field(default_factory=list)
+    sa_names: List[str] = field(default_factory=list)
+    # (shard index, shards count): only the clusters whose ID falls in the shard are in scope.
+    cluster_shard: Tuple[int, int] = None
+    # The REST Proxy users are added to a Service Account scope if an SA in scope has REST Proxy access. The shards
+    # of a sharded run leave the REST Proxy secrets to the cluster shards, so they do not need them.
+    adds_rest_proxy_users: bool = True
+
+    def __str__(self) -> str:
+        output = [
+            f"{k}: {', '.join(v)}"
+            for k, v in (("Environments", self.env_ids), ("Clusters", self.cluster_ids), ("SAs", self.sa_names))
+            if v
+        ]
+        if self.cluster_shard:
+            output.append(f"Cluster shard: {self.cluster_shard[0] + 1}/{self.cluster_shard[1]}")
+        return ", ".join(output)
+
+    def is_scoped(self) -> bool:
+        return self.limits_clusters() or self.limits_sa()
+
+    def limits_clusters(self) -> bool:
+        return bool(self.env_ids or self.cluster_ids or self.cluster_shard)
+
+    def limits_sa(self) -> bool:
+        return bool(self.sa_names)
+
+    def includes_env(self, env_id: str) -> bool:
+        return not self.env_ids or env_id in self.env_ids
+
+    def includes_cluster(self, cluster_id: str) -> bool:
+        if self.cluster_shard and find_shard_index(cluster_id, self.cluster_shard[1]) != self.cluster_shard[0]:
+            return False
+        return not self.cluster_ids or cluster_id in self.cluster_ids
+
+    def includes_sa(self, sa_name: str) -> bool:
+        return not self.sa_names or sa_name in self.sa_names
 
 
 @dataclass(kw_only=True)
 class CSMYAMLConfigBundle:
     csm_definitions: CSMYAMLDefinitions
     csm_configs: CSMYAMLConfigs
+    csm_scope: CSMScope = field(default_factory=CSMScope)
+    # The SQLite copy of the inventory, if inventory_db_path is set in the configurations.
+    inventory_store: CSMInventoryStore = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.csm_configs.ccloud.inventory_db_path:
+            self.inventory_store = CSMInventoryStore(self.csm_configs.ccloud.inventory_db_path)
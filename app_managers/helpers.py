@@ -1,8 +1,10 @@
+import logging
 import pprint
 from os import environ
 
 ENV_PREFIX = "env::"
 pretty = pprint.PrettyPrinter(indent=2)
+LOGGER = logging.getLogger(__name__)
 
 
 def get_env_var(var_name: str):
@@ -47,7 +49,7 @@ def check_pair(key1Name, key1Value, key2Name, key2Value):
 
 
 def printline():
-    print("=" * 80)
+    LOGGER.info("=" * 80)
 
 
 if __name__ == "__main__":
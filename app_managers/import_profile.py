@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app_managers.helpers import printline
+
+# The modules that every phase of a run imports, in the order that the phases run. Every phase is measured on
+# top of the phases before it, so a module is only charged to the first phase that imports it.
+PHASE_MODULES: Dict[str, List[str]] = {
+    "argument parsing": ["argparse", "app_managers.helpers"],
+    "configuration": ["app_managers.core.initializers"],
+    "ccloud inventory": ["ccloud_managers.initializers"],
+    "secret store": ["secret_managers.aws_secrets_manager"],
+    "workflows": ["app_managers.workflow_manager.workflows"],
+    "definitions generator": ["app_managers.workflow_manager.generate_definitions"],
+}
+
+
+@dataclass(kw_only=True)
+class CSMImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass(kw_only=True)
+class CSMPhaseImportProfile:
+    phase: str
+    modules: List[CSMImportTime] = field(default_factory=list)
+    error_message: str = field(default="")
+
+    def total_us(self) -> int:
+        return sum([v.self_us for v in self.modules])
+
+
+# Parses the stderr output of "python -X importtime". Every line looks like
+# "import time:       412 |       1023 |   yaml.composer" where the module name is indented by its nesting depth.
+def parse_importtime_output(output: str) -> List[CSMImportTime]:
+    result = []
+    for item in output.splitlines():
+        if not item.startswith("import time:"):
+            continue
+        parts = item[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        result.append(
+            CSMImportTime(
+                module=name.strip(),
+                self_us=int(parts[0]),
+                cumulative_us=int(parts[1]),
+                depth=(len(name) - len(name.lstrip())) // 2,
+            )
+        )
+    return result
+
+
+# Every phase is imported in a fresh interpreter so the numbers are the cold import cost, which is what a CI/CD
+# invocation pays. The modules already imported by the earlier phases are imported first and left out of the report.
+def profile_phase(phase: str, modules: List[str], preloaded: List[str]) -> CSMPhaseImportProfile:
+    code = ";".join([f"import {v}" for v in preloaded] + ["import sys", "sys.stderr.write('--- phase ---\\n')"])
+    code += ";" + ";".join([f"import {v}" for v in modules])
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=project_root
+    )
+    _, _, phase_output = result.stderr.partition("--- phase ---\n")
+    output = CSMPhaseImportProfile(phase=phase, modules=parse_importtime_output(phase_output))
+    if result.returncode != 0:
+        output.error_message = result.stderr.strip().splitlines()[-1]
+    return output
+
+
+def print_import_profile(top_n: int = 25) -> int:
+    profiles: List[CSMPhaseImportProfile] = []
+    preloaded: List[str] = []
+    for phase, modules in PHASE_MODULES.items():
+        profiles.append(profile_phase(phase, modules, preloaded))
+        preloaded.extend(modules)
+
+    printline()
+    print("{:<25} {:>10} {:>10}".format("Phase", "Modules", "Time(ms)"))
+    for item in profiles:
+        print("{:<25} {:>10} {:>10.1f}".format(item.phase, len(item.modules), item.total_us() / 1000))
+        if item.error_message:
+            print(f"    Error: {item.error_message}")
+    print("{:<25} {:>10} {:>10.1f}".format("Total", "", sum([v.total_us() for v in profiles]) / 1000))
+
+    printline()
+    print(f"Top {top_n} modules by cumulative import time:")
+    print("{:<25} {:<55} {:>10} {:>10}".format("Phase", "Module", "Self(ms)", "Cumul(ms)"))
+    all_modules = [(p.phase, m) for p in profiles for m in p.modules]
+    for phase, item in sorted(all_modules, key=lambda v: v[1].cumulative_us, reverse=True)[:top_n]:
+        print(
+            "{:<25} {:<55} {:>10.1f} {:>10.1f}".format(
+                phase, item.module, item.self_us / 1000, item.cumulative_us / 1000
+            )
+        )
+    printline()
+    return 1 if [v for v in profiles if v.error_message] else 0
@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+from typing import Iterable, List, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS environments (env_id TEXT PRIMARY KEY, display_name TEXT, created_at TEXT);
+CREATE TABLE IF NOT EXISTS clusters (
+    cluster_id TEXT PRIMARY KEY, env_id TEXT, cluster_name TEXT, cloud TEXT, region TEXT
+);
+CREATE INDEX IF NOT EXISTS clusters_env_id ON clusters (env_id);
+CREATE TABLE IF NOT EXISTS service_accounts (
+    resource_id TEXT PRIMARY KEY, name TEXT, description TEXT, is_ignored INTEGER
+);
+CREATE INDEX IF NOT EXISTS service_accounts_name ON service_accounts (name);
+CREATE TABLE IF NOT EXISTS api_keys (api_key TEXT PRIMARY KEY, owner_id TEXT, cluster_id TEXT, created_epoch INTEGER);
+CREATE INDEX IF NOT EXISTS api_keys_owner_id_cluster_id ON api_keys (owner_id, cluster_id);
+CREATE INDEX IF NOT EXISTS api_keys_cluster_id ON api_keys (cluster_id);
+CREATE INDEX IF NOT EXISTS api_keys_created_epoch ON api_keys (created_epoch);
+CREATE TABLE IF NOT EXISTS secrets (
+    secret_name TEXT PRIMARY KEY, env_id TEXT, sa_id TEXT, sa_name TEXT, cluster_id TEXT, api_key TEXT, rp_shard_of TEXT
+);
+CREATE INDEX IF NOT EXISTS secrets_sa_id_cluster_id ON secrets (sa_id, cluster_id);
+CREATE INDEX IF NOT EXISTS secrets_sa_name ON secrets (sa_name);
+CREATE INDEX IF NOT EXISTS secrets_api_key ON secrets (api_key);
+"""
+# Table name -> primary key column.
+TABLES = {
+    "environments": "env_id",
+    "clusters": "cluster_id",
+    "service_accounts": "resource_id",
+    "api_keys": "api_key",
+    "secrets": "secret_name",
+}
+
+
+# Embedded SQLite copy of the CCloud inventory and the secret metadata (never the secret values), for the queries
+# between the runs with any SQLite client. The workflows keep reading the in-memory caches and their indexes, the
+# store is only written to.
+# The writes are buffered and applied with executemany in one transaction at the end of the run, so the ingest of
+# a large organization is a handful of bulk inserts instead of one statement per item.
+class CSMInventoryStore:
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        # The caches are updated from the worker threads of the workflows as well.
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        # The store is rebuilt from CCloud and the secret store on every run, so durability is not needed.
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.executescript(SCHEMA)
+        self.pending: List[Tuple[str, tuple]] = []
+
+    def __write(self, sql: str, params: tuple = ()):
+        with self.lock:
+            self.pending.append((sql, params))
+
+    # Applies the buffered writes in order. The consecutive writes with the same statement go in one executemany.
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, []
+            self.connection.execute("BEGIN")
+            try:
+                start = 0
+                for i in range(1, len(pending) + 1):
+                    if i == len(pending) or pending[i][0] != pending[start][0]:
+                        self.connection.executemany(pending[start][0], [v[1] for v in pending[start:i]])
+                        start = i
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def __check_table(self, table: str):
+        if table not in TABLES:
+            raise Exception(f"Unknown inventory store table {table}.")
+
+    # Replaces the content of the table with the rows, in the column order of the table.
+    def replace(self, table: str, rows: Iterable[tuple]):
+        self.__check_table(table)
+        self.__write(f"DELETE FROM {table}")
+        for item in rows:
+            self.upsert(table, item)
+
+    def upsert(self, table: str, row: tuple):
+        self.__check_table(table)
+        self.__write(f"INSERT OR REPLACE INTO {table} VALUES ({', '.join(['?'] * len(row))})", row)
+
+    def delete(self, table: str, key: str):
+        self.__write(f"DELETE FROM {table} WHERE {TABLES[table]} = ?", (key,))
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.connection.close()
@@ -0,0 +1,99 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# The loggers of the application packages. Everything else (boto3, urllib3, ...) stays at the root WARNING level.
+APP_LOGGERS = ["__main__", "app_managers", "ccloud_managers", "secret_managers"]
+LOG_LEVELS = ["debug", "info", "warning", "error"]
+LOG_FORMATS = ["text", "json"]
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+# The attributes every LogRecord has; anything else on a record came in through the extra argument.
+_RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__.keys()) | {"message", "asctime", "csm_stream"}
+
+_LISTENER: QueueListener = None
+_LISTENER_PID: int = None
+_LISTENER_LOCK = threading.Lock()
+
+
+# One JSON object per line with the message and the extra fields of the record.
+class CSMJsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        output = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **{k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS},
+        }
+        if record.exc_info:
+            output["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(output, default=str)
+
+
+# The records are written out by the listener thread, so the calling thread never waits on the output.
+# sys.stdout is captured when the record is queued, as the multi configuration and the server modes redirect it to
+# the log of the current run.
+class CSMQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        _ensure_listener()
+        # The message is only rendered for the records that pass the level check, but it is rendered here so that
+        # the listener never reads arguments that the caller changes afterwards.
+        record.msg, record.args = record.getMessage(), None
+        record.csm_stream = sys.stdout
+        return record
+
+
+class CSMStreamHandler(logging.StreamHandler):
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            stream = getattr(record, "csm_stream", None) or sys.stdout
+            stream.write(self.format(record) + self.terminator)
+            stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+# A forked worker process (multi configuration mode) inherits the handler but not the listener thread, so the first
+# record queued in every process starts a listener on a new queue.
+def _ensure_listener():
+    global _LISTENER, _LISTENER_PID
+    if _LISTENER_PID == os.getpid():
+        return
+    with _LISTENER_LOCK:
+        if _LISTENER_PID == os.getpid():
+            return
+        _QUEUE_HANDLER.queue = queue.Queue()
+        _LISTENER = QueueListener(_QUEUE_HANDLER.queue, _OUTPUT_HANDLER)
+        _LISTENER.start()
+        _LISTENER_PID = os.getpid()
+
+
+# Waits until every queued record is written. Called before a redirected output is closed.
+def flush_logs():
+    if _LISTENER_PID == os.getpid():
+        _QUEUE_HANDLER.queue.join()
+
+
+def _stop_listener():
+    if _LISTENER_PID == os.getpid():
+        _LISTENER.stop()
+
+
+_QUEUE_HANDLER = CSMQueueHandler(queue.Queue())
+_OUTPUT_HANDLER = CSMStreamHandler()
+_OUTPUT_HANDLER.setFormatter(logging.Formatter(TEXT_FORMAT))
+atexit.register(_stop_listener)
+
+
+def setup_logging(level: str = "info", log_format: str = "text"):
+    _OUTPUT_HANDLER.setFormatter(CSMJsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    if _QUEUE_HANDLER not in root.handlers:
+        root.addHandler(_QUEUE_HANDLER)
+    for item in APP_LOGGERS:
+        logging.getLogger(item).setLevel(level.upper())
@@ -0,0 +1,212 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Set
+
+# HTTP status codes (CCloud) and AWS error codes that mean "slow down" instead of a failed request.
+THROTTLING_STATUS_CODES = {429, 503}
+# A 503 could come after the request was processed, so a non idempotent request (a POST) is only retried on a 429.
+NON_IDEMPOTENT_THROTTLING_STATUS_CODES = {429}
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "Throttling",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "SlowDown",
+}
+MAX_RETRIES = 8
+BASE_BACKOFF_SECS = 0.5
+MAX_BACKOFF_SECS = 30.0
+MAX_CONCURRENCY = 32
+LOGGER = logging.getLogger(__name__)
+
+
+# Concurrency limiter for one endpoint with additive-increase/multiplicative-decrease control. Every call that
+# completes within the latency tolerance of the best latency seen so far grows the limit by about one slot per
+# "window" of calls; a throttle halves the limit and blocks the endpoint for the Retry-After period, while a call
+# that is much slower than the baseline (the service queueing the calls) shrinks the limit a little. The baseline is
+# a decaying minimum: a faster call lowers it at once, otherwise it rises by baseline_drift_per_min per minute of
+# wall time (not per call), so a service that got permanently slower is followed within minutes while a burst of
+# queued calls does not raise it.
+@dataclass(kw_only=True)
+class CSMAdaptiveLimiter:
+    endpoint: str
+    limit: float = 4.0
+    min_limit: float = 1.0
+    max_limit: float = float(MAX_CONCURRENCY)
+    throttle_decrease_factor: float = 0.5
+    latency_decrease_factor: float = 0.9
+    latency_tolerance: float = 3.0
+    baseline_drift_per_min: float = 0.1
+    in_flight: int = field(init=False, default=0)
+    blocked_until: float = field(init=False, default=0.0)
+    baseline_latency: float = field(init=False, default=None)
+    baseline_updated_at: float = field(init=False, default=0.0)
+    calls_count: int = field(init=False, default=0)
+    throttles_count: int = field(init=False, default=0)
+    total_latency: float = field(init=False, default=0.0)
+    condition: threading.Condition = field(init=False, default_factory=threading.Condition, repr=False)
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait_secs = self.blocked_until - time.monotonic()
+                if wait_secs <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self.condition.wait(timeout=wait_secs if wait_secs > 0 else None)
+
+    def release(self, latency: float, retry_after: float = None):
+        with self.condition:
+            self.in_flight -= 1
+            self.calls_count += 1
+            self.total_latency += latency
+            if retry_after is not None:
+                self.throttles_count += 1
+                self.limit = max(self.min_limit, self.limit * self.throttle_decrease_factor)
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            else:
+                now = time.monotonic()
+                if self.baseline_latency is None:
+                    self.baseline_latency = latency
+                else:
+                    drift = (1 + self.baseline_drift_per_min) ** ((now - self.baseline_updated_at) / 60)
+                    self.baseline_latency = min(latency, self.baseline_latency * drift)
+                self.baseline_updated_at = now
+                if latency > self.baseline_latency * self.latency_tolerance:
+                    self.limit = max(self.min_limit, self.limit * self.latency_decrease_factor)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+# The limiters are shared by everything in the process that calls the same endpoint, including the warm
+# daemon/server runs and multiple configurations with the same credentials.
+_LIMITERS: Dict[str, CSMAdaptiveLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(endpoint: str) -> CSMAdaptiveLimiter:
+    with _LIMITERS_LOCK:
+        if endpoint not in _LIMITERS:
+            _LIMITERS[endpoint] = CSMAdaptiveLimiter(endpoint=endpoint)
+        return _LIMITERS[endpoint]
+
+
+# Mean latency of the calls made so far to the endpoints that start with the prefix, or None if there was no call.
+def find_mean_latency(prefix: str) -> float:
+    limiters = [v for k, v in list(_LIMITERS.items()) if k.startswith(prefix) and v.calls_count]
+    calls_count = sum([v.calls_count for v in limiters])
+    return sum([v.total_latency for v in limiters]) / calls_count if calls_count else None
+
+
+# Current concurrency limit of the endpoint; the starting limit if the endpoint was not called yet.
+def find_limit(endpoint: str) -> float:
+    limiter = _LIMITERS.get(endpoint, None)
+    return limiter.limit if limiter else CSMAdaptiveLimiter(endpoint=endpoint).limit
+
+
+# Retry-After is either a number of seconds or an HTTP date.
+def parse_retry_after(value: str) -> float:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_secs(attempt: int) -> float:
+    return min(MAX_BACKOFF_SECS, BASE_BACKOFF_SECS * 2**attempt) * random.uniform(0.5, 1.0)
+
+
+# Returns the seconds to wait before retrying if the call was throttled, or None if it was not. Works with a
+# requests response (status code and headers) and with a botocore ClientError (error code and response headers),
+# without importing either of the SDKs.
+def find_retry_after(
+    result, error: Exception, attempt: int, throttling_status_codes: Set[int] = THROTTLING_STATUS_CODES
+) -> float:
+    if error is not None:
+        response = getattr(error, "response", None)
+        if not isinstance(response, dict) or response.get("Error", {}).get("Code", "") not in THROTTLING_ERROR_CODES:
+            return None
+        headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+    elif getattr(result, "status_code", None) in throttling_status_codes:
+        headers = result.headers
+    else:
+        return None
+    retry_after = parse_retry_after(headers.get("retry-after", None) or headers.get("Retry-After", None))
+    return retry_after if retry_after is not None else backoff_secs(attempt)
+
+
+# Runs the call through the limiter of the endpoint and retries it while it is throttled. Once the retries are
+# exhausted, the last throttling error is raised (or the last throttled response is returned) to the caller.
+def call(
+    endpoint: str, func: Callable, *args, throttling_status_codes: Set[int] = THROTTLING_STATUS_CODES, **kwargs
+):
+    limiter = get_limiter(endpoint)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        start = time.monotonic()
+        result, error = None, None
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            error = e
+        retry_after = find_retry_after(result, error, attempt, throttling_status_codes)
+        limiter.release(time.monotonic() - start, retry_after)
+        if retry_after is None or attempt >= MAX_RETRIES:
+            if error is not None:
+                raise error
+            return result
+        attempt += 1
+        LOGGER.warning("Throttled by %s. Retry %s/%s in %.1fs.", endpoint, attempt, MAX_RETRIES, retry_after)
+
+
+# Calls func for every item concurrently. func is expected to make its API calls through rate limited clients;
+# the thread pool is only an upper bound and the number of calls actually in flight is decided by the adaptive
+# limits of the endpoints that func calls. Results are returned in the order of the items.
+def map_concurrently(func: Callable, items: Iterable, max_workers: int = MAX_CONCURRENCY) -> List:
+    items = list(items)
+    if len(items) <= 1:
+        return [func(v) for v in items]
+    with ThreadPoolExecutor(max_workers=min(len(items), max_workers), thread_name_prefix="csm-worker") as executor:
+        return list(executor.map(func, items))
+
+
+# Proxy for an SDK client (for example a boto3 client) that routes every method call through the limiter of
+# "<prefix>:<method name>", as the AWS APIs are throttled per operation.
+class RateLimitedClient:
+    def __init__(self, client, prefix: str) -> None:
+        self._client = client
+        self._prefix = prefix
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def rate_limited_call(*args, **kwargs):
+            return call(f"{self._prefix}:{name}", attr, *args, **kwargs)
+
+        return rate_limited_call
+
+
+def print_limiter_summary():
+    throttled = [v for v in list(_LIMITERS.values()) if v.throttles_count]
+    if not throttled:
+        return
+    LOGGER.info("{:<60} {:>8} {:>10} {:>8}".format("Endpoint", "Calls", "Throttled", "Limit"))
+    for item in throttled:
+        LOGGER.info(
+            "{:<60} {:>8} {:>10} {:>8.1f}".format(item.endpoint, item.calls_count, item.throttles_count, item.limit)
+        )
@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+# The Service Account names and cluster IDs of the access matrices, each mapped to an index. The axes only grow, so
+# the matrices built in different phases of a run (and in different runs of a long running process) can be combined.
+class CSMAccessAxes:
+    def __init__(self) -> None:
+        self.sa_names: List[str] = []
+        self.sa_index: Dict[str, int] = {}
+        self.cluster_ids: List[str] = []
+        self.cluster_index: Dict[str, int] = {}
+
+    def find_sa_index(self, sa_name: str) -> int:
+        index = self.sa_index.get(sa_name, None)
+        if index is None:
+            index = self.sa_index[sa_name] = len(self.sa_names)
+            self.sa_names.append(sa_name)
+        return index
+
+    def find_cluster_index(self, cluster_id: str) -> int:
+        index = self.cluster_index.get(cluster_id, None)
+        if index is None:
+            index = self.cluster_index[cluster_id] = len(self.cluster_ids)
+            self.cluster_ids.append(cluster_id)
+        return index
+
+    # A row with the bits of the clusters set.
+    def create_row(self, cluster_ids: Iterable[str]) -> int:
+        row = 0
+        for item in cluster_ids:
+            row |= 1 << self.find_cluster_index(item)
+        return row
+
+    def find_cluster_ids(self, row: int) -> Iterator[str]:
+        while row:
+            lowest = row & -row
+            yield self.cluster_ids[lowest.bit_length() - 1]
+            row ^= lowest
+
+
+# A Service Account x cluster bitset: one integer row per Service Account (by its index in the axes) with a bit per
+# cluster. Only the non empty rows are kept, so a matrix costs one small integer per Service Account with access
+# instead of one "SA_NAME~CLUSTER_ID" string per pair, and the set operations are bitwise operations on the rows.
+# The pairs are iterated in the order of the axes.
+class CSMAccessMatrix:
+    def __init__(self, axes: CSMAccessAxes, rows: Dict[int, int] = None) -> None:
+        self.axes = axes
+        self.rows: Dict[int, int] = rows if rows is not None else {}
+
+    def add(self, sa_name: str, cluster_id: str):
+        self.add_row(sa_name, 1 << self.axes.find_cluster_index(cluster_id))
+
+    def add_row(self, sa_name: str, row: int):
+        if row:
+            index = self.axes.find_sa_index(sa_name)
+            self.rows[index] = self.rows.get(index, 0) | row
+
+    def find_row(self, sa_name: str) -> int:
+        index = self.axes.sa_index.get(sa_name, None)
+        return self.rows.get(index, 0) if index is not None else 0
+
+    def __contains__(self, item: Tuple[str, str]) -> bool:
+        cluster_index = self.axes.cluster_index.get(item[1], None)
+        return cluster_index is not None and bool(self.find_row(item[0]) >> cluster_index & 1)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for k in sorted(self.rows):
+            sa_name = self.axes.sa_names[k]
+            for cluster_id in self.axes.find_cluster_ids(self.rows[k]):
+                yield sa_name, cluster_id
+
+    def __len__(self) -> int:
+        return sum([v.bit_count() for v in self.rows.values()])
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def __and__(self, other: "CSMAccessMatrix") -> "CSMAccessMatrix":
+        rows = {k: v & other.rows.get(k, 0) for k, v in self.rows.items()}
+        return CSMAccessMatrix(self.axes, {k: v for k, v in rows.items() if v})
+
+    def __or__(self, other: "CSMAccessMatrix") -> "CSMAccessMatrix":
+        rows = dict(self.rows)
+        for k, v in other.rows.items():
+            rows[k] = rows.get(k, 0) | v
+        return CSMAccessMatrix(self.axes, rows)
+
+    # The pairs of this matrix that are not in the other one.
+    def __sub__(self, other: "CSMAccessMatrix") -> "CSMAccessMatrix":
+        rows = {k: v & ~other.rows.get(k, 0) for k, v in self.rows.items()}
+        return CSMAccessMatrix(self.axes, {k: v for k, v in rows.items() if v})
+
+    def without_sa_names(self, sa_names: Iterable[str]) -> "CSMAccessMatrix":
+        excluded = set([self.axes.sa_index[v] for v in sa_names if v in self.axes.sa_index])
+        return CSMAccessMatrix(self.axes, {k: v for k, v in self.rows.items() if k not in excluded})
+
+    # The pairs of the matrix for one cluster only.
+    def find_cluster_column(self, cluster_id: str) -> "CSMAccessMatrix":
+        cluster_index = self.axes.cluster_index.get(cluster_id, None)
+        if cluster_index is None:
+            return CSMAccessMatrix(self.axes)
+        mask = 1 << cluster_index
+        return CSMAccessMatrix(self.axes, {k: mask for k, v in self.rows.items() if v & mask})
+
+    def find_sa_names(self, cluster_id: str) -> List[str]:
+        return [v for v, _ in self.find_cluster_column(cluster_id)]
@@ -0,0 +1,179 @@
+import logging
+import os
+import signal
+import time
+from argparse import Namespace
+from dataclasses import dataclass, field
+from hashlib import sha256
+from typing import Dict, List
+
+import app_managers.core.initializers as CSMInit
+import app_managers.core.types as CSMTypes
+import app_managers.workflow_manager.journal as RunJournal
+import app_managers.workflow_manager.main as WorkflowManager
+import ccloud_managers.initializers as CCloudInit
+from app_managers.helpers import printline
+from ccloud_managers.types import CCloudConfigBundle
+from secret_managers.types import CSMSecretsManager
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Polling based watcher for the configuration & definitions files. The file contents are hashed, so a change
+# is only reported if the content actually changed (and not for a touch or an editor re-saving the same file).
+@dataclass
+class CSMFileWatcher:
+    file_paths: List[str]
+    file_digests: Dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.changed_files()
+
+    # A definitions directory is digested as a whole, so adding, removing or editing any file in it is a change.
+    def __digest(self, file_path: str) -> str:
+        try:
+            digest = sha256()
+            for item in CSMInit.find_definition_files(file_path) if os.path.isdir(file_path) else [file_path]:
+                with open(item, "rb") as f:
+                    digest.update(item.encode("utf-8") + f.read())
+            return digest.hexdigest()
+        except Exception:
+            return ""
+
+    def changed_files(self) -> List[str]:
+        output = []
+        for item in self.file_paths:
+            digest = self.__digest(item)
+            if self.file_digests.get(item, None) != digest:
+                self.file_digests[item] = digest
+                output.append(item)
+        return output
+
+
+# Long running reconciler. The CCloud and Secret Store inventory is loaded once and kept warm in memory; it is
+# refreshed on an interval and the workflow phases are re-run against the warm caches whenever the definitions
+# or the configuration file changes. A configuration change could point to different credentials, so it triggers
+# a full reload, while a definitions change only swaps the parsed definitions.
+@dataclass(kw_only=True)
+class CSMReconcileDaemon:
+    args: Namespace
+    refresh_interval_secs: int = 300
+    poll_interval_secs: int = 5
+    csm_bundle: CSMTypes.CSMYAMLConfigBundle = field(init=False, default=None)
+    ccloud_bundle: CCloudConfigBundle = field(init=False, default=None)
+    secret_bundle: CSMSecretsManager = field(init=False, default=None)
+    journal: RunJournal.CSMRunJournal = field(init=False, default=None)
+    watcher: CSMFileWatcher = field(init=False)
+    last_refresh: float = field(init=False, default=0.0)
+    is_running: bool = field(init=False, default=True)
+
+    def __post_init__(self) -> None:
+        self.watcher = CSMFileWatcher(
+            file_paths=[self.args.csm_config_file_path, self.args.csm_definitions_file_path]
+        )
+
+    def load_all(self):
+        printline()
+        LOGGER.info("Loading the configurations and the complete inventory.")
+        self.csm_bundle = CSMInit.initialize(
+            self.args.csm_config_file_path,
+            self.args.csm_definitions_file_path,
+            scope=WorkflowManager.scope_from_args(self.args),
+        )
+        self.ccloud_bundle = CCloudInit.initialize(csm_bundle=self.csm_bundle)
+        self.secret_bundle = WorkflowManager.initialize_secret_bundle(
+            csm_bundle=self.csm_bundle, ccloud_bundle=self.ccloud_bundle
+        )
+        # The journal follows the configuration file, so it is opened again on a configuration change.
+        self.journal = RunJournal.open_run_journal(
+            journal_dir=self.args.csm_journal_dir,
+            config_file_path=self.args.csm_config_file_path,
+            ccloud_api_secret=self.csm_bundle.csm_configs.ccloud.api_secret,
+        )
+        self.last_refresh = time.monotonic()
+
+    def reload_definitions(self):
+        printline()
+        LOGGER.info("Definitions file changed. Reloading the definitions against the warm inventory.")
+        new_bundle = CSMInit.initialize(
+            self.args.csm_config_file_path, self.args.csm_definitions_file_path, scope=self.csm_bundle.csm_scope
+        )
+        # Only the definitions are swapped. The configs object is shared by the CCloud and Secret Store caches
+        # and also holds the internal Service Accounts detected while reading the inventory.
+        self.csm_bundle.csm_definitions = new_bundle.csm_definitions
+
+    # The CCloud list APIs have no filter on the last change, so the environments, clusters, Service Accounts and API
+    # Keys are listed again in full; a missed deletion would otherwise keep an API Key or a Service Account around.
+    # The secret store refresh only lists the secrets created since the last listing if metadata_snapshot_path is set,
+    # with a full listing every metadata_full_sweep_hours.
+    def refresh_inventory(self):
+        printline()
+        LOGGER.info("Refreshing the CCloud and Secret Store inventory.")
+        start = time.monotonic()
+        self.ccloud_bundle.refresh()
+        self.secret_bundle.refresh()
+        self.last_refresh = time.monotonic()
+        LOGGER.info("Inventory refreshed in %.1fs.", self.last_refresh - start)
+
+    # Runs the workflow phases against the warm caches. The dry run flag could be overridden per run. Every non dry
+    # run is journaled like a single run, so the API Keys created by a reconcile that died before their secrets
+    # were written are recovered with --resume.
+    def reconcile(self, dry_run: bool = None):
+        start = time.monotonic()
+        args = self.args if dry_run is None else Namespace(**{**vars(self.args), "dry_run": dry_run})
+        journal = None if args.dry_run else self.journal
+        if journal:
+            journal.start_run(ccloud_bundle=self.ccloud_bundle, resume=args.resume)
+        WorkflowManager.run_workflow_phases(
+            args=args,
+            csm_bundle=self.csm_bundle,
+            ccloud_bundle=self.ccloud_bundle,
+            secret_bundle=self.secret_bundle,
+            journal=journal,
+        )
+        if journal:
+            journal.finish_run()
+        printline()
+        LOGGER.info("Reconcile finished in %.1fs.", time.monotonic() - start)
+
+    def stop(self, *args):
+        LOGGER.info("Stop requested. The daemon will exit after the current step.")
+        self.is_running = False
+
+    # Brings the warm caches up to date: reloads for file changes and refreshes the inventory once it is older
+    # than the refresh interval. Returns True if the configuration or definitions file changed.
+    def sync(self) -> bool:
+        changed_files = self.watcher.changed_files()
+        if self.args.csm_config_file_path in changed_files:
+            LOGGER.info("Configuration file changed.")
+            self.load_all()
+            return True
+        elif self.args.csm_definitions_file_path in changed_files:
+            self.reload_definitions()
+            return True
+        elif time.monotonic() - self.last_refresh >= self.refresh_interval_secs:
+            self.refresh_inventory()
+        return False
+
+    # A single iteration of the daemon loop. Returns True if a reconcile was run.
+    def run_once(self) -> bool:
+        if self.sync():
+            self.reconcile()
+            return True
+        return False
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.load_all()
+        self.reconcile()
+        while self.is_running:
+            time.sleep(self.poll_interval_secs)
+            if not self.is_running:
+                break
+            try:
+                self.run_once()
+            except Exception:
+                # A failed step is retried on the next change or refresh; the warm caches are left as they were.
+                LOGGER.exception("Reconcile daemon step failed.")
+        LOGGER.info("Reconcile daemon stopped.")
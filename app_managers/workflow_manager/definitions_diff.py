@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import time
+from typing import Dict, List, Set
+
+import app_managers.core.initializers as CSMInit
+import app_managers.core.types as CSMTypes
+import app_managers.helpers as helpers
+import yaml
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The comparable form of the definitions: Service Account name -> every attribute that drives a task.
+def normalize_definitions(csm_definitions: CSMTypes.CSMYAMLDefinitions) -> Dict[str, Dict]:
+    return {
+        k: {
+            "description": v.description,
+            "email_address": v.email_address,
+            "cluster_list": sorted(v.cluster_list),
+            "is_rp_user": v.is_rp_user,
+            "rp_access": v.rp_access,
+        }
+        for k, v in csm_definitions.sa.items()
+    }
+
+
+# The snapshot of the last successfully applied definitions is kept next to the run journal of the configuration.
+def find_snapshot_file_path(journal_dir: str, config_file_path: str) -> str:
+    digest = hashlib.sha256(os.path.abspath(config_file_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(journal_dir, f"{digest}.applied.json")
+
+
+def load_applied_snapshot(file_path: str) -> Dict:
+    if not os.path.isfile(file_path):
+        return None
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+def save_applied_snapshot(file_path: str, definitions: Dict[str, Dict], is_full_reconcile: bool):
+    previous = load_applied_snapshot(file_path) or {}
+    now = round(time.time(), 3)
+    snapshot = {
+        "applied_at": now,
+        "full_reconcile_at": now if is_full_reconcile else previous.get("full_reconcile_at", None),
+        "definitions": definitions,
+    }
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, "w") as f:
+        json.dump(snapshot, f, sort_keys=True)
+    os.replace(temp_file_path, file_path)
+
+
+# The paths are made relative to the working directory, which git resolves against the revision tree.
+def _git_show(rev: str, file_path: str) -> str:
+    result = subprocess.run(["git", "show", f"{rev}:./{os.path.relpath(file_path)}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Could not read {file_path} at the git revision {rev}. " + result.stderr)
+    return result.stdout
+
+
+# Reads the definitions file (or every definitions file of the directory) as it was at the git revision, with the
+# same parsing rules as the current definitions.
+def load_definitions_at_rev(def_yaml_path: str, rev: str, csm_configs: CSMTypes.CSMYAMLConfigs) -> Dict[str, Dict]:
+    if os.path.isdir(def_yaml_path):
+        result = subprocess.run(
+            ["git", "ls-tree", "--name-only", rev, os.path.join(os.path.relpath(def_yaml_path), "")],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise Exception(f"Could not list {def_yaml_path} at the git revision {rev}. " + result.stderr)
+        def_files = [v for v in result.stdout.splitlines() if v.endswith(CSMInit.DEFINITION_FILE_EXTENSIONS)]
+    else:
+        def_files = [def_yaml_path]
+    csm_definitions = CSMTypes.CSMYAMLDefinitions()
+    for def_file in def_files:
+        input_definition = yaml.load(_git_show(rev, def_file), Loader=CSMInit.YAML_LOADER)
+        helpers.env_parse_replace(input_definition)
+        for item in (input_definition or {}).get("service_accounts", None) or []:
+            CSMInit.add_service_account_definition(csm_configs, csm_definitions, item)
+    return normalize_definitions(csm_definitions)
+
+
+# Service Accounts added, removed or changed since the applied definitions. The REST Proxy users are added if a
+# changed Service Account has (or had) REST Proxy access, as their REST Proxy secrets carry its API Keys.
+def find_changed_sa_names(current: Dict[str, Dict], applied: Dict[str, Dict]) -> List[str]:
+    changed: Set[str] = set([k for k in set(current) | set(applied) if current.get(k, None) != applied.get(k, None)])
+    if any([v.get("rp_access", False) for k in changed for v in (current.get(k, {}), applied.get(k, {}))]):
+        changed.update([k for k, v in current.items() if v["is_rp_user"]])
+    return sorted(changed)
+
+
+# Scopes the run to the Service Accounts changed since the last applied definitions (from the snapshot or from the
+# git revision). Returns False if nothing changed, True if the run should go ahead (scoped or full). A full reconcile
+# runs if there is nothing to compare against, or if the snapshot shows the last one is older than the interval
+# (0 disables the interval).
+def scope_to_changed_definitions(
+    csm_bundle: CSMTypes.CSMYAMLConfigBundle,
+    snapshot_file_path: str,
+    applied_rev: str = None,
+    def_yaml_path: str = None,
+    full_reconcile_interval_hours: float = 24,
+) -> bool:
+    if csm_bundle.csm_scope.limits_sa():
+        raise Exception("Definitions diff scoping cannot be combined with a Service Account scope (--sa).")
+    snapshot = load_applied_snapshot(snapshot_file_path)
+    if not snapshot and not applied_rev:
+        LOGGER.info(
+            "No applied definitions to compare with. All the Service Accounts in the definitions are reconciled."
+        )
+        return True
+    last_full_reconcile = (snapshot or {}).get("full_reconcile_at", None)
+    if (
+        snapshot
+        and full_reconcile_interval_hours > 0
+        and (not last_full_reconcile or time.time() - last_full_reconcile > full_reconcile_interval_hours * 3600)
+    ):
+        LOGGER.info("A full reconcile is due. All the Service Accounts in the definitions are reconciled.")
+        return True
+    if applied_rev:
+        applied = load_definitions_at_rev(def_yaml_path, applied_rev, csm_bundle.csm_configs)
+        LOGGER.info("Comparing the definitions with the git revision %s.", applied_rev)
+    else:
+        applied = snapshot["definitions"]
+        LOGGER.info("Comparing the definitions with the ones applied at %s.", time.ctime(snapshot["applied_at"]))
+    changed = find_changed_sa_names(normalize_definitions(csm_bundle.csm_definitions), applied)
+    if not changed:
+        LOGGER.info("No Service Account changed since the last applied definitions. Nothing to reconcile.")
+        return False
+    LOGGER.info(
+        "%s Service Account(s) changed since the last applied definitions: %s",
+        len(changed),
+        ", ".join(changed),
+    )
+    csm_bundle.csm_scope.sa_names.extend(changed)
+    CSMInit.apply_scope(csm_bundle.csm_definitions, csm_bundle.csm_scope)
+    return True
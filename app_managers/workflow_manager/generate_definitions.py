@@ -1,17 +1,69 @@
+import logging
+import os
+from typing import Dict, Iterator, List, Set
+
 import yaml
 from ccloud_managers.types import CCloudConfigBundle
+from secret_managers.types import CSMSecretsManager
+
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+FORCE_ALL_CLUSTERS = "FORCE_ALL_CLUSTERS"
+LOGGER = logging.getLogger(__name__)
+
+
+# Service Account ID -> (REST Proxy access, REST Proxy user) as tagged on the secrets in the Secret Store.
+def find_rest_proxy_flags(secret_bundle: CSMSecretsManager) -> Dict[str, List[bool]]:
+    output: Dict[str, List[bool]] = {}
+    if not secret_bundle:
+        return output
+    for item in secret_bundle.secret.values():
+        if item.rp_shard_of or not item.sa_id:
+            continue
+        flags = output.setdefault(item.sa_id, [False, False])
+        flags[0], flags[1] = flags[0] or item.rp_access, flags[1] or item.is_rp_user
+    return output
 
 
-def create_definitions_file(def_file_path: str, ccloud_bundle: CCloudConfigBundle):
-    output = {"service_accounts": []}
+def render_api_key_access(sa_clusters: Set[str], all_clusters: Set[str]) -> List[str]:
+    if all_clusters and sa_clusters >= all_clusters:
+        return [FORCE_ALL_CLUSTERS]
+    return sorted(sa_clusters)
+
+
+# One definitions entry per Service Account, rendered lazily so that only a single entry is held in memory.
+def generate_definitions(ccloud_bundle: CCloudConfigBundle, secret_bundle: CSMSecretsManager = None) -> Iterator[Dict]:
+    all_clusters = set(ccloud_bundle.cc_clusters.cluster.keys())
+    rp_flags = find_rest_proxy_flags(secret_bundle)
     for item in ccloud_bundle.cc_service_accounts.sa.values():
+        if item.is_ignored:
+            continue
+        # Only the keys for clusters that still exist are considered.
+        sa_clusters = ccloud_bundle.cc_api_keys.find_clusters_with_sa(item.resource_id) & all_clusters
+        rp_access, rp_user = rp_flags.get(item.resource_id, [False, False])
         acc = {
             "name": item.name,
             "description": item.description,
-            "enable_rest_proxy_access": False,
+            "enable_rest_proxy_access": rp_access and not rp_user,
             "team_email_address": "abc@abc.com",
-            "api_key_access": [],
+            "api_key_access": render_api_key_access(sa_clusters, all_clusters),
         }
-        output["service_accounts"].append(acc)
-    with open(def_file_path, "w") as f:
-        yaml.dump(output, f, sort_keys=False)
+        if rp_user:
+            acc["is_rest_proxy_user"] = True
+        yield acc
+
+
+# The entries are streamed to a temporary file next to the output file, which is moved in place once complete,
+# so a failed run never leaves a partial definitions file behind.
+def create_definitions_file(
+    def_file_path: str, ccloud_bundle: CCloudConfigBundle, secret_bundle: CSMSecretsManager = None
+):
+    temp_file_path = def_file_path + ".tmp"
+    count = 0
+    with open(temp_file_path, "w") as f:
+        f.write("---\nservice_accounts:\n")
+        for item in generate_definitions(ccloud_bundle=ccloud_bundle, secret_bundle=secret_bundle):
+            entry = yaml.dump([item], Dumper=YAML_DUMPER, sort_keys=False, default_flow_style=False)
+            f.write("".join("  " + v for v in entry.splitlines(keepends=True)))
+            count += 1
+    os.replace(temp_file_path, def_file_path)
+    LOGGER.info("Generated definitions for %s Service Account(s) in %s", count, def_file_path)
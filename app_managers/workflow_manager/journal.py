@@ -0,0 +1,206 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from ccloud_managers.types import CCloudConfigBundle
+
+JOURNAL_KEY_ENV = "CSM_JOURNAL_KEY"
+LOGGER = logging.getLogger(__name__)
+
+
+class CSMJournalEvents:
+    run_started = "run_started"
+    run_finished = "run_finished"
+    sa_created = "sa_created"
+    sa_deleted = "sa_deleted"
+    api_key_created = "api_key_created"
+    api_key_deleted = "api_key_deleted"
+    secret_persisted = "secret_persisted"
+    secret_deleted = "secret_deleted"
+    secret_tags_updated = "secret_tags_updated"
+    rest_proxy_updated = "rest_proxy_updated"
+
+
+# The journal key is taken from the CSM_JOURNAL_KEY env variable (a Fernet key) if available. Otherwise it is
+# derived from the CCloud API Secret of the configuration, as anyone holding that secret could create the API
+# Keys in the journal anyway.
+def _create_cipher(ccloud_api_secret: str, salt: str):
+    from cryptography.fernet import Fernet
+
+    key = os.environ.get(JOURNAL_KEY_ENV, None)
+    if not key:
+        derived = hashlib.pbkdf2_hmac("sha256", ccloud_api_secret.encode("utf-8"), salt.encode("utf-8"), 200000)
+        key = base64.urlsafe_b64encode(derived)
+    return Fernet(key)
+
+
+# Append-only journal of the mutations completed by the workflows for one configuration. Every record is a JSON
+# line that is flushed to disk before the workflow moves on, so the journal survives the process being killed.
+# The API Secret of a new API Key cannot be read back from CCloud; it is held in the journal (encrypted) only until
+# the secret store write for that key is journaled, and stripped from the journal when the run finishes.
+@dataclass(kw_only=True)
+class CSMRunJournal:
+    file_path: str
+    ccloud_api_secret: str = field(repr=False)
+    run_id: str = field(init=False, default="")
+    records: List[Dict] = field(init=False, default_factory=list)
+    cipher: object = field(init=False, default=None, repr=False)
+    # The workflows could record mutations from multiple worker threads.
+    lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self) -> None:
+        self.cipher = _create_cipher(self.ccloud_api_secret, os.path.basename(self.file_path))
+        if os.path.isfile(self.file_path):
+            with open(self.file_path, "rb+") as f:
+                data = f.read()
+                # A torn write at the end of the file from a killed process is cut off, so that the next record
+                # is not appended to it.
+                complete = data[: data.rfind(b"\n") + 1]
+                if len(complete) != len(data):
+                    LOGGER.warning("Dropping an incomplete record at the end of the run journal %s", self.file_path)
+                    f.truncate(len(complete))
+            self.records = [json.loads(v) for v in complete.decode("utf-8").splitlines() if v]
+
+    def __append(self, event: str, **kwargs):
+        record = {"ts": round(time.time(), 3), "run_id": self.run_id, "event": event, **kwargs}
+        with self.lock:
+            fd = os.open(self.file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            with os.fdopen(fd, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.records.append(record)
+
+    def last_run_records(self) -> List[Dict]:
+        starts = [i for i, v in enumerate(self.records) if v["event"] == CSMJournalEvents.run_started]
+        return self.records[starts[-1] :] if starts else []
+
+    def is_last_run_unfinished(self) -> bool:
+        records = self.last_run_records()
+        return bool(records) and records[-1]["event"] != CSMJournalEvents.run_finished
+
+    # API Keys created by any journaled run whose API Secret has not been written to the secret store yet.
+    def pending_api_keys(self) -> Dict[str, Dict]:
+        output: Dict[str, Dict] = {}
+        for item in self.records:
+            if item["event"] == CSMJournalEvents.api_key_created and item.get("encrypted_secret", None):
+                output[item["api_key"]] = item
+            elif item["event"] in (CSMJournalEvents.secret_persisted, CSMJournalEvents.api_key_deleted):
+                output.pop(item["api_key"], None)
+        return output
+
+    # Puts the API Secrets of the pending API Keys back into the CCloud API Keys cache. The API Key creation
+    # workflow skips a Service Account & cluster combination that already has a key with a known secret, and the
+    # secret store workflow then writes the recovered secret, so no duplicate API Key is created.
+    def __resume(self, ccloud_bundle: CCloudConfigBundle) -> int:
+        if not self.is_last_run_unfinished():
+            LOGGER.info("The last run in %s finished successfully. Nothing to resume.", self.file_path)
+        else:
+            counts: Dict[str, int] = {}
+            for item in self.last_run_records():
+                counts[item["event"]] = counts.get(item["event"], 0) + 1
+            LOGGER.info(
+                "Resuming the interrupted run %s. Completed steps: %s",
+                self.last_run_records()[0]["run_id"],
+                counts,
+            )
+        recovered = 0
+        for api_key, item in self.pending_api_keys().items():
+            ccloud_key = ccloud_bundle.cc_api_keys.api_keys.get(api_key, None)
+            if not ccloud_key:
+                LOGGER.warning("API Key %s from the run journal does not exist in CCloud anymore. Skipping.", api_key)
+                self.api_key_deleted(api_key=api_key)
+                continue
+            try:
+                ccloud_key.api_secret = self.cipher.decrypt(item["encrypted_secret"].encode("utf-8")).decode("utf-8")
+                recovered += 1
+                LOGGER.info(
+                    "Recovered the API Secret for API Key %s (SA: %s) from the run journal.",
+                    api_key,
+                    item["sa_name"],
+                )
+            except Exception:
+                LOGGER.error("Could not decrypt the API Secret for API Key %s. Was the journal key changed?", api_key)
+        return recovered
+
+    def start_run(self, ccloud_bundle: CCloudConfigBundle, resume: bool = False):
+        pending = self.pending_api_keys()
+        if resume:
+            self.__resume(ccloud_bundle=ccloud_bundle)
+        elif pending:
+            LOGGER.warning(
+                "%d API Key(s) created by an earlier run were not written to the secret store: %s. "
+                + "Use --resume to recover them instead of creating new API Keys.",
+                len(pending),
+                ", ".join(pending.keys()),
+            )
+        self.run_id = str(uuid.uuid4())
+        self.__append(CSMJournalEvents.run_started)
+
+    # Rewrites the journal with only the finished run. The API Key records that are still pending (with their
+    # encrypted secret) are carried over; the secrets of the persisted API Keys are dropped.
+    def finish_run(self):
+        self.__append(CSMJournalEvents.run_finished)
+        pending = self.pending_api_keys()
+        kept = []
+        for item in self.records:
+            if item["event"] == CSMJournalEvents.api_key_created and item["api_key"] in pending:
+                kept.append(item)
+            elif item["run_id"] == self.run_id:
+                kept.append({k: v for k, v in item.items() if k != "encrypted_secret"})
+        temp_file_path = self.file_path + ".tmp"
+        fd = os.open(temp_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write("".join(json.dumps(v) + "\n" for v in kept))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file_path, self.file_path)
+        self.records = kept
+
+    def sa_created(self, sa_name: str, sa_id: str):
+        self.__append(CSMJournalEvents.sa_created, sa_name=sa_name, sa_id=sa_id)
+
+    def sa_deleted(self, sa_name: str, sa_id: str):
+        self.__append(CSMJournalEvents.sa_deleted, sa_name=sa_name, sa_id=sa_id)
+
+    def api_key_created(self, api_key: str, api_secret: str, sa_name: str, sa_id: str, env_id: str, cluster_id: str):
+        self.__append(
+            CSMJournalEvents.api_key_created,
+            api_key=api_key,
+            sa_name=sa_name,
+            sa_id=sa_id,
+            env_id=env_id,
+            cluster_id=cluster_id,
+            encrypted_secret=self.cipher.encrypt(api_secret.encode("utf-8")).decode("utf-8"),
+        )
+
+    def api_key_deleted(self, api_key: str):
+        self.__append(CSMJournalEvents.api_key_deleted, api_key=api_key)
+
+    def secret_persisted(self, api_key: str, secret_name: str):
+        self.__append(CSMJournalEvents.secret_persisted, api_key=api_key, secret_name=secret_name)
+
+    def secret_deleted(self, secret_name: str):
+        self.__append(CSMJournalEvents.secret_deleted, secret_name=secret_name)
+
+    def secret_tags_updated(self, secret_name: str):
+        self.__append(CSMJournalEvents.secret_tags_updated, secret_name=secret_name)
+
+    def rest_proxy_updated(self, rp_secret_name: str, api_keys: List[str]):
+        self.__append(CSMJournalEvents.rest_proxy_updated, rp_secret_name=rp_secret_name, api_keys=api_keys)
+
+
+# One journal file per configuration file, so runs for different configurations never share a journal.
+def open_run_journal(journal_dir: str, config_file_path: str, ccloud_api_secret: str) -> CSMRunJournal:
+    os.makedirs(journal_dir, exist_ok=True)
+    digest = hashlib.sha256(os.path.abspath(config_file_path).encode("utf-8")).hexdigest()[:16]
+    return CSMRunJournal(
+        file_path=os.path.join(journal_dir, f"{digest}.journal.jsonl"), ccloud_api_secret=ccloud_api_secret
+    )
@@ -1,49 +1,182 @@
+from __future__ import annotations
+
+import logging
 from argparse import Namespace
+from typing import TYPE_CHECKING
 
-import app_managers.core.initializers as CSMInit
 import app_managers.core.types as CSMTypes
-import ccloud_managers.initializers as CCloudInit
-from app_managers.workflow_manager.workflows import WorkflowManager
+import app_managers.rate_limiter as RateLimiter
+
+LOGGER = logging.getLogger(__name__)
+
+# The heavy modules (CCloud clients with requests, boto3, the task generators) are only imported by the phase
+# that needs them, so that argument parsing and the definitions generation path do not pay for all of them.
+if TYPE_CHECKING:
+    from app_managers.workflow_manager.journal import CSMRunJournal
+    from ccloud_managers.types import CCloudConfigBundle
+    from secret_managers.types import CSMSecretsManager
+
+
+# The phases run by the shards of a sharded run (see shard_runner): the Service Account shards run every phase
+# except the REST Proxy update, which the cluster shards run on their own.
+SHARD_PHASE_SERVICE_ACCOUNTS = "service_accounts"
+SHARD_PHASE_REST_PROXY = "rest_proxy"
+
+
+# The lists are copied, as the scope adds the REST Proxy users it needs to its Service Accounts.
+def scope_from_args(args: Namespace) -> CSMTypes.CSMScope:
+    return CSMTypes.CSMScope(
+        env_ids=list(args.scope_env_ids),
+        cluster_ids=list(args.scope_cluster_ids),
+        sa_names=list(args.scope_sa_names),
+        cluster_shard=args.scope_cluster_shard,
+        adds_rest_proxy_users=args.shard_phase != SHARD_PHASE_SERVICE_ACCOUNTS,
+    )
+
+
+def initialize_secret_bundle(
+    csm_bundle: CSMTypes.CSMYAMLConfigBundle, ccloud_bundle: CCloudConfigBundle
+) -> CSMSecretsManager:
+    if csm_bundle.csm_configs.secretstore.store_type == CSMTypes.SUPPORTED_STORES.AWS_SECRETS:
+        import secret_managers.aws_secrets_manager as aws_secrets_manager
+
+        return aws_secrets_manager.AWSSecretsList(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+
+
+# Runs all the workflow phases against the provided bundles. The bundles are kept up to date by the workflows
+# as they go, so the same bundles could be used for the next run without loading the inventory again.
+def run_workflow_phases(
+    args: Namespace,
+    csm_bundle: CSMTypes.CSMYAMLConfigBundle,
+    ccloud_bundle: CCloudConfigBundle,
+    secret_bundle: CSMSecretsManager,
+    journal: CSMRunJournal = None,
+):
+    from app_managers.workflow_manager.workflows import WorkflowManager
+
+    workflow_manager = WorkflowManager(
+        csm_bundle=csm_bundle,
+        ccloud_bundle=ccloud_bundle,
+        secret_bundle=secret_bundle,
+        dry_run=args.dry_run,
+        journal=journal,
+        skip_rest_proxy_update=args.shard_phase == SHARD_PHASE_SERVICE_ACCOUNTS,
+    )
+    # The cluster shards merge the API Keys that the Service Account shards left tagged for the REST Proxy users.
+    if args.shard_phase == SHARD_PHASE_REST_PROXY:
+        if not args.disable_api_key_creation:
+            workflow_manager.update_rest_proxy_api_keys_in_secret_manager()
+        _finish_workflow_phases(csm_bundle=csm_bundle, secret_bundle=secret_bundle)
+        return
+    # The plan is estimated before any change, if asked for or if the configurations have a ceiling for it.
+    ccloud_configs = csm_bundle.csm_configs.ccloud
+    if args.estimate_plan or ccloud_configs.plan_max_calls or ccloud_configs.plan_max_eta_mins:
+        import app_managers.workflow_manager.plan_estimator as PlanEstimator
 
-import app_managers.workflow_manager.generate_definitions as DefinitionsGenerator
+        estimates = PlanEstimator.estimate_plan(args=args, workflow_manager=workflow_manager)
+        PlanEstimator.log_plan_estimate(estimates)
+        if args.estimate_plan:
+            return
+        PlanEstimator.check_plan_ceilings(estimates, ccloud_configs)
+    workflow_manager.create_service_accounts()
+    if not args.disable_api_key_creation:
+        # API Key management workflows
+        workflow_manager.create_api_keys()
+        if csm_bundle.csm_configs.ccloud.enable_api_key_cleanup:
+            workflow_manager.delete_api_keys()
+
+        # Secret management Workflows
+        workflow_manager.update_api_keys_in_secret_manager()
+        workflow_manager.update_tags_in_secret_manager()
+        # Unused keys are pruned from the REST Proxy users in the same pass if enable_rest_proxy_user_cleanup is set.
+        workflow_manager.update_rest_proxy_api_keys_in_secret_manager()
+        if csm_bundle.csm_configs.ccloud.api_key_rotation_max_age_days > 0:
+            workflow_manager.rotate_api_keys()
+    if csm_bundle.csm_configs.ccloud.enable_sa_cleanup:
+        workflow_manager.delete_service_accounts()
+    _finish_workflow_phases(csm_bundle=csm_bundle, secret_bundle=secret_bundle)
+
+
+def _finish_workflow_phases(csm_bundle: CSMTypes.CSMYAMLConfigBundle, secret_bundle: CSMSecretsManager):
+    # No plaintext secret value is kept around between runs of a long running process.
+    secret_bundle.evict_secret_values()
+    LOGGER.info("Secret value cache: %s", secret_bundle.value_cache.stats())
+    # The next run starts from the secrets as this run left them.
+    secret_bundle.save_metadata_snapshot()
+    # The last changes are written to the inventory store, so that the file matches the end state of the run.
+    if csm_bundle.inventory_store:
+        csm_bundle.inventory_store.flush()
+    RateLimiter.print_limiter_summary()
 
 
 def trigger_workflows(args: Namespace):
+    import app_managers.core.initializers as CSMInit
+    import ccloud_managers.initializers as CCloudInit
+
     # parse the YAML files for the input configurations
     csm_bundle = CSMInit.initialize(
-        args.csm_config_file_path, args.csm_definitions_file_path, args.csm_generate_definitions_file
+        args.csm_config_file_path,
+        args.csm_definitions_file_path,
+        args.csm_generate_definitions_file,
+        scope=scope_from_args(args),
     )
 
+    # The applied definitions snapshot is only recorded by the runs that cover all the definitions.
+    snapshot_file_path, applied_definitions = None, None
+    if not args.csm_generate_definitions_file:
+        import app_managers.workflow_manager.definitions_diff as DefinitionsDiff
+
+        snapshot_file_path = DefinitionsDiff.find_snapshot_file_path(args.csm_journal_dir, args.csm_config_file_path)
+        if not csm_bundle.csm_scope.is_scoped() and not args.disable_api_key_creation:
+            applied_definitions = DefinitionsDiff.normalize_definitions(csm_bundle.csm_definitions)
+        # The inventory is only loaded for the Service Accounts changed since the last applied definitions.
+        if args.changed_only and not DefinitionsDiff.scope_to_changed_definitions(
+            csm_bundle=csm_bundle,
+            snapshot_file_path=snapshot_file_path,
+            applied_rev=args.csm_applied_definitions_rev,
+            def_yaml_path=args.csm_definitions_file_path,
+            full_reconcile_interval_hours=args.full_reconcile_interval_hours,
+        ):
+            return
+
     # Initialize CCloud Object Cache
     ccloud_bundle = CCloudInit.initialize(csm_bundle=csm_bundle)
 
     # If the Generate YAML is True, we will parse the data and render a YAML file
     if args.csm_generate_definitions_file:
-        DefinitionsGenerator.create_definitions_file(def_file_path="test_output.yaml", ccloud_bundle=ccloud_bundle)
+        import app_managers.workflow_manager.generate_definitions as DefinitionsGenerator
+
+        # The Secret Store tags are used to detect the REST Proxy users and the REST Proxy access, if enabled.
+        secret_bundle = (
+            initialize_secret_bundle(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+            if csm_bundle.csm_configs.secretstore.is_enabled
+            else None
+        )
+        DefinitionsGenerator.create_definitions_file(
+            def_file_path=args.csm_generated_definitions_file_path,
+            ccloud_bundle=ccloud_bundle,
+            secret_bundle=secret_bundle,
+        )
     # This path will only get executed if the YAML files is passed in and
     # Generate YAML file is unchecked.
     else:
-        if csm_bundle.csm_configs.secretstore.store_type == CSMTypes.SUPPORTED_STORES.AWS_SECRETS:
-            import secret_managers.aws_secrets_manager as aws_secrets_manager
+        secret_bundle = initialize_secret_bundle(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+        journal = None
+        if not args.dry_run:
+            import app_managers.workflow_manager.journal as RunJournal
 
-            secret_bundle = aws_secrets_manager.AWSSecretsList(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
-        workflow_manager = WorkflowManager(
-            csm_bundle=csm_bundle,
-            ccloud_bundle=ccloud_bundle,
-            secret_bundle=secret_bundle,
-            dry_run=args.dry_run,
+            journal = RunJournal.open_run_journal(
+                journal_dir=args.csm_journal_dir,
+                config_file_path=args.csm_config_file_path,
+                ccloud_api_secret=csm_bundle.csm_configs.ccloud.api_secret,
+            )
+            journal.start_run(ccloud_bundle=ccloud_bundle, resume=args.resume)
+        run_workflow_phases(
+            args=args, csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle, secret_bundle=secret_bundle, journal=journal
         )
-        workflow_manager.create_service_accounts()
-        if not args.disable_api_key_creation:
-            # API Key management workflows
-            workflow_manager.create_api_keys()
-            if csm_bundle.csm_configs.ccloud.enable_api_key_cleanup:
-                workflow_manager.delete_api_keys()
-
-            # Secret management Workflows
-            workflow_manager.update_api_keys_in_secret_manager()
-            workflow_manager.update_tags_in_secret_manager()
-            # TODO: Remove Unused keys from the REST Proxy user. 
-            workflow_manager.update_rest_proxy_api_keys_in_secret_manager()
-        if csm_bundle.csm_configs.ccloud.enable_sa_cleanup:
-            workflow_manager.delete_service_accounts()
+        if journal:
+            journal.finish_run()
+        if applied_definitions is not None and not args.dry_run:
+            DefinitionsDiff.save_applied_snapshot(
+                snapshot_file_path, applied_definitions, is_full_reconcile=not csm_bundle.csm_scope.is_scoped()
+            )
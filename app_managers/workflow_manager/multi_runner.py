@@ -0,0 +1,214 @@
+import logging
+import os
+import time
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass, field
+from hashlib import sha256
+from json import dumps
+from typing import Dict, List
+
+import yaml
+
+import app_managers.helpers as helpers
+import app_managers.logger as CSMLogger
+
+CONFIG_FILE_NAME = "config.yaml"
+DEFINITIONS_FILE_NAME = "definitions.yaml"
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(kw_only=True)
+class CSMRunTarget:
+    name: str
+    config_file_path: str
+    definitions_file_path: str
+    log_file_path: str = field(default="")
+
+
+@dataclass(kw_only=True)
+class CSMRunResult:
+    name: str
+    status: str
+    exit_code: int
+    duration_secs: float
+    log_file_path: str
+    error_message: str = field(default="")
+
+
+# Every sub directory of the provided directory that contains both a config.yaml and a definitions.yaml file
+# is considered as one run target. The sub directory name is used as the name of the run.
+def find_targets_in_dir(config_dir: str) -> List[CSMRunTarget]:
+    output = []
+    for item in sorted(os.listdir(config_dir)):
+        config_file = os.path.join(config_dir, item, CONFIG_FILE_NAME)
+        def_file = os.path.join(config_dir, item, DEFINITIONS_FILE_NAME)
+        if os.path.isfile(config_file) and os.path.isfile(def_file):
+            output.append(CSMRunTarget(name=item, config_file_path=config_file, definitions_file_path=def_file))
+    if not output:
+        raise Exception(
+            f"No sub directories with {CONFIG_FILE_NAME} & {DEFINITIONS_FILE_NAME} were found in {config_dir}."
+        )
+    return output
+
+
+# The pairs are provided as "/path/to/config.yaml,/path/to/definitions.yaml".
+def find_targets_in_pairs(config_pairs: List[str]) -> List[CSMRunTarget]:
+    output = []
+    for item in config_pairs:
+        config_file, _, def_file = item.partition(",")
+        helpers.check_pair("config file", config_file.strip(), "definitions file", def_file.strip())
+        config_file = config_file.strip()
+        name = os.path.basename(os.path.dirname(os.path.abspath(config_file))) + "-" + os.path.splitext(
+            os.path.basename(config_file)
+        )[0]
+        output.append(CSMRunTarget(name=name, config_file_path=config_file, definitions_file_path=def_file.strip()))
+    seen: Dict[str, int] = {}
+    for item in output:
+        seen[item.name] = seen.get(item.name, 0) + 1
+        if seen[item.name] > 1:
+            item.name = f"{item.name}-{seen[item.name]}"
+    return output
+
+
+# Configurations that use the same CCloud API Key and Secret Store configs are grouped together and processed
+# sequentially by the same worker, so that they share the pooled HTTP sessions and boto3 clients of that process.
+# Only a digest of the credentials is kept.
+def _credentials_key(target: CSMRunTarget) -> str:
+    try:
+        with open(target.config_file_path, "r") as config_file:
+            csm_config = yaml.safe_load(config_file)
+        helpers.env_parse_replace(csm_config)
+        configs = csm_config["configs"]
+        payload = dumps(
+            [
+                configs["ccloud_configs"]["api_key"],
+                configs["secret_store"]["type"],
+                configs["secret_store"]["configs"],
+            ],
+            sort_keys=True,
+            default=str,
+        )
+    except Exception:
+        # The worker will report the actual error in the log for this configuration.
+        payload = "unparseable:" + target.name
+    return sha256(payload.encode("utf-8")).hexdigest()
+
+
+def group_targets_by_credentials(targets: List[CSMRunTarget]) -> List[List[CSMRunTarget]]:
+    groups: Dict[str, List[CSMRunTarget]] = {}
+    for item in targets:
+        groups.setdefault(_credentials_key(item), []).append(item)
+    return list(groups.values())
+
+
+def _run_target(target: CSMRunTarget, args: Namespace) -> CSMRunResult:
+    import app_managers.workflow_manager.main as WorkflowManager
+
+    start = time.perf_counter()
+    run_args = Namespace(
+        **{
+            **vars(args),
+            "csm_config_file_path": target.config_file_path,
+            "csm_definitions_file_path": target.definitions_file_path,
+        }
+    )
+    with open(target.log_file_path, "w") as log_file, redirect_stdout(log_file), redirect_stderr(log_file):
+        try:
+            helpers.printline()
+            LOGGER.info(
+                "Run: %s; Config: %s; Definitions: %s",
+                target.name,
+                target.config_file_path,
+                target.definitions_file_path,
+            )
+            WorkflowManager.trigger_workflows(args=run_args)
+            helpers.printline()
+            status, exit_code, error_message = "Success", 0, ""
+        except Exception as e:
+            LOGGER.exception("Run %s failed.", target.name)
+            status, exit_code, error_message = "Failed", 1, str(e)
+        finally:
+            # The log file is closed once the block is left, so every queued record is written to it first.
+            CSMLogger.flush_logs()
+    return CSMRunResult(
+        name=target.name,
+        status=status,
+        exit_code=exit_code,
+        duration_secs=time.perf_counter() - start,
+        log_file_path=target.log_file_path,
+        error_message=error_message,
+    )
+
+
+# Worker entry point. The Confluent CLI keeps the logged in context (current environment and cluster) in the
+# home directory, so every worker gets its own home directory to keep parallel runs from switching each other's
+# context in the middle of an API Key creation.
+def _run_group(targets: List[CSMRunTarget], args: Namespace, cli_home: str) -> List[CSMRunResult]:
+    os.makedirs(cli_home, exist_ok=True)
+    os.environ["HOME"] = cli_home
+    # A spawned (not forked) worker process starts without the logging setup of the parent process.
+    CSMLogger.setup_logging(level=args.log_level, log_format=args.log_format)
+    return [_run_target(target=item, args=args) for item in targets]
+
+
+def trigger_multi_config_workflows(
+    args: Namespace, targets: List[CSMRunTarget], max_workers: int, log_dir: str
+) -> List[CSMRunResult]:
+    os.makedirs(log_dir, exist_ok=True)
+    log_dir = os.path.abspath(log_dir)
+    for item in targets:
+        item.log_file_path = os.path.join(log_dir, item.name + ".log")
+    groups = group_targets_by_credentials(targets)
+    LOGGER.info(
+        "Processing %d configuration(s) in %d credential group(s) with up to %d worker process(es). "
+        + "Logs will be available in %s",
+        len(targets),
+        len(groups),
+        max_workers,
+        log_dir,
+    )
+    results: List[CSMRunResult] = []
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as executor:
+        futures = {
+            executor.submit(_run_group, group, args, os.path.join(log_dir, ".home", f"group-{i}")): group
+            for i, group in enumerate(groups)
+        }
+        for future in as_completed(futures):
+            try:
+                group_results = future.result()
+            except Exception as e:
+                group_results = [
+                    CSMRunResult(
+                        name=item.name,
+                        status="Failed",
+                        exit_code=1,
+                        duration_secs=0.0,
+                        log_file_path=item.log_file_path,
+                        error_message=f"Worker process failed: {e}",
+                    )
+                    for item in futures[future]
+                ]
+            for item in group_results:
+                LOGGER.info("Run %s finished with status %s in %.1fs.", item.name, item.status, item.duration_secs)
+            results.extend(group_results)
+    order = {v.name: i for i, v in enumerate(targets)}
+    return sorted(results, key=lambda v: order[v.name])
+
+
+def print_run_summary(results: List[CSMRunResult]) -> int:
+    helpers.printline()
+    LOGGER.info("{:<30} {:<10} {:<10} {:<12} {:<50}".format("Run", "Status", "Exit Code", "Duration(s)", "Log File"))
+    for item in results:
+        LOGGER.info(
+            "{:<30} {:<10} {:<10} {:<12.1f} {:<50}".format(
+                item.name, item.status, item.exit_code, item.duration_secs, item.log_file_path
+            )
+        )
+        if item.error_message:
+            LOGGER.error("    Error: %s", item.error_message)
+    failed = len([v for v in results if v.exit_code != 0])
+    LOGGER.info("%s run(s) succeeded, %s run(s) failed.", len(results) - failed, failed)
+    helpers.printline()
+    return 1 if failed else 0
@@ -0,0 +1,190 @@
+import logging
+from argparse import Namespace
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import app_managers.core.types as CoreTypes
+import app_managers.rate_limiter as RateLimiter
+from app_managers.workflow_manager.types import CSMConfigTaskType
+from app_managers.workflow_manager.workflows import WorkflowManager
+
+LOGGER = logging.getLogger(__name__)
+
+CCLOUD_REST = "CCloud REST"
+CCLOUD_CLI = "CLI"
+AWS_GET = "AWS Get"
+AWS_PUT = "AWS Put"
+AWS_CREATE = "AWS Create"
+AWS_TAG = "AWS Tag"
+AWS_DELETE = "AWS Delete"
+# Operation -> (rate limiter endpoint, fallback endpoint prefixes for the latency, default latency in seconds). The
+# latency is the mean of the calls made so far to the endpoint, else to the first fallback prefix with calls (the
+# inventory listings at least), else the default. The concurrent phases are limited by the limit of the endpoint.
+OPERATIONS: Dict[str, Tuple[str, List[str], float]] = {
+    CCLOUD_REST: ("ccloud:DELETE /iam/v2/api-keys", ["ccloud:POST", "ccloud:DELETE", "ccloud:GET"], 0.5),
+    CCLOUD_CLI: ("ccloud:cli", [], 3.0),
+    AWS_GET: ("aws:secretsmanager:get_secret_value", ["aws:secretsmanager"], 0.1),
+    AWS_PUT: ("aws:secretsmanager:put_secret_value", ["aws:secretsmanager"], 0.1),
+    AWS_CREATE: ("aws:secretsmanager:create_secret", ["aws:secretsmanager"], 0.2),
+    AWS_TAG: ("aws:secretsmanager:tag_resource", ["aws:secretsmanager"], 0.1),
+    AWS_DELETE: ("aws:secretsmanager:delete_secret", ["aws:secretsmanager"], 0.1),
+}
+# The CLI sets the environment and the cluster before it creates an API Key.
+API_KEY_CREATION_CALLS = {CCLOUD_CLI: 3}
+
+
+@dataclass(kw_only=True)
+class CSMPhaseEstimate:
+    phase: str
+    tasks_count: int = 0
+    calls: Dict[str, int] = field(default_factory=dict)
+    # The calls of the phase run concurrently, up to the concurrency limit of their endpoints.
+    is_concurrent: bool = False
+    # Pauses that are part of the phase, like the waits between the API Key rotation waves.
+    wait_secs: float = 0.0
+    eta_secs: float = 0.0
+
+    def add_task(self, calls: Dict[str, int]):
+        self.tasks_count += 1
+        for k, v in calls.items():
+            self.calls[k] = self.calls.get(k, 0) + v
+
+    def calls_count(self) -> int:
+        return sum(self.calls.values())
+
+
+def find_latency(operation: str) -> float:
+    endpoint, fallback_prefixes, default_latency = OPERATIONS[operation]
+    for prefix in [endpoint, *fallback_prefixes]:
+        latency = RateLimiter.find_mean_latency(prefix)
+        if latency is not None:
+            return latency
+    return default_latency
+
+
+def compute_eta(estimate: CSMPhaseEstimate) -> float:
+    eta_secs = estimate.wait_secs
+    for k, v in estimate.calls.items():
+        concurrency = max(1, int(RateLimiter.find_limit(OPERATIONS[k][0]))) if estimate.is_concurrent else 1
+        eta_secs += v * find_latency(k) / concurrency
+    return eta_secs
+
+
+# Goes through the tasks of every phase that the run would execute, in the order the run executes them (the same
+# planning as a dry run), and counts the calls every task needs. The counts are the worst case: a secret whose
+# value did not change is only tagged, and an API Key with a known API Secret is not created again.
+def estimate_plan(args: Namespace, workflow_manager: WorkflowManager) -> List[CSMPhaseEstimate]:
+    csm_bundle, ccloud_bundle = workflow_manager.csm_bundle, workflow_manager.ccloud_bundle
+    ccloud_configs = csm_bundle.csm_configs.ccloud
+    sa_tasks = workflow_manager.sa_tasks
+    api_key_tasks = workflow_manager.api_key_tasks
+    secret_tasks = workflow_manager.secret_tasks
+    output: List[CSMPhaseEstimate] = []
+
+    sa_tasks.refresh_set_values(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+    output.append(CSMPhaseEstimate(phase="Service Account creation"))
+    for _ in sa_tasks.create_service_account_tasks():
+        output[-1].add_task({CCLOUD_REST: 1})
+    if not args.disable_api_key_creation:
+        api_key_tasks.refresh_set_values(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+        output.append(CSMPhaseEstimate(phase="API Key creation"))
+        for _ in api_key_tasks.create_api_key_tasks():
+            output[-1].add_task(API_KEY_CREATION_CALLS)
+        if ccloud_configs.enable_api_key_cleanup:
+            output.append(CSMPhaseEstimate(phase="API Key deletion"))
+            journal = workflow_manager.journal
+            pending_api_keys = journal.pending_api_keys().keys() if journal else ()
+            for _ in api_key_tasks.delete_api_key_tasks(pending_api_keys=pending_api_keys):
+                output[-1].add_task({CCLOUD_CLI: 1})
+
+        secret_tasks.refresh_set_values(api_key_tasks=api_key_tasks)
+        output.append(CSMPhaseEstimate(phase="Secret Manager update"))
+        for _ in secret_tasks.create_secret_tasks():
+            output[-1].add_task({AWS_GET: 1, AWS_CREATE: 1})
+        for _ in secret_tasks.update_secret_tasks():
+            output[-1].add_task({AWS_GET: 1, AWS_PUT: 1, AWS_TAG: 1})
+        output.append(CSMPhaseEstimate(phase="Secret Manager tags update"))
+        for _ in secret_tasks.update_secret_tags_tasks():
+            output[-1].add_task({AWS_TAG: 1})
+        # The secrets merged into the REST Proxy users are read and tagged as synced.
+        output.append(CSMPhaseEstimate(phase="REST Proxy update"))
+        for item in secret_tasks.upsert_rest_proxy_secret_tasks():
+            secrets_count = len(item.task_object["secrets_with_rp_access"])
+            if item.task_type == CSMConfigTaskType.create_task:
+                output[-1].add_task({AWS_GET: secrets_count, AWS_CREATE: 1, AWS_TAG: secrets_count})
+            else:
+                output[-1].add_task({AWS_GET: 1 + secrets_count, AWS_PUT: 1, AWS_TAG: 1 + secrets_count})
+
+        if ccloud_configs.api_key_rotation_max_age_days > 0:
+            output.append(CSMPhaseEstimate(phase="API Key rotation"))
+            for _ in api_key_tasks.rotate_api_key_tasks():
+                output[-1].add_task({**API_KEY_CREATION_CALLS, AWS_GET: 1, AWS_PUT: 1, AWS_TAG: 1, CCLOUD_REST: 1})
+            # The pauses between the waves, and the grace period of the last wave.
+            waves_count = -(-output[-1].tasks_count // ccloud_configs.api_key_rotation_wave_size)
+            if waves_count:
+                output[-1].wait_secs = (waves_count - 1) * ccloud_configs.api_key_rotation_wave_interval_secs
+                output[-1].wait_secs += ccloud_configs.api_key_rotation_grace_period_secs
+
+    if ccloud_configs.enable_sa_cleanup:
+        sa_tasks.refresh_set_values(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+        output.append(CSMPhaseEstimate(phase="Service Account deletion"))
+        tasks = list(sa_tasks.delete_service_account_tasks())
+        if ccloud_configs.enable_sa_cascade_delete:
+            output[-1].is_concurrent = True
+            secret_names = workflow_manager.secret_bundle.find_secret_names_with_sa_ids(
+                [v.task_object["sa_id"] for v in tasks]
+            )
+            for item in tasks:
+                sa_id = item.task_object["sa_id"]
+                api_keys_count = len(ccloud_bundle.cc_api_keys.find_api_key_ids_with_sa(sa_id))
+                output[-1].add_task({CCLOUD_REST: 1 + api_keys_count, AWS_DELETE: len(secret_names[sa_id])})
+        else:
+            for _ in tasks:
+                output[-1].add_task({CCLOUD_REST: 1})
+
+    for item in output:
+        item.eta_secs = compute_eta(item)
+    return output
+
+
+def log_plan_estimate(estimates: List[CSMPhaseEstimate]):
+    operations = list(OPERATIONS.keys())
+    row_format = "{:<28} {:>7} " + " ".join(["{:>11}"] * len(operations)) + " {:>10}"
+    LOGGER.info(row_format.format("Phase", "Tasks", *operations, "ETA (s)"))
+    for item in estimates:
+        LOGGER.info(
+            row_format.format(
+                item.phase,
+                item.tasks_count,
+                *[item.calls.get(v, 0) for v in operations],
+                f"{item.eta_secs:.1f}",
+            )
+        )
+    LOGGER.info(
+        row_format.format(
+            "Total",
+            sum([v.tasks_count for v in estimates]),
+            *[sum([v.calls.get(k, 0) for v in estimates]) for k in operations],
+            f"{sum([v.eta_secs for v in estimates]):.1f}",
+        )
+    )
+    LOGGER.info(
+        "Latencies used (s): %s",
+        ", ".join([f"{v}: {find_latency(v):.3f}" for v in operations]),
+    )
+
+
+# Refuses the run if the plan is over the ceilings in the configurations (0 turns a ceiling off).
+def check_plan_ceilings(estimates: List[CSMPhaseEstimate], ccloud_configs: CoreTypes.CSMYAMLCCloudConfigs):
+    calls_count = sum([v.calls_count() for v in estimates])
+    eta_mins = sum([v.eta_secs for v in estimates]) / 60
+    if ccloud_configs.plan_max_calls and calls_count > ccloud_configs.plan_max_calls:
+        raise Exception(
+            f"The plan needs about {calls_count} calls, over the plan_max_calls ceiling of "
+            + f"{ccloud_configs.plan_max_calls}. Nothing was changed."
+        )
+    if ccloud_configs.plan_max_eta_mins and eta_mins > ccloud_configs.plan_max_eta_mins:
+        raise Exception(
+            f"The plan would take about {eta_mins:.1f} minutes, over the plan_max_eta_mins ceiling of "
+            + f"{ccloud_configs.plan_max_eta_mins}. Nothing was changed."
+        )
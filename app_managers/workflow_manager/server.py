@@ -0,0 +1,186 @@
+import io
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from typing import Dict
+from urllib import parse
+
+import app_managers.logger as CSMLogger
+from app_managers.workflow_manager.daemon import CSMReconcileDaemon
+from app_managers.workflow_manager.types import CSMConfigTaskStatus
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(kw_only=True)
+class CSMReconcileRun:
+    run_id: str
+    dry_run: bool
+    status: CSMConfigTaskStatus = field(default=CSMConfigTaskStatus.sts_not_started)
+    trigger_count: int = field(default=1)
+    requested_at: float = field(default_factory=time.time)
+    due_at: float = field(default=0.0)
+    started_at: float = field(default=None)
+    finished_at: float = field(default=None)
+    error_message: str = field(default="")
+    log: io.StringIO = field(default_factory=io.StringIO, repr=False)
+
+    def to_dict(self, include_log: bool = False) -> Dict:
+        output = {
+            "run_id": self.run_id,
+            "dry_run": self.dry_run,
+            "status": self.status.value,
+            "trigger_count": self.trigger_count,
+            "requested_at": self.requested_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error_message": self.error_message,
+        }
+        if include_log:
+            output["log"] = self.log.getvalue()
+        return output
+
+
+# Serializes the reconcile runs over the warm caches of a CSMReconcileDaemon. Every trigger that arrives while a
+# run of the same kind (plan or reconcile) is still waiting for its debounce window is merged into that run and
+# gets the same run ID back, so N back to back pipeline triggers result in a single run.
+class CSMReconcileService:
+    daemon: CSMReconcileDaemon
+    debounce_secs: float
+    max_runs_history: int
+
+    def __init__(self, daemon: CSMReconcileDaemon, debounce_secs: float = 10, max_runs_history: int = 100) -> None:
+        self.daemon = daemon
+        self.debounce_secs = debounce_secs
+        self.max_runs_history = max_runs_history
+        self.runs: OrderedDict[str, CSMReconcileRun] = OrderedDict()
+        self.pending: Dict[bool, CSMReconcileRun] = {}
+        self.current_run: CSMReconcileRun = None
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self.__run_worker, name="csm-reconcile-worker", daemon=True)
+
+    def start(self):
+        self.daemon.load_all()
+        self.worker.start()
+
+    def trigger(self, dry_run: bool) -> CSMReconcileRun:
+        with self.condition:
+            run = self.pending.get(dry_run, None)
+            if run:
+                run.trigger_count += 1
+                return run
+            run = CSMReconcileRun(run_id=str(uuid.uuid4()), dry_run=dry_run)
+            run.due_at = time.monotonic() + self.debounce_secs
+            self.pending[dry_run] = run
+            self.runs[run.run_id] = run
+            while len(self.runs) > self.max_runs_history:
+                self.runs.popitem(last=False)
+            self.condition.notify_all()
+            return run
+
+    def find_run(self, run_id: str) -> CSMReconcileRun:
+        with self.condition:
+            return self.runs.get(run_id, None)
+
+    def status(self) -> Dict:
+        with self.condition:
+            return {
+                "current_run": self.current_run.to_dict() if self.current_run else None,
+                "pending_runs": [v.to_dict() for v in self.pending.values()],
+                "recent_runs": [v.to_dict() for v in list(self.runs.values())[-10:]],
+                "inventory_age_secs": round(time.monotonic() - self.daemon.last_refresh, 1),
+            }
+
+    def __next_due_run(self) -> CSMReconcileRun:
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                due_runs = sorted(self.pending.values(), key=lambda v: v.due_at)
+                if due_runs and due_runs[0].due_at <= now:
+                    run = self.pending.pop(due_runs[0].dry_run)
+                    self.current_run = run
+                    return run
+                self.condition.wait(timeout=(due_runs[0].due_at - now) if due_runs else None)
+
+    def __execute(self, run: CSMReconcileRun):
+        run.status, run.started_at = CSMConfigTaskStatus.sts_in_progress, time.time()
+        with redirect_stdout(run.log):
+            try:
+                self.daemon.sync()
+                self.daemon.reconcile(dry_run=run.dry_run)
+                run.status = CSMConfigTaskStatus.sts_success
+            except Exception as e:
+                LOGGER.exception("Run %s failed.", run.run_id)
+                run.status, run.error_message = CSMConfigTaskStatus.sts_failed, str(e)
+            finally:
+                CSMLogger.flush_logs()
+        run.finished_at = time.time()
+        LOGGER.info(
+            "Run %s (dry run: %s, triggers: %s) finished: %s",
+            run.run_id,
+            run.dry_run,
+            run.trigger_count,
+            run.status.value,
+        )
+
+    def __run_worker(self):
+        while True:
+            run = self.__next_due_run()
+            self.__execute(run)
+            with self.condition:
+                self.current_run = None
+
+
+def create_request_handler(service: CSMReconcileService):
+    class CSMReconcileRequestHandler(BaseHTTPRequestHandler):
+        def __send_json(self, status_code: int, payload: Dict):
+            body = dumps(payload).encode("utf-8")
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            path = parse.urlsplit(self.path).path.rstrip("/")
+            if path in ("/reconcile", "/plan"):
+                run = service.trigger(dry_run=path == "/plan")
+                self.__send_json(202, {"run_id": run.run_id, "status_url": f"/runs/{run.run_id}"})
+            else:
+                self.__send_json(404, {"error": f"Unknown endpoint {path}"})
+
+        def do_GET(self):
+            url = parse.urlsplit(self.path)
+            path = url.path.rstrip("/")
+            if path == "/status":
+                self.__send_json(200, service.status())
+            elif path.startswith("/runs/"):
+                run = service.find_run(path.split("/", 2)[2])
+                if run:
+                    include_log = parse.parse_qs(url.query).get("log", ["false"])[0].lower() == "true"
+                    self.__send_json(200, run.to_dict(include_log=include_log))
+                else:
+                    self.__send_json(404, {"error": "Run not found."})
+            else:
+                self.__send_json(404, {"error": f"Unknown endpoint {path}"})
+
+    return CSMReconcileRequestHandler
+
+
+def serve(daemon: CSMReconcileDaemon, host: str, port: int, debounce_secs: float):
+    service = CSMReconcileService(daemon=daemon, debounce_secs=debounce_secs)
+    service.start()
+    server = ThreadingHTTPServer((host, port), create_request_handler(service))
+    LOGGER.info("Reconcile service listening on http://%s:%s (debounce window: %ss).", host, port, debounce_secs)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        LOGGER.info("Stopping the reconcile service.")
+    finally:
+        server.server_close()
@@ -0,0 +1,267 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from argparse import Namespace
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Set
+
+import app_managers.core.types as CSMTypes
+
+LOGGER = logging.getLogger(__name__)
+
+SA_SHARD_LEASE = "sa-shard"
+REST_PROXY_SHARD_LEASE = "rest-proxy-shard"
+
+
+def default_runner_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# The leases of every runner of the same configuration share a namespace. The configuration file content (not
+# its path) is used, as the runners could run on different hosts with different checkouts.
+def find_lease_namespace(config_file_path: str) -> str:
+    with open(config_file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+# Lease records as JSON files, for the runners that share a file system (and for trying out the sharding locally).
+# Every read-modify-write of the leases is done under an exclusive lock of the directory, so no read back is needed.
+class CSMFileLeaseStore:
+    settle_secs = 0.0
+
+    def __init__(self, lease_dir: str, namespace: str) -> None:
+        self.lease_dir = os.path.join(lease_dir, namespace)
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+    @contextlib.contextmanager
+    def lock(self):
+        with open(os.path.join(self.lease_dir, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read(self, lease_name: str) -> Dict:
+        file_path = os.path.join(self.lease_dir, f"{lease_name}.json")
+        if not os.path.isfile(file_path):
+            return None
+        with open(file_path, "r") as f:
+            return json.load(f)
+
+    def write(self, lease_name: str, record: Dict):
+        file_path = os.path.join(self.lease_dir, f"{lease_name}.json")
+        with open(file_path + ".tmp", "w") as f:
+            json.dump(record, f, sort_keys=True)
+        os.replace(file_path + ".tmp", file_path)
+
+
+def open_lease_store(args: Namespace, csm_configs: CSMTypes.CSMYAMLConfigs):
+    namespace = find_lease_namespace(args.csm_config_file_path)
+    if args.shard_lease_dir:
+        return CSMFileLeaseStore(lease_dir=args.shard_lease_dir, namespace=namespace)
+    if csm_configs.secretstore.store_type == CSMTypes.SUPPORTED_STORES.AWS_SECRETS:
+        import secret_managers.aws_secrets_manager as aws_secrets_manager
+
+        return aws_secrets_manager.AWSLeaseStore(csm_configs=csm_configs, namespace=namespace)
+    raise Exception("A sharded run needs --shard-lease-dir or a supported secret store for its leases.")
+
+
+# A lease record holds the run ID, the runner that owns the shard and when the lease expires. A shard is free if
+# nobody holds an unexpired lease on it and it was not completed by the same run. The lease names are reused by
+# every run, so the number of lease records stays the same whatever the number of runs.
+@dataclass(kw_only=True)
+class CSMShardLeases:
+    store: object
+    run_id: str
+    runner_id: str
+    ttl_secs: float
+
+    def __record(self, expires_at: float, completed: bool = False) -> Dict:
+        return {"run_id": self.run_id, "owner": self.runner_id, "expires_at": expires_at, "completed": completed}
+
+    def is_completed(self, lease_name: str) -> bool:
+        record = self.store.read(lease_name) or {}
+        return record.get("run_id", None) == self.run_id and record.get("completed", False)
+
+    def try_acquire(self, lease_name: str) -> bool:
+        with self.store.lock():
+            record = self.store.read(lease_name) or {}
+            if record.get("run_id", None) == self.run_id and record.get("completed", False):
+                return False
+            # A lease that is not renewed anymore is taken over, its runner is gone.
+            if (
+                not record.get("completed", False)
+                and record.get("owner", self.runner_id) != self.runner_id
+                and record.get("expires_at", 0) > time.time()
+            ):
+                return False
+            self.store.write(lease_name, self.__record(time.time() + self.ttl_secs))
+        if not self.store.settle_secs:
+            return True
+        time.sleep(self.store.settle_secs)
+        return self.__is_owner(self.store.read(lease_name) or {})
+
+    def __is_owner(self, record: Dict) -> bool:
+        return record.get("run_id", None) == self.run_id and record.get("owner", None) == self.runner_id
+
+    def renew(self, lease_name: str) -> bool:
+        with self.store.lock():
+            if not self.__is_owner(self.store.read(lease_name) or {}):
+                return False
+            self.store.write(lease_name, self.__record(time.time() + self.ttl_secs))
+            return True
+
+    def complete(self, lease_name: str):
+        with self.store.lock():
+            self.store.write(lease_name, self.__record(0, completed=True))
+
+    # A failed shard is released for another runner to try again.
+    def release(self, lease_name: str):
+        with self.store.lock():
+            if self.__is_owner(self.store.read(lease_name) or {}):
+                self.store.write(lease_name, self.__record(0))
+
+    # Renews the lease in the background while the shard runs, at a third of the lease time.
+    @contextlib.contextmanager
+    def hold(self, lease_name: str):
+        stop = threading.Event()
+
+        def renew_lease():
+            while not stop.wait(self.ttl_secs / 3):
+                try:
+                    if not self.renew(lease_name):
+                        LOGGER.error("Lost the lease %s to another runner. The shard may be run twice.", lease_name)
+                        return
+                except Exception:
+                    LOGGER.exception("Could not renew the lease %s.", lease_name)
+
+        thread = threading.Thread(target=renew_lease, name=f"lease-{lease_name}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+
+# Runs the shards of a stage until all of them are completed by this runner or another one. Every runner starts
+# at a different shard, so they do not all race for the first one. The stage only returns once every shard is
+# completed, so a shard held by a runner that died is taken over once its lease expires.
+def run_shard_stage(
+    leases: CSMShardLeases, lease_prefix: str, shards_count: int, run_shard: Callable[[int], None], poll_secs: float
+) -> int:
+    start = CSMTypes.find_shard_index(leases.runner_id, shards_count)
+    order = [(start + i) % shards_count for i in range(shards_count)]
+    ran_count = 0
+    while True:
+        pending = [v for v in order if not leases.is_completed(f"{lease_prefix}-{v:03d}")]
+        if not pending:
+            return ran_count
+        index = next((v for v in pending if leases.try_acquire(f"{lease_prefix}-{v:03d}")), None)
+        if index is None:
+            LOGGER.info("Waiting for %d %s(s) leased by other runners.", len(pending), lease_prefix)
+            time.sleep(poll_secs)
+            continue
+        lease_name = f"{lease_prefix}-{index:03d}"
+        LOGGER.info("Runner %s leased %s.", leases.runner_id, lease_name)
+        try:
+            with leases.hold(lease_name):
+                run_shard(index)
+        except Exception:
+            leases.release(lease_name)
+            raise
+        leases.complete(lease_name)
+        ran_count += 1
+
+
+# The Service Accounts of the definitions, plus the ones in CCloud if a cleanup is enabled, so that the Service
+# Accounts removed from the definitions (and their API Keys) are in a shard that cleans them up. A Service Account
+# always hashes to the same shard, so the runners that list CCloud at different times only differ for the Service
+# Accounts created or deleted in between.
+def find_sharded_sa_names(csm_bundle: CSMTypes.CSMYAMLConfigBundle) -> Set[str]:
+    output = set(csm_bundle.csm_definitions.sa.keys())
+    ccloud_configs = csm_bundle.csm_configs.ccloud
+    if not ccloud_configs.enable_sa_cleanup and not ccloud_configs.enable_api_key_cleanup:
+        return output
+    from ccloud_managers.connection import CCloudConnection
+    from ccloud_managers.service_account import CCloudServiceAccountList
+
+    ccloud_sa_list = CCloudServiceAccountList(
+        _ccloud_connection=CCloudConnection(csm_bundle=csm_bundle), _csm_bundle=csm_bundle
+    )
+    removed_sa_names = set([v.name for v in ccloud_sa_list.sa.values() if not v.is_ignored]).difference(output)
+    LOGGER.info("%d Service Account(s) not in the definitions are sharded for the cleanup.", len(removed_sa_names))
+    return output.union(removed_sa_names)
+
+
+# The Service Accounts are split into stable hash partitions, one per shard, and every shard is an SA scoped run
+# that skips the REST Proxy update. The REST Proxy secrets are merged by a second stage of cluster shards once all
+# the Service Account shards are done, so every REST Proxy secret has a single writer. The Service Account shards
+# leave their API Keys tagged as not synced to the REST Proxy users, which the cluster shards pick up.
+def trigger_sharded_workflows(args: Namespace):
+    import app_managers.core.initializers as CSMInit
+    import app_managers.workflow_manager.main as WorkflowManager
+
+    if args.scope_sa_names or args.changed_only or args.csm_generate_definitions_file:
+        raise Exception("A sharded run cannot be combined with --sa, --changed-only or the definitions generation.")
+    if not args.shard_run_id:
+        raise Exception("--shard-run-id is required for a sharded run. It must be the same for all the runners.")
+    shards_count = args.shard_count
+    csm_bundle = CSMInit.initialize(
+        args.csm_config_file_path, args.csm_definitions_file_path, scope=WorkflowManager.scope_from_args(args)
+    )
+    partitions: List[List[str]] = [[] for _ in range(shards_count)]
+    for item in sorted(find_sharded_sa_names(csm_bundle)):
+        partitions[CSMTypes.find_shard_index(item, shards_count)].append(item)
+    leases = CSMShardLeases(
+        store=open_lease_store(args, csm_bundle.csm_configs),
+        run_id=args.shard_run_id,
+        runner_id=args.runner_id or default_runner_id(),
+        ttl_secs=args.shard_lease_ttl_secs,
+    )
+    LOGGER.info(
+        "Runner %s joined the sharded run %s with %d Service Account shard(s) of %s Service Account(s).",
+        leases.runner_id,
+        leases.run_id,
+        shards_count,
+        ", ".join([str(len(v)) for v in partitions]),
+    )
+
+    def run_sa_shard(index: int):
+        if not partitions[index]:
+            LOGGER.info("Service Account shard %d/%d is empty.", index + 1, shards_count)
+            return
+        WorkflowManager.trigger_workflows(
+            args=Namespace(
+                **{
+                    **vars(args),
+                    "scope_sa_names": partitions[index],
+                    "shard_phase": WorkflowManager.SHARD_PHASE_SERVICE_ACCOUNTS,
+                }
+            )
+        )
+
+    def run_rest_proxy_shard(index: int):
+        WorkflowManager.trigger_workflows(
+            args=Namespace(
+                **{
+                    **vars(args),
+                    "scope_cluster_shard": (index, shards_count),
+                    "shard_phase": WorkflowManager.SHARD_PHASE_REST_PROXY,
+                }
+            )
+        )
+
+    ran_count = run_shard_stage(leases, SA_SHARD_LEASE, shards_count, run_sa_shard, args.shard_poll_interval_secs)
+    if not args.disable_api_key_creation and any([v.is_rp_user for v in csm_bundle.csm_definitions.sa.values()]):
+        ran_count += run_shard_stage(
+            leases, REST_PROXY_SHARD_LEASE, shards_count, run_rest_proxy_shard, args.shard_poll_interval_secs
+        )
+    LOGGER.info("Runner %s ran %d shard(s) of the sharded run %s.", leases.runner_id, ran_count, leases.run_id)
@@ -1,9 +1,13 @@
-from typing import Set
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
 
 import app_managers.core.types as CoreTypes
 import app_managers.workflow_manager.types as WorkflowTypes
+from app_managers.workflow_manager.access_matrix import CSMAccessAxes, CSMAccessMatrix
 from ccloud_managers.types import CCloudConfigBundle
-from secret_managers.types import CSMSecretsManager
+from secret_managers.types import CSMSecret, CSMSecretsManager
+
+LOGGER = logging.getLogger(__name__)
 
 
 class CSMServiceAccountTasks(WorkflowTypes.CSMConfigDataMap):
@@ -15,7 +19,7 @@ class CSMServiceAccountTasks(WorkflowTypes.CSMConfigDataMap):
         self.refresh_set_values(csm_bundle=self.csm_bundle, ccloud_bundle=self.ccloud_bundle)
 
     def refresh_set_values(self, csm_bundle: CoreTypes.CSMYAMLConfigBundle, ccloud_bundle: CCloudConfigBundle):
-        self.sa_in_def = set([v.name for v in csm_bundle.csm_definitions.sa])
+        self.sa_in_def = set(csm_bundle.csm_definitions.sa.keys())
         self.sa_in_ccloud = set([v.name for v in ccloud_bundle.cc_service_accounts.sa.values()])
 
     def create_service_account_tasks(self):
@@ -31,6 +35,11 @@ class CSMServiceAccountTasks(WorkflowTypes.CSMConfigDataMap):
                 )
 
     def delete_service_account_tasks(self):
+        # Service Accounts are not bound to an environment or a cluster, so a run scoped to some of them cannot
+        # tell if an SA is still needed elsewhere.
+        if self.csm_bundle.csm_scope.limits_clusters():
+            LOGGER.info("Skipping the Service Account cleanup as the run is scoped to environments or clusters.")
+            return
         ignore_sa_id_set = set(self.csm_bundle.csm_configs.ccloud.ignore_service_account_list)
         ignore_sa_names = set(
             [
@@ -52,11 +61,12 @@ class CSMServiceAccountTasks(WorkflowTypes.CSMConfigDataMap):
 
 
 class CSMAPIKeyTasks(WorkflowTypes.CSMConfigDataMap):
-    # The set is a combined string with the format SA.name~ClusterID
-    api_keys_in_def: Set[str] = set()
-    api_keys_in_ccloud: Set[str] = set()
-    create_secrets_req: Set[str] = set()
-    update_secrets_req: Set[str] = set()
+    # The matrices are Service Account x cluster bitsets over the same axes.
+    axes: CSMAccessAxes
+    api_keys_in_def: CSMAccessMatrix
+    api_keys_in_ccloud: CSMAccessMatrix
+    create_secrets_req: CSMAccessMatrix
+    update_secrets_req: CSMAccessMatrix
     secret_bundle: CSMSecretsManager
 
     def __init__(
@@ -67,45 +77,42 @@ class CSMAPIKeyTasks(WorkflowTypes.CSMConfigDataMap):
     ) -> None:
         super().__init__(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
         self.secret_bundle = secret_bundle
+        # The axes are kept across the refreshes, as the secret requests of the API Key creation phase are used by
+        # the secret phases after the refresh of the API Key deletion phase.
+        self.axes = CSMAccessAxes()
+        self.create_secrets_req = CSMAccessMatrix(self.axes)
+        self.update_secrets_req = CSMAccessMatrix(self.axes)
         self.refresh_set_values(csm_bundle=self.csm_bundle, ccloud_bundle=self.ccloud_bundle)
 
     def refresh_set_values(self, csm_bundle: CoreTypes.CSMYAMLConfigBundle, ccloud_bundle: CCloudConfigBundle):
-        for sa in csm_bundle.csm_definitions.sa:
-            if "FORCE_ALL_CLUSTERS" in sa.cluster_list:
-                self.api_keys_in_def.update(
-                    ["~".join([sa.name, v.cluster_id]) for v in ccloud_bundle.cc_clusters.cluster.values()]
-                )
-            else:
-                self.api_keys_in_def.update(["~".join([sa.name, v]) for v in sa.cluster_list])
+        # The matrices are rebuilt from scratch so that the entries removed from the definitions or from CCloud
+        # do not linger when the same task generator is reused across runs.
+        self.api_keys_in_def = CSMAccessMatrix(self.axes)
+        self.api_keys_in_ccloud = CSMAccessMatrix(self.axes)
+        all_clusters_row = self.axes.create_row(ccloud_bundle.cc_clusters.cluster.keys())
+        sa_names: Dict[str, str] = {}
+        for sa in csm_bundle.csm_definitions.sa.values():
+            self.api_keys_in_def.add_row(sa.name, self.find_sa_definition_row(sa, self.axes, all_clusters_row))
             sa_id = ccloud_bundle.cc_service_accounts.find_sa(sa.name)
-            self.api_keys_in_ccloud.update(
-                [
-                    "~".join([sa.name, v.cluster_id])
-                    for v in ccloud_bundle.cc_api_keys.find_keys_with_sa(getattr(sa_id, "resource_id", None))
-                ]
-            )
+            if sa_id:
+                sa_names[sa_id.resource_id] = sa.name
+        # The API Keys of all the Service Accounts in the definitions are looked up together.
+        for k, v in ccloud_bundle.cc_api_keys.find_sa_cluster_pairs(sa_names.keys()):
+            self.api_keys_in_ccloud.add(sa_names[k], v)
 
     def create_api_key_tasks(self):
-        secrets_in_store = set()
-        create_api_keys_req = self.find_items_to_be_created(
-            config_item_names=self.api_keys_in_def, ccloud_item_names=self.api_keys_in_ccloud
-        )
-        secrets_in_store.update(["~".join([v.sa_name, v.cluster_id]) for v in self.secret_bundle.secret.values()])
-        self.create_secrets_req = self.find_items_to_be_created(
-            config_item_names=self.api_keys_in_def, ccloud_item_names=secrets_in_store
-        )
-        self.update_secrets_req = create_api_keys_req.intersection(secrets_in_store)
+        secrets_in_store = CSMAccessMatrix(self.axes)
+        for item in self.secret_bundle.secret.values():
+            secrets_in_store.add(item.sa_name, item.cluster_id)
+        create_api_keys_req = self.api_keys_in_def - self.api_keys_in_ccloud
+        self.create_secrets_req = self.api_keys_in_def - secrets_in_store
+        self.update_secrets_req = create_api_keys_req & secrets_in_store
         # This is needed if the Secret does not exist but an API key exists for the cluster.
         # As the secret cannot be retrieved after the first time its created, there is no way
         # to inject the secret to a Secret store in case of any failures. The API Key will need
         # to be freshly created and synced to the Secret Store.
-        force_api_key_create = self.find_items_to_be_created(
-            config_item_names=self.create_secrets_req, ccloud_item_names=create_api_keys_req
-        )
-        create_api_keys_req.update(force_api_key_create)
-        for item in create_api_keys_req:
-            value = item.split("~", 1)
-            sa_name, cluster_id = value[0], value[1]
+        create_api_keys_req = create_api_keys_req | self.create_secrets_req
+        for sa_name, cluster_id in create_api_keys_req:
             cluster_details = self.ccloud_bundle.cc_clusters.find_cluster(cluster_id)
             # sa_details = self.ccloud_bundle.cc_service_accounts.find_sa(sa_name)
             # api_keys = self.ccloud_bundle.cc_api_keys.find_keys_with_sa_and_cluster(
@@ -122,7 +129,7 @@ class CSMAPIKeyTasks(WorkflowTypes.CSMConfigDataMap):
                 },
             )
 
-    def delete_api_key_tasks(self):
+    def delete_api_key_tasks(self, pending_api_keys: Iterable[str] = ()):
         ignore_sa_list = set(
             [
                 v.name
@@ -130,33 +137,26 @@ class CSMAPIKeyTasks(WorkflowTypes.CSMConfigDataMap):
                 if v.resource_id in self.csm_bundle.csm_configs.ccloud.ignore_service_account_list
             ]
         )
-        # Find Keys that are in ccloud but are not registered in the csm configuration.
-        deletion_eligible_api_keys = self.find_items_to_be_deleted(
-            config_item_names=self.api_keys_in_def, ccloud_item_names=self.api_keys_in_ccloud
-        )
-        # Remove the keys from the above output that should be ignored.
-        deletion_eligible_api_keys = set(
-            [item for item in deletion_eligible_api_keys if item.split("~", 1)[0] not in ignore_sa_list]
-        )
+        # Find Keys that are in ccloud but are not registered in the csm configuration, except the ignored ones.
+        deletion_eligible_api_keys = (self.api_keys_in_ccloud - self.api_keys_in_def).without_sa_names(ignore_sa_list)
         # Check the Secrets for the existing API Keys. This is required to delete the keys that may be existing
-        # in CCloud but may have been rotated or were never stored into secret management layer.
-        curr_secrets = set([str(f"{item.api_key}") for item in self.secret_bundle.secret.values()])
-        # Find keys in ccloud that are older than the config parameter.
-        curr_api_keys = set(
-            [
-                str(k)
-                for k, v in self.ccloud_bundle.cc_api_keys.api_keys.items()
-                if self.ccloud_bundle.cc_api_keys.mins_since_api_key_creation(api_key=k)
-                > self.csm_bundle.csm_configs.ccloud.old_api_keys_deletion_wait_mins
-                and v.owner_id not in self.csm_bundle.csm_configs.ccloud.ignore_service_account_list
-            ]
-        )
-        delete_secret_mismatched_keys = self.find_items_to_be_deleted(
-            config_item_names=curr_secrets, ccloud_item_names=curr_api_keys
-        )
-        for item in deletion_eligible_api_keys:
-            value = item.split("~", 1)
-            sa_name, cluster_id = value[0], value[1]
+        # in CCloud but may have been rotated or were never stored into secret management layer. Only the keys
+        # older than the config parameter are considered; the creation time index (or the columnar inventory)
+        # returns only the keys older than the cutoff, so the newer keys are never looked at. The keys with a known
+        # API Secret (recovered from the run journal, or created earlier by the same process) and the keys still
+        # pending in the run journal are yet to be written to the secret store, so they are not mismatched.
+        pending_api_keys = set(pending_api_keys)
+        delete_secret_mismatched_keys = [
+            v.api_key
+            for v in self.ccloud_bundle.cc_api_keys.find_keys_not_in(
+                api_key_ids=self.secret_bundle.secret_api_keys.keys(),
+                older_than_mins=self.csm_bundle.csm_configs.ccloud.old_api_keys_deletion_wait_mins,
+                ignored_sa_ids=self.csm_bundle.csm_configs.ccloud.ignore_service_account_list,
+            )
+            if not v.api_secret and v.api_key not in pending_api_keys
+        ]
+        delete_secret_mismatched_keys = self.secret_bundle.confirm_api_keys_not_in_store(delete_secret_mismatched_keys)
+        for sa_name, cluster_id in deletion_eligible_api_keys:
             sa_id = self.ccloud_bundle.cc_service_accounts.find_sa(sa_name=sa_name)
             for key in self.ccloud_bundle.cc_api_keys.find_keys_with_sa_and_cluster(
                 sa_id=sa_id, cluster_id=cluster_id
@@ -183,12 +183,39 @@ class CSMAPIKeyTasks(WorkflowTypes.CSMConfigDataMap):
                     },
                 )
 
+    # API Keys older than api_key_rotation_max_age_days, oldest first. Only the API Keys that are in the secret store
+    # and belong to a Service Account in the definitions are rotated, as their secret is what the rotation replaces.
+    def rotate_api_key_tasks(self):
+        ccloud_configs = self.csm_bundle.csm_configs.ccloud
+        for api_key in self.ccloud_bundle.cc_api_keys.find_keys_older_than(
+            mins=ccloud_configs.api_key_rotation_max_age_days * 24 * 60
+        ):
+            if api_key.owner_id in ccloud_configs.ignore_service_account_list:
+                continue
+            if not self.secret_bundle.is_api_key_in_store(api_key.api_key):
+                continue
+            sa_details = self.ccloud_bundle.cc_service_accounts.sa.get(api_key.owner_id, None)
+            if not sa_details or not self.csm_bundle.csm_definitions.find_service_account(sa_details.name):
+                continue
+            yield WorkflowTypes.CSMConfigTask(
+                task_type=WorkflowTypes.CSMConfigTaskType.rotate_task,
+                object_type=WorkflowTypes.CSMConfigObjectType.api_key_type,
+                status=WorkflowTypes.CSMConfigTaskStatus.sts_not_started,
+                task_object={
+                    "sa_name": sa_details.name,
+                    "sa_id": sa_details.resource_id,
+                    "cluster_id": api_key.cluster_id,
+                    "env_id": self.ccloud_bundle.cc_clusters.find_cluster(api_key.cluster_id).env_id,
+                    "api_key": api_key.api_key,
+                },
+            )
+
 
 class CSMSecretManagerTasks(WorkflowTypes.CSMConfigDataMap):
-    create_secrets_req: Set[str]
-    update_secrets_req: Set[str]
-    definition_rest_proxy_users: Set[str]
-    definition_rest_proxy_access_requests: Set[str]
+    create_secrets_req: CSMAccessMatrix
+    update_secrets_req: CSMAccessMatrix
+    definition_rest_proxy_users: CSMAccessMatrix
+    definition_rest_proxy_access_requests: CSMAccessMatrix
     api_key_tasks: CSMAPIKeyTasks
     secret_bundle: CSMSecretsManager
 
@@ -202,36 +229,27 @@ class CSMSecretManagerTasks(WorkflowTypes.CSMConfigDataMap):
         super().__init__(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
         self.api_key_tasks = api_key_tasks
         self.secret_bundle = secret_bundle
-        self.definition_rest_proxy_users = set()
-        self.definition_rest_proxy_access_requests = set()
         self.refresh_set_values(self.api_key_tasks)
 
     def refresh_set_values(self, api_key_tasks: CSMAPIKeyTasks):
-        # the tokens will be in the format SA_NAME~CLUSTER_ID
+        # The matrices share the axes of the API Key tasks.
+        self.axes = api_key_tasks.axes
         self.create_secrets_req = api_key_tasks.create_secrets_req
         self.update_secrets_req = api_key_tasks.update_secrets_req
+        self.definition_rest_proxy_users = CSMAccessMatrix(self.axes)
+        self.definition_rest_proxy_access_requests = CSMAccessMatrix(self.axes)
+        all_clusters_row = self.axes.create_row(self.ccloud_bundle.cc_clusters.cluster.keys())
         # Derive the Rest Proxy User from Definitions file
-        for sa_obj in self.csm_bundle.csm_definitions.sa:
-            if "FORCE_ALL_CLUSTERS" in sa_obj.cluster_list:
-                cluster_list = set([item.cluster_id for item in self.ccloud_bundle.cc_clusters.cluster.values()])
-            else:
-                cluster_list = set(sa_obj.cluster_list)
+        for sa_obj in self.csm_bundle.csm_definitions.sa.values():
+            if not sa_obj.is_rp_user and not sa_obj.rp_access:
+                continue
+            row = self.find_sa_definition_row(sa_obj, self.axes, all_clusters_row)
             if sa_obj.is_rp_user:
-                self.definition_rest_proxy_users.update(
-                    set([str(f"{sa_obj.name}~{cluster}") for cluster in cluster_list])
-                )
-                self.definition_rest_proxy_access_requests.update(
-                    set([str(f"{sa_obj.name}~{cluster}") for cluster in cluster_list])
-                )
-            if sa_obj.rp_access:
-                self.definition_rest_proxy_access_requests.update(
-                    set([str(f"{sa_obj.name}~{cluster}") for cluster in cluster_list])
-                )
+                self.definition_rest_proxy_users.add_row(sa_obj.name, row)
+            self.definition_rest_proxy_access_requests.add_row(sa_obj.name, row)
 
     def create_secret_tasks(self):
-        for item in self.create_secrets_req:
-            value = item.split("~", 1)
-            sa_name, cluster_id = value[0], value[1]
+        for sa_name, cluster_id in self.create_secrets_req:
             cluster_details = self.ccloud_bundle.cc_clusters.find_cluster(cluster_id)
             sa_definition = self.csm_bundle.csm_definitions.find_service_account(sa_name)
             yield WorkflowTypes.CSMConfigTask(
@@ -248,9 +266,7 @@ class CSMSecretManagerTasks(WorkflowTypes.CSMConfigDataMap):
             )
 
     def update_secret_tasks(self):
-        for item in self.update_secrets_req:
-            value = item.split("~", 1)
-            sa_name, cluster_id = value[0], value[1]
+        for sa_name, cluster_id in self.update_secrets_req:
             cluster_details = self.ccloud_bundle.cc_clusters.find_cluster(cluster_id)
             sa_definition = self.csm_bundle.csm_definitions.find_service_account(sa_name)
             yield WorkflowTypes.CSMConfigTask(
@@ -267,51 +283,38 @@ class CSMSecretManagerTasks(WorkflowTypes.CSMConfigDataMap):
             )
 
     def update_secret_tags_tasks(self):
-        secret_rp_access_true = set(
-            [
-                str(f"{v.sa_name}~{v.cluster_id}")
-                for v in self.secret_bundle.secret.values()
-                if v.rp_access
-                and not v.secret_name.endswith(self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name)
-            ]
+        secret_rp_access_true = CSMAccessMatrix(self.axes)
+        secret_rp_access_false = CSMAccessMatrix(self.axes)
+        secrets_by_pair: Dict[Tuple[str, str], List[CSMSecret]] = {}
+        for v in self.secret_bundle.secret.values():
+            if not v.secret_name.endswith(self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name):
+                (secret_rp_access_true if v.rp_access else secret_rp_access_false).add(v.sa_name, v.cluster_id)
+                secrets_by_pair.setdefault((v.sa_name, v.cluster_id), []).append(v)
+        # Find the secrets that have the tags set to False but the definition file requests it to be true, and the
+        # secrets that have the tags set to True but the definition file requests it to be False.
+        action_items = (secret_rp_access_false & self.definition_rest_proxy_access_requests) | (
+            secret_rp_access_true - self.definition_rest_proxy_access_requests
         )
-        secret_rp_access_false = set(
-            [
-                str(f"{v.sa_name}~{v.cluster_id}")
-                for v in self.secret_bundle.secret.values()
-                if not v.rp_access
-                and not v.secret_name.endswith(self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name)
-            ]
-        )
-        # Find the secrets that have the tags set to False but the definition file requests it to be true.
-        action_items = secret_rp_access_false.intersection(self.definition_rest_proxy_access_requests)
-        # find the secrets that have the tags set to True but the definition file requests it to be False
-        action_items.update(secret_rp_access_true.difference(self.definition_rest_proxy_access_requests))
 
+        # The shards of a sharded REST Proxy secret are skipped as the manifest carries the aggregated count.
         rp_secrets = [
             v
             for v in self.secret_bundle.secret.values()
-            if v.secret_name.endswith(self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name)
+            if v.secret_name.endswith(self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name) and not v.rp_shard_of
         ]
+        # The secrets of the Service Accounts outside the scope are not loaded, so the counts cannot be compared.
+        if self.csm_bundle.csm_scope.limits_sa():
+            rp_secrets = []
         for rp_secret in rp_secrets:
-            def_requests = [v for v in self.definition_rest_proxy_access_requests if v.endswith(rp_secret.cluster_id)]
+            def_requests = self.definition_rest_proxy_access_requests.find_cluster_column(rp_secret.cluster_id)
             api_keys_expected_count = len(def_requests)
             api_key_actual_count = rp_secret.api_keys_count.split("--", 1)
             fe_key_count, kafka_key_count = int(api_key_actual_count[0]), int(api_key_actual_count[1])
             if api_keys_expected_count != fe_key_count or api_keys_expected_count != kafka_key_count:
-                action_items.update(def_requests)
+                action_items = action_items | def_requests
 
-        for item in action_items:
-            value = item.split("~", 1)
-            sa_name, cluster_id = value[0], value[1]
-            secret_details = [
-                v
-                for v in self.secret_bundle.secret.values()
-                if v.cluster_id == cluster_id
-                and v.sa_name == sa_name
-                and not v.secret_name.endswith(self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name)
-            ]
-            for secret in secret_details:
+        for sa_name, cluster_id in action_items:
+            for secret in secrets_by_pair.get((sa_name, cluster_id), []):
                 yield WorkflowTypes.CSMConfigTask(
                     task_type=WorkflowTypes.CSMConfigTaskType.update_task,
                     object_type=WorkflowTypes.CSMConfigObjectType.secret_tags_type,
@@ -320,32 +323,40 @@ class CSMSecretManagerTasks(WorkflowTypes.CSMConfigDataMap):
                         "sa_name": secret.sa_name,
                         "sa_id": secret.sa_id,
                         "cluster_id": cluster_id,
-                        "rest_proxy_access": True if item in self.definition_rest_proxy_access_requests else False,
+                        "rest_proxy_access": (sa_name, cluster_id) in self.definition_rest_proxy_access_requests,
                         "secret_name": secret.secret_name,
                     },
                 )
 
+    # The new API Keys and the secrets waiting for a REST Proxy sync are grouped by cluster once per call, so that
+    # every REST Proxy user only looks up its own cluster.
     def upsert_rest_proxy_secret_tasks(self):
-        for item in self.definition_rest_proxy_users:
-            value = item.split("~", 1)
-            sa_name, cluster_id = value[0], value[1]
+        new_api_keys: Dict[str, List[str]] = {}
+        for item in self.secret_bundle._get_new_rest_proxy_api_keys():
+            new_api_keys.setdefault(item.cluster_id, []).append(item.api_key)
+        secrets_with_rp_access: Dict[str, List[str]] = {}
+        for item in self.secret_bundle.secret.values():
+            if item.rp_access and item.sync_needed_for_rp:
+                secrets_with_rp_access.setdefault(item.cluster_id, []).append(item.secret_name)
+        for sa_name, cluster_id in self.definition_rest_proxy_users:
             secret_name, sa_details, cluster_details = self.secret_bundle._get_rest_proxy_user(
                 sa_name=sa_name, cluster_id=cluster_id
             )
-            current_run_api_keys = [
-                item.api_key
-                for item in self.secret_bundle._get_new_rest_proxy_api_keys()
-                if item.cluster_id == cluster_id
-            ]
-            current_secrets_with_rp_access = [
-                item.secret_name
-                for item in self.secret_bundle.secret.values()
-                if item.rp_access and item.sync_needed_for_rp and item.cluster_id == cluster_id
-            ]
-            if current_run_api_keys or current_secrets_with_rp_access:
+            current_run_api_keys = list(new_api_keys.get(cluster_id, []))
+            current_secrets_with_rp_access = list(secrets_with_rp_access.get(cluster_id, []))
+            is_rp_secret_present = self.secret_bundle.secret.get(secret_name, None) is not None
+            # The existing REST Proxy secrets are always compacted if the cleanup is enabled, even if nothing is added.
+            # The entitled API Keys are only known for the Service Accounts in scope, so no user is pruned in
+            # a run scoped to some Service Accounts.
+            prune_users = (
+                self.csm_bundle.csm_configs.ccloud.enable_rest_proxy_user_cleanup
+                and is_rp_secret_present
+                and not self.csm_bundle.csm_scope.limits_sa()
+            )
+            if current_run_api_keys or current_secrets_with_rp_access or prune_users:
                 yield WorkflowTypes.CSMConfigTask(
                     task_type=WorkflowTypes.CSMConfigTaskType.update_task
-                    if self.secret_bundle.secret.get(secret_name, None) is not None
+                    if is_rp_secret_present
                     else WorkflowTypes.CSMConfigTaskType.create_task,
                     object_type=WorkflowTypes.CSMConfigObjectType.rest_proxy_user_type,
                     status=WorkflowTypes.CSMConfigTaskStatus.sts_not_started,
@@ -356,5 +367,23 @@ class CSMSecretManagerTasks(WorkflowTypes.CSMConfigDataMap):
                         "cluster_details": cluster_details,
                         "api_keys": current_run_api_keys,
                         "secrets_with_rp_access": current_secrets_with_rp_access,
+                        "prune_users": prune_users,
                     },
                 )
+
+    # Lists the API Keys that are allowed to stay in the REST Proxy users, grouped by cluster. These are all the live
+    # API Keys in CCloud for the cluster that belong to an SA with REST Proxy access to the cluster in the definitions.
+    def rest_proxy_entitled_api_keys(self) -> Dict[str, Set[str]]:
+        sa_ids: Dict[str, str] = {}
+        entitled_sa_ids: Dict[str, Set[str]] = {}
+        for sa_name, cluster_id in self.definition_rest_proxy_access_requests:
+            if sa_name not in sa_ids:
+                sa_details = self.ccloud_bundle.cc_service_accounts.find_sa(sa_name)
+                sa_ids[sa_name] = sa_details.resource_id if sa_details else None
+            if sa_ids[sa_name]:
+                entitled_sa_ids.setdefault(cluster_id, set()).add(sa_ids[sa_name])
+        output: Dict[str, Set[str]] = {}
+        for v in self.ccloud_bundle.cc_api_keys.api_keys.values():
+            if v.owner_id in entitled_sa_ids.get(v.cluster_id, ()):
+                output.setdefault(v.cluster_id, set()).add(v.api_key)
+        return output
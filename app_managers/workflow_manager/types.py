@@ -1,9 +1,13 @@
+import logging
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Set
+from typing import Dict, List, Set
 import app_managers.core.types as CoreTypes
+from app_managers.workflow_manager.access_matrix import CSMAccessAxes
 from ccloud_managers.types import CCloudConfigBundle
 
+LOGGER = logging.getLogger(__name__)
+
 
 class CSMConfigTaskStatus(Enum):
     sts_not_started = "Not Started"
@@ -16,6 +20,7 @@ class CSMConfigTaskType(Enum):
     create_task = "create"
     update_task = "update"
     delete_task = "delete"
+    rotate_task = "rotate"
 
 
 class CSMConfigObjectType(Enum):
@@ -34,15 +39,15 @@ class CSMConfigTask:
     status_message: str = field(default="Waiting to start")
     task_object: dict = field(default_factory=dict)
 
+    # One line per task at debug level; the workflows log the task counts at info level.
     def print_task_data(self):
-        print(
-            "{:<10} {:<17} {:<15} {:<30} {:<50}".format(
-                self.task_type.value,
-                self.object_type.value,
-                self.status.value,
-                self.status_message,
-                str(self.task_object),
-            )
+        LOGGER.debug(
+            "%-10s %-17s %-15s %-30s %-50s",
+            self.task_type.value,
+            self.object_type.value,
+            self.status.value,
+            self.status_message,
+            self.task_object,
         )
 
     def set_task_status(self, task_status, status_msg: str, object_payload: dict = None):
@@ -53,6 +58,56 @@ class CSMConfigTask:
         self.print_task_data()
 
 
+# Outcome of the cascade deletion of one Service Account along with its API Keys and secrets.
+@dataclass(kw_only=True)
+class CSMCascadeDeleteResult:
+    sa_name: str
+    sa_id: str
+    api_keys: List[str] = field(default_factory=list)
+    secrets: List[str] = field(default_factory=list)
+    deleted_api_keys: int = field(default=0)
+    deleted_secrets: int = field(default=0)
+    status: CSMConfigTaskStatus = field(default=CSMConfigTaskStatus.sts_not_started)
+    errors: List[str] = field(default_factory=list)
+
+
+# Task counts per status for one workflow. In a dry run the tasks are only planned and keep the Not Started status.
+def log_task_summary(workflow_name: str, tasks: List[CSMConfigTask], dry_run: bool):
+    counts: Dict[str, int] = {}
+    for item in tasks:
+        counts[item.status.value] = counts.get(item.status.value, 0) + 1
+    LOGGER.info(
+        "%s: %d task(s)%s%s",
+        workflow_name,
+        len(tasks),
+        " planned (dry run)" if dry_run else "",
+        "".join(f"; {k}: {v}" for k, v in counts.items()) if not dry_run else "",
+    )
+
+
+def print_cascade_delete_report(results: List[CSMCascadeDeleteResult]):
+    LOGGER.debug(
+        "{:<40} {:<15} {:<12} {:<12} {:<15}".format("Service Account", "SA ID", "API Keys", "Secrets", "Status")
+    )
+    for item in results:
+        LOGGER.debug(
+            "{:<40} {:<15} {:<12} {:<12} {:<15}".format(
+                item.sa_name,
+                item.sa_id,
+                f"{item.deleted_api_keys}/{len(item.api_keys)}",
+                f"{item.deleted_secrets}/{len(item.secrets)}",
+                item.status.value,
+            )
+        )
+        for error in item.errors:
+            LOGGER.error("    Error: %s", error)
+    failed = len([v for v in results if v.status == CSMConfigTaskStatus.sts_failed])
+    LOGGER.info(
+        f"{len(results)} Service Account(s), {sum([len(v.api_keys) for v in results])} API Key(s) and "
+        + f"{sum([len(v.secrets) for v in results])} secret(s) in scope; {failed} Service Account(s) failed."
+    )
+
+
 class CSMConfigDataMap:
     csm_bundle: CoreTypes.CSMYAMLConfigBundle
     ccloud_bundle: CCloudConfigBundle
@@ -69,3 +124,17 @@ class CSMConfigDataMap:
 
     def find_common_items(self, config_item_names: set[str], ccloud_item_names: set[str]) -> Set[str]:
         return set(config_item_names.intersection(ccloud_item_names))
+
+    # The clusters that the Service Account definition asks API Keys for, as a row of an access matrix.
+    # FORCE_ALL_CLUSTERS is the row of all the clusters in the cache, which the caller computes once for all the
+    # Service Accounts. In a run scoped to some environments or clusters, only the clusters in scope (the ones in
+    # the cluster cache) are set.
+    def find_sa_definition_row(
+        self, sa_definition: CoreTypes.CSMYAMLServiceAccounts, axes: CSMAccessAxes, all_clusters_row: int
+    ) -> int:
+        if "FORCE_ALL_CLUSTERS" in sa_definition.cluster_list:
+            return all_clusters_row
+        row = axes.create_row(sa_definition.cluster_list)
+        if self.csm_bundle.csm_scope.limits_clusters():
+            return row & all_clusters_row
+        return row
@@ -1,13 +1,27 @@
 import itertools
+import logging
+import time
 from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
 
 import app_managers.core.types as CoreTypes
+import app_managers.rate_limiter as RateLimiter
+from app_managers.workflow_manager.journal import CSMRunJournal
 from app_managers.workflow_manager.task_generator import CSMAPIKeyTasks, CSMSecretManagerTasks, CSMServiceAccountTasks
-from app_managers.workflow_manager.types import CSMConfigTaskStatus, CSMConfigTaskType
+from app_managers.workflow_manager.types import (
+    CSMCascadeDeleteResult,
+    CSMConfigTask,
+    CSMConfigTaskStatus,
+    CSMConfigTaskType,
+    log_task_summary,
+    print_cascade_delete_report,
+)
 from ccloud_managers.types import CCloudConfigBundle
 from secret_managers.types import CSMSecretsManager
 from app_managers.helpers import printline
 
+LOGGER = logging.getLogger(__name__)
+
 
 @dataclass(kw_only=True)
 class WorkflowManager:
@@ -15,6 +29,10 @@ class WorkflowManager:
     ccloud_bundle: CCloudConfigBundle
     secret_bundle: CSMSecretsManager
     dry_run: bool
+    # Every completed mutation is recorded in the run journal, if one is provided.
+    journal: CSMRunJournal = None
+    # The Service Account shards of a sharded run leave the REST Proxy secrets to the cluster shards.
+    skip_rest_proxy_update: bool = False
     sa_tasks: CSMServiceAccountTasks = field(init=False)
     api_key_tasks: CSMAPIKeyTasks = field(init=False)
     secret_tasks: CSMSecretManagerTasks = field(init=False)
@@ -31,18 +49,29 @@ class WorkflowManager:
             secret_bundle=self.secret_bundle,
         )
 
+    # Logs every task of a workflow at debug level as it is handed out and the task counts per status at info level
+    # once the workflow went through all of them.
+    def __track_tasks(self, workflow_name: str, tasks: Iterable[CSMConfigTask]) -> Iterator[CSMConfigTask]:
+        seen: List[CSMConfigTask] = []
+        for item in tasks:
+            item.print_task_data()
+            seen.append(item)
+            yield item
+        log_task_summary(workflow_name, seen, self.dry_run)
+
     def create_service_accounts(self):
         printline()
-        print(f"Triggering Service Account creation Workflow. Dry Run flag: {self.dry_run}")
+        LOGGER.info("Triggering Service Account creation Workflow. Dry Run flag: %s", self.dry_run)
         self.sa_tasks.refresh_set_values(csm_bundle=self.csm_bundle, ccloud_bundle=self.ccloud_bundle)
-        for item in self.sa_tasks.create_service_account_tasks():
-            item.print_task_data()
+        for item in self.__track_tasks("Service Account creation", self.sa_tasks.create_service_account_tasks()):
             if not self.dry_run:
                 new_sa, is_success = self.ccloud_bundle.cc_service_accounts.create_sa(
                     sa_name=item.task_object["sa_name"],
                     description=item.task_object["description"],
                 )
                 if is_success:
+                    if self.journal:
+                        self.journal.sa_created(sa_name=new_sa.name, sa_id=new_sa.resource_id)
                     item.set_task_status(
                         task_status=CSMConfigTaskStatus.sts_success,
                         status_msg="Service Account Creation Succeeded.",
@@ -51,28 +80,120 @@ class WorkflowManager:
 
     def delete_service_accounts(self):
         printline()
-        print(f"Triggering Service Account deletion Workflow. Dry Run flag: {self.dry_run}")
+        LOGGER.info("Triggering Service Account deletion Workflow. Dry Run flag: %s", self.dry_run)
         self.sa_tasks.refresh_set_values(csm_bundle=self.csm_bundle, ccloud_bundle=self.ccloud_bundle)
-        for item in self.sa_tasks.delete_service_account_tasks():
-            item.print_task_data()
+        if self.csm_bundle.csm_configs.ccloud.enable_sa_cascade_delete:
+            self.cascade_delete_service_accounts(list(self.sa_tasks.delete_service_account_tasks()))
+            return
+        for item in self.__track_tasks("Service Account deletion", self.sa_tasks.delete_service_account_tasks()):
             if not self.dry_run:
                 sa_id = self.ccloud_bundle.cc_service_accounts.find_sa(item.task_object["sa_name"]).resource_id
                 is_success = self.ccloud_bundle.cc_service_accounts.delete_sa(item.task_object["sa_name"])
                 if is_success:
+                    if self.journal:
+                        self.journal.sa_deleted(sa_name=item.task_object["sa_name"], sa_id=sa_id)
                     item.set_task_status(
                         task_status=CSMConfigTaskStatus.sts_success,
                         status_msg="Service Account deletion Succeeded.",
                         object_payload={"sa_id": sa_id, "sa_name": item.task_object["sa_name"]},
                     )
 
+    # Deletes the Service Accounts along with their API Keys and secrets, one batch of Service Accounts at a time.
+    # The API Keys and the secrets of the whole batch are deleted concurrently first, and the Service Accounts are
+    # deleted last, so a Service Account is only deleted once nothing that refers to it is left behind. A Service
+    # Account with a failed API Key or secret deletion is left in place and reported.
+    def cascade_delete_service_accounts(self, tasks: List[CSMConfigTask]):
+        sa_ids = [v.task_object["sa_id"] for v in tasks]
+        secret_names = self.secret_bundle.find_secret_names_with_sa_ids(sa_ids)
+        results = [
+            CSMCascadeDeleteResult(
+                sa_name=v.task_object["sa_name"],
+                sa_id=v.task_object["sa_id"],
+                api_keys=self.ccloud_bundle.cc_api_keys.find_api_key_ids_with_sa(v.task_object["sa_id"]),
+                secrets=secret_names[v.task_object["sa_id"]],
+            )
+            for v in tasks
+        ]
+        if not self.dry_run:
+            batch_size = self.csm_bundle.csm_configs.ccloud.sa_cascade_delete_batch_size
+            for i in range(0, len(results), batch_size):
+                batch = results[i : i + batch_size]
+                LOGGER.info("Deleting Service Account batch %d with %d SA(s).", i // batch_size + 1, len(batch))
+                self.__cascade_delete_batch(batch)
+        print_cascade_delete_report(results)
+        failed = [v.sa_name for v in results if v.status == CSMConfigTaskStatus.sts_failed]
+        if failed:
+            raise Exception(f"Cascade deletion failed for the Service Account(s): {', '.join(failed)}")
+
+    def __cascade_delete_batch(self, batch: List[CSMCascadeDeleteResult]):
+        items = [(v, k) for v in batch for k in v.api_keys]
+        for (result, _), is_success in zip(items, self.__cascade_delete_step(items, self.__delete_api_key, "API Key")):
+            result.deleted_api_keys += is_success
+        items = [(v, k) for v in batch for k in v.secrets]
+        for (result, _), is_success in zip(items, self.__cascade_delete_step(items, self.__delete_secret, "Secret")):
+            result.deleted_secrets += is_success
+        items = [(v, v.sa_id) for v in batch if not v.errors]
+        for (result, _), is_success in zip(items, self.__cascade_delete_step(items, self.__delete_sa, "SA")):
+            result.status = CSMConfigTaskStatus.sts_success if is_success else CSMConfigTaskStatus.sts_failed
+        for result in [v for v in batch if v.errors]:
+            result.status = CSMConfigTaskStatus.sts_failed
+
+    # Runs the deletions concurrently. A failure is recorded against its Service Account instead of stopping the batch.
+    def __cascade_delete_step(
+        self, items: List[Tuple[CSMCascadeDeleteResult, str]], delete_func: Callable, object_label: str
+    ) -> List[bool]:
+        def run(item: Tuple[CSMCascadeDeleteResult, str]) -> bool:
+            result, object_id = item
+            try:
+                return delete_func(object_id)
+            except Exception as e:
+                result.errors.append(f"{object_label} {object_id}: {e}")
+                return False
+
+        return RateLimiter.map_concurrently(run, items)
+
+    def __delete_api_key(self, api_key: str) -> bool:
+        is_success = self.ccloud_bundle.cc_api_keys.delete_api_key_with_api(api_key=api_key)
+        if self.journal:
+            self.journal.api_key_deleted(api_key=api_key)
+        return is_success
+
+    def __delete_secret(self, secret_name: str) -> bool:
+        is_success = self.secret_bundle.delete_secret(secret_name=secret_name)
+        if self.journal:
+            self.journal.secret_deleted(secret_name=secret_name)
+        return is_success
+
+    def __delete_sa(self, sa_id: str) -> bool:
+        sa_name = self.ccloud_bundle.cc_service_accounts.sa[sa_id].name
+        is_success = self.ccloud_bundle.cc_service_accounts.delete_sa_by_id(sa_id=sa_id)
+        if self.journal:
+            self.journal.sa_deleted(sa_name=sa_name, sa_id=sa_id)
+        return is_success
+
     def create_api_keys(self):
         printline()
-        print(f"Triggering API Key creation workflow. Dry Run flag: {self.dry_run}")
+        LOGGER.info("Triggering API Key creation workflow. Dry Run flag: %s", self.dry_run)
         self.api_key_tasks.refresh_set_values(csm_bundle=self.csm_bundle, ccloud_bundle=self.ccloud_bundle)
-        for item in self.api_key_tasks.create_api_key_tasks():
-            item.print_task_data()
+        for item in self.__track_tasks("API Key creation", self.api_key_tasks.create_api_key_tasks()):
             if not self.dry_run:
                 sa_details = self.ccloud_bundle.cc_service_accounts.find_sa(item.task_object["sa_name"])
+                # An API Key with a known API Secret (recovered from the run journal, or created by an earlier
+                # reconcile of the same process) only needs to be written to the secret store.
+                recovered_keys = [
+                    v.api_key
+                    for v in self.ccloud_bundle.cc_api_keys.find_keys_with_sa_and_cluster(
+                        sa_details.resource_id, item.task_object["cluster_id"]
+                    )
+                    if v.api_secret
+                ]
+                if recovered_keys:
+                    item.set_task_status(
+                        task_status=CSMConfigTaskStatus.sts_success,
+                        status_msg="API Key secret already available.",
+                        object_payload={**item.task_object, "api_key": recovered_keys[0]},
+                    )
+                    continue
                 new_api_key, is_success = self.ccloud_bundle.cc_api_keys.create_api_key(
                     env_id=item.task_object["env_id"],
                     cluster_id=item.task_object["cluster_id"],
@@ -81,6 +202,15 @@ class WorkflowManager:
                     description=f"API Key for sa {sa_details.resource_id} created by the CI/CD workflow",
                 )
                 if is_success:
+                    if self.journal:
+                        self.journal.api_key_created(
+                            api_key=new_api_key["key"],
+                            api_secret=new_api_key["secret"],
+                            sa_name=sa_details.name,
+                            sa_id=sa_details.resource_id,
+                            env_id=item.task_object["env_id"],
+                            cluster_id=item.task_object["cluster_id"],
+                        )
                     item.set_task_status(
                         task_status=CSMConfigTaskStatus.sts_success,
                         status_msg="API Key creation succeeded.",
@@ -93,25 +223,120 @@ class WorkflowManager:
 
     def delete_api_keys(self):
         printline()
-        print(f"Triggering API Key deletion workflow. Dry Run flag: {self.dry_run}")
+        LOGGER.info("Triggering API Key deletion workflow. Dry Run flag: %s", self.dry_run)
         self.api_key_tasks.refresh_set_values(csm_bundle=self.csm_bundle, ccloud_bundle=self.ccloud_bundle)
-        for item in self.api_key_tasks.delete_api_key_tasks():
-            item.print_task_data()
+        pending_api_keys = self.journal.pending_api_keys().keys() if self.journal else ()
+        for item in self.__track_tasks(
+            "API Key deletion", self.api_key_tasks.delete_api_key_tasks(pending_api_keys=pending_api_keys)
+        ):
             if not self.dry_run:
                 is_success = self.ccloud_bundle.cc_api_keys.delete_api_key(api_key=item.task_object["api_key"])
                 if is_success:
+                    if self.journal:
+                        self.journal.api_key_deleted(api_key=item.task_object["api_key"])
                     item.set_task_status(
                         task_status=CSMConfigTaskStatus.sts_success,
                         status_msg="API Key deletion succeeded.",
                         object_payload=item.task_object,
                     )
 
+    # Rotates the API Keys older than api_key_rotation_max_age_days in waves of api_key_rotation_wave_size, with a
+    # pause of api_key_rotation_wave_interval_secs between the waves. A wave creates the new API Keys and writes them
+    # to their secrets (and to the REST Proxy users). The old API Keys stay valid for the grace period, so the
+    # consumers can reload the credentials while both work. They are deleted between the later waves once their
+    # grace period is over, and the run waits for the grace period of the last wave before it ends.
+    def rotate_api_keys(self):
+        printline()
+        LOGGER.info("Triggering API Key rotation workflow. Dry Run flag: %s", self.dry_run)
+        ccloud_configs = self.csm_bundle.csm_configs.ccloud
+        tasks = list(self.api_key_tasks.rotate_api_key_tasks())
+        for item in tasks:
+            item.print_task_data()
+        wave_size = ccloud_configs.api_key_rotation_wave_size
+        waves = [tasks[i : i + wave_size] for i in range(0, len(tasks), wave_size)]
+        LOGGER.info("%d API Key(s) to rotate in %d wave(s).", len(tasks), len(waves))
+        retiring: List[Tuple[float, List[CSMConfigTask]]] = []
+        for i, wave in enumerate(waves):
+            if self.dry_run:
+                break
+            if i > 0:
+                time.sleep(ccloud_configs.api_key_rotation_wave_interval_secs)
+            self.__delete_retired_api_keys(retiring, wait=False)
+            LOGGER.info("Rotating API Key wave %d/%d with %d API Key(s).", i + 1, len(waves), len(wave))
+            rotated = [v for v in wave if self.__rotate_api_key(v)]
+            # The REST Proxy users get the new API Keys in the same wave. The old ones are pruned once deleted.
+            sa_definitions = self.csm_bundle.csm_definitions.sa
+            if any([sa_definitions[v.task_object["sa_name"]].rp_access for v in rotated]):
+                self.update_rest_proxy_api_keys_in_secret_manager()
+            retiring.append((time.monotonic() + ccloud_configs.api_key_rotation_grace_period_secs, rotated))
+        self.__delete_retired_api_keys(retiring, wait=True)
+        log_task_summary("API Key rotation", tasks, self.dry_run)
+
+    # Creates the new API Key and writes it to the secret of the old one. The API Keys are created one at a time, as
+    # the CLI creates them in the environment and cluster it was last set to. A failed rotation keeps the old API Key.
+    def __rotate_api_key(self, item: CSMConfigTask) -> bool:
+        try:
+            new_api_key, _ = self.ccloud_bundle.cc_api_keys.create_api_key(
+                env_id=item.task_object["env_id"],
+                cluster_id=item.task_object["cluster_id"],
+                sa_id=item.task_object["sa_id"],
+                sa_name=item.task_object["sa_name"],
+                description=f"API Key for sa {item.task_object['sa_id']} created by the rotation workflow",
+            )
+            if self.journal:
+                self.journal.api_key_created(
+                    api_key=new_api_key["key"],
+                    api_secret=new_api_key["secret"],
+                    sa_name=item.task_object["sa_name"],
+                    sa_id=item.task_object["sa_id"],
+                    env_id=item.task_object["env_id"],
+                    cluster_id=item.task_object["cluster_id"],
+                )
+            resp = self.secret_bundle.create_or_update_secret(
+                api_key=self.ccloud_bundle.cc_api_keys.api_keys[new_api_key["key"]]
+            )
+            if self.journal:
+                self.journal.secret_persisted(api_key=new_api_key["key"], secret_name=resp.secret_name)
+        except Exception as e:
+            LOGGER.exception("Rotation of the API Key %s failed.", item.task_object["api_key"])
+            item.set_task_status(task_status=CSMConfigTaskStatus.sts_failed, status_msg=f"Rotation failed: {e}")
+            return False
+        item.set_task_status(
+            task_status=CSMConfigTaskStatus.sts_in_progress,
+            status_msg="New API Key in the secret store. The old API Key is deleted after the grace period.",
+            object_payload={**item.task_object, "new_api_key": new_api_key["key"], "secret_name": resp.secret_name},
+        )
+        return True
+
+    # Deletes the old API Keys of the waves whose grace period is over. With wait, it waits for the grace period of
+    # every remaining wave instead.
+    def __delete_retired_api_keys(self, retiring: List[Tuple[float, List[CSMConfigTask]]], wait: bool):
+        while retiring and (wait or retiring[0][0] <= time.monotonic()):
+            deadline, tasks = retiring.pop(0)
+            wait_secs = deadline - time.monotonic()
+            if wait_secs > 0 and tasks:
+                LOGGER.info("Waiting %.1fs for the grace period of %d rotated API Key(s).", wait_secs, len(tasks))
+                time.sleep(wait_secs)
+            RateLimiter.map_concurrently(self.__retire_api_key, tasks)
+
+    def __retire_api_key(self, item: CSMConfigTask):
+        try:
+            self.__delete_api_key(item.task_object["api_key"])
+        except Exception as e:
+            item.set_task_status(
+                task_status=CSMConfigTaskStatus.sts_failed, status_msg=f"Deletion of the old API Key failed: {e}"
+            )
+            return
+        item.set_task_status(task_status=CSMConfigTaskStatus.sts_success, status_msg="API Key rotated.")
+
     def update_api_keys_in_secret_manager(self):
         printline()
-        print(f"Triggering Secret Manager Update workflow. Dry Run flag: {self.dry_run}")
+        LOGGER.info("Triggering Secret Manager Update workflow. Dry Run flag: %s", self.dry_run)
         self.secret_tasks.refresh_set_values(api_key_tasks=self.api_key_tasks)
-        for item in itertools.chain(self.secret_tasks.create_secret_tasks(), self.secret_tasks.update_secret_tasks()):
-            item.print_task_data()
+        secret_tasks = itertools.chain(
+            self.secret_tasks.create_secret_tasks(), self.secret_tasks.update_secret_tasks()
+        )
+        for item in self.__track_tasks("Secret Manager update", secret_tasks):
             if not self.dry_run:
                 sa_details = self.ccloud_bundle.cc_service_accounts.find_sa(item.task_object["sa_name"])
                 api_key_details = self.ccloud_bundle.cc_api_keys.find_keys_with_sa_and_cluster(
@@ -120,6 +345,8 @@ class WorkflowManager:
                 for api_key in api_key_details:
                     if api_key.api_secret:
                         resp = self.secret_bundle.create_or_update_secret(api_key=api_key)
+                        if self.journal:
+                            self.journal.secret_persisted(api_key=api_key.api_key, secret_name=resp.secret_name)
                         item.set_task_status(
                             task_status=CSMConfigTaskStatus.sts_success,
                             status_msg="Secret Updated Successfully",
@@ -134,18 +361,18 @@ class WorkflowManager:
 
     def update_tags_in_secret_manager(self) -> bool:
         printline()
-        print(f"Triggering Secret Manager Rest Proxy Tags Reconciliation workflow. Dry Run flag: {self.dry_run}")
+        LOGGER.info(
+            "Triggering Secret Manager Rest Proxy Tags Reconciliation workflow. Dry Run flag: %s", self.dry_run
+        )
         self.secret_tasks.refresh_set_values(api_key_tasks=self.api_key_tasks)
-        for item in self.secret_tasks.update_secret_tags_tasks():
-            item.print_task_data()
+        for item in self.__track_tasks("Secret Manager tags update", self.secret_tasks.update_secret_tags_tasks()):
             if not self.dry_run:
                 self.secret_bundle.add_tags(
                     secret_name=item.task_object["secret_name"],
                     tags={"rest_proxy_access": item.task_object["rest_proxy_access"], "sync_needed_for_rp": True},
                 )
-                secret_details = self.secret_bundle.secret[item.task_object["secret_name"]]
-                secret_details.sync_needed_for_rp = True
-                secret_details.rp_access = item.task_object["rest_proxy_access"]
+                if self.journal:
+                    self.journal.secret_tags_updated(secret_name=item.task_object["secret_name"])
                 item.set_task_status(
                     task_status=CSMConfigTaskStatus.sts_success,
                     status_msg="Secret Tags Updated Successfully",
@@ -154,10 +381,32 @@ class WorkflowManager:
 
     def update_rest_proxy_api_keys_in_secret_manager(self) -> bool:
         printline()
-        print(f"Triggering Rest Proxy Update workflow. Dry Run flag: {self.dry_run}")
+        if self.skip_rest_proxy_update:
+            LOGGER.info("Skipping the Rest Proxy Update workflow, the REST Proxy secrets are updated by their shards.")
+            return
+        LOGGER.info("Triggering Rest Proxy Update workflow. Dry Run flag: %s", self.dry_run)
         self.secret_tasks.refresh_set_values(api_key_tasks=self.api_key_tasks)
-        for item in self.secret_tasks.upsert_rest_proxy_secret_tasks():
-            item.print_task_data()
+        entitled_api_keys: Dict[str, Set[str]] = None
+        for item in self.__track_tasks("REST Proxy update", self.secret_tasks.upsert_rest_proxy_secret_tasks()):
+            retained_api_keys = None
+            if item.task_object["prune_users"]:
+                if entitled_api_keys is None:
+                    entitled_api_keys = self.secret_tasks.rest_proxy_entitled_api_keys()
+                retained_api_keys = entitled_api_keys.get(item.task_object["cluster_details"].cluster_id, set())
+            if self.dry_run and retained_api_keys is not None:
+                pruned_users = self.secret_bundle.find_rest_proxy_users_to_prune(
+                    rp_secret_name=item.task_object["rp_secret_name"],
+                    retained_api_keys=retained_api_keys.union(
+                        item.task_object["api_keys"],
+                        [self.secret_bundle.secret[v].api_key for v in item.task_object["secrets_with_rp_access"]],
+                    ),
+                )
+                LOGGER.info(
+                    "%d REST Proxy user(s) would be pruned from %s: %s",
+                    len(pruned_users),
+                    item.task_object["rp_secret_name"],
+                    ", ".join(pruned_users),
+                )
             if not self.dry_run:
                 self.secret_bundle.create_update_rest_proxy_secrets(
                     rp_secret_name=item.task_object["rp_secret_name"],
@@ -174,7 +423,12 @@ class WorkflowManager:
                         if v.secret_name in item.task_object["secrets_with_rp_access"]
                     ],
                     is_rp_secret_new=True if item.task_type == CSMConfigTaskType.create_task else False,
+                    retained_api_keys=retained_api_keys,
                 )
+                if self.journal:
+                    self.journal.rest_proxy_updated(
+                        rp_secret_name=item.task_object["rp_secret_name"], api_keys=list(item.task_object["api_keys"])
+                    )
                 item.set_task_status(
                     task_status=CSMConfigTaskStatus.sts_success,
                     status_msg="REST Proxy Secret Updated Successfully",
@@ -184,3 +438,12 @@ class WorkflowManager:
                         "secrets_with_rp_access": item.task_object["secrets_with_rp_access"],
                     },
                 )
+            # The REST Proxy secret, its shards and the secrets merged into it are not needed by any other task.
+            self.secret_bundle.evict_secret_values(
+                [item.task_object["rp_secret_name"], *item.task_object["secrets_with_rp_access"]]
+                + [
+                    v.secret_name
+                    for v in self.secret_bundle.secret.values()
+                    if v.rp_shard_of == item.task_object["rp_secret_name"]
+                ]
+            )
@@ -0,0 +1,57 @@
+import argparse
+import json
+import secrets
+import timeit
+
+from secret_managers.rest_proxy_users import (
+    RP_FE_USERS_KEY,
+    RP_KAFKA_USERS_KEY,
+    RestProxyUsers,
+    render_fe_users,
+    render_kafka_users,
+)
+
+
+# Renders a REST Proxy users secret with the provided number of users in the same format that the
+# secret manager layer writes to the secret store.
+def generate_rp_secret(users_count: int) -> dict:
+    users = {f"KEY{i:012d}": secrets.token_hex(32) for i in range(users_count)}
+    rp_users = RestProxyUsers()
+    return {
+        RP_FE_USERS_KEY: render_fe_users(users),
+        RP_KAFKA_USERS_KEY: render_kafka_users(rp_users.jaas_prepend, rp_users.jaas_postpend, users),
+    }
+
+
+def merge_users(secret_value: dict, new_users: list) -> dict:
+    rp_users = RestProxyUsers.parse(secret_value)
+    rp_users.upsert_users(new_users)
+    return rp_users.render(secret_value)
+
+
+# Times the merge of a batch of new users into a large REST Proxy users secret. Run it as a module from the
+# repository root, so the application packages are importable: python -m benchmarks.rest_proxy_merge
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark for the REST Proxy users secret merge.")
+    parser.add_argument("--users", type=int, default=10000, help="Users already present in the secret.")
+    parser.add_argument("--new-users", type=int, default=500, help="Users added to the secret in one batch.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed repetitions.")
+    args = parser.parse_args()
+
+    secret_value = generate_rp_secret(args.users)
+    new_users = [(f"NEW{i:012d}", secrets.token_hex(32)) for i in range(args.new_users)]
+    # Update a slice of the existing users as well, so both the add and update paths are exercised.
+    new_users.extend((f"KEY{i:012d}", secrets.token_hex(32)) for i in range(0, args.users, max(args.users // 100, 1)))
+
+    output = merge_users(secret_value, new_users)
+    merged = RestProxyUsers.parse(output)
+    assert len(merged.fe_users) == args.users + args.new_users
+    assert merged.fe_users == merged.kafka_users
+
+    timings = {
+        "parse": timeit.repeat(lambda: RestProxyUsers.parse(secret_value), number=1, repeat=args.repeat),
+        "merge": timeit.repeat(lambda: merge_users(secret_value, new_users), number=1, repeat=args.repeat),
+    }
+    print(f"Users in secret: {args.users}, users merged: {len(new_users)}, payload size: {len(json.dumps(output))} bytes")
+    for k, v in timings.items():
+        print("{:<10} best: {:>10.2f} ms   mean: {:>10.2f} ms".format(k, min(v) * 1000, sum(v) / len(v) * 1000))
@@ -0,0 +1,53 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from app_managers.import_profile import parse_importtime_output
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(PROJECT_ROOT, "main_cicd_runner.py")
+# The SDKs that are only needed once a phase actually talks to CCloud or the Secret Store.
+FORBIDDEN_MODULES = ["requests", "boto3", "botocore", "yaml", "ccloud_managers", "secret_managers"]
+
+
+def run_cold_start() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, ENTRY_POINT, "--help"], capture_output=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def find_forbidden_imports() -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", ENTRY_POINT, "--help"], capture_output=True, text=True, check=True
+    )
+    imported = [v.module for v in parse_importtime_output(result.stderr)]
+    return sorted(
+        set([v for v in imported for f in FORBIDDEN_MODULES if v == f or v.startswith(f + ".")])
+    )
+
+
+# Regression check for the CLI startup. It fails (exit code 1) if the median cold start until the argument parsing
+# is done goes over the budget, or if any of the heavy SDKs is imported before a workflow phase needs it.
+# Run it as a module from the repository root: python -m benchmarks.startup_budget --budget-ms 300
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup time budget check for main_cicd_runner.py")
+    parser.add_argument("--budget-ms", type=float, default=300, help="Maximum median cold start time in ms.")
+    parser.add_argument("--repeat", type=int, default=7, help="Number of cold starts to measure.")
+    args = parser.parse_args()
+
+    timings = [run_cold_start() for _ in range(args.repeat)]
+    median = statistics.median(timings)
+    print(f"Cold start to argument parsing: median {median:.1f} ms, best {min(timings):.1f} ms (budget {args.budget_ms} ms)")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"Median cold start of {median:.1f} ms is over the budget of {args.budget_ms} ms.")
+    forbidden = find_forbidden_imports()
+    if forbidden:
+        failures.append(f"Modules imported before argument parsing finished: {', '.join(forbidden)}")
+    for item in failures:
+        print(f"FAILED: {item}")
+    sys.exit(1 if failures else 0)
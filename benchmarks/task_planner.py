@@ -0,0 +1,394 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List
+
+import app_managers.core.types as CoreTypes
+import ccloud_managers.api_key_reconciliation as APIKeyReconciliation
+from app_managers.workflow_manager.task_generator import CSMAPIKeyTasks, CSMSecretManagerTasks, CSMServiceAccountTasks
+from ccloud_managers.api_key_manager import CCloudAPIKey, CCloudAPIKeyAgeIndex, CCloudAPIKeyList
+from ccloud_managers.clusters import CCloudCluster, CCloudClusterList
+from ccloud_managers.environments import CCloudEnvironment, CCloudEnvironmentList
+from ccloud_managers.service_account import CCloudServiceAccount, CCloudServiceAccountList
+from ccloud_managers.types import CCloudConfigBundle
+from secret_managers.types import CSMSecret, CSMSecretsManager
+
+BASELINE_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "task_planner_baseline.json")
+DEFAULT_SCALES = [1000, 10000, 100000]
+RP_SECRET_NAME = "rest-proxy-users"
+OLD_KEY_CREATED_AT = "2020-01-01T00:00:00Z"
+NEW_KEY_CREATED_AT = "2099-01-01T00:00:00Z"
+
+
+# The secret store is never called by the planners except through the cache, so the fake only holds the secrets.
+class CSMBenchmarkSecretsManager(CSMSecretsManager):
+    def __init__(self, csm_bundle: CoreTypes.CSMYAMLConfigBundle, ccloud_bundle: CCloudConfigBundle) -> None:
+        super().__init__(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+        self.secret = {}
+
+    def add_secret(self, secret: CSMSecret):
+        self.secret[secret.secret_name] = secret
+        self._add_secret_api_key_index(secret)
+        self._add_secret_to_store(secret)
+
+    def login(self):
+        pass
+
+    def test_login(self) -> bool:
+        return True
+
+    def read_all_secrets(self, filter=None, **kwargs):
+        pass
+
+    def add_tags(self, secret_name: str, tags: Dict[str, str]):
+        pass
+
+    def delete_secret(self, secret_name: str) -> bool:
+        return False
+
+    def _read_secret_value(self, secret_name: str) -> Dict[str, str]:
+        return None
+
+    def refresh(self):
+        pass
+
+    def find_secret(self, sa_name: str, cluster_id: str = None, **kwargs) -> List[CSMSecret]:
+        return []
+
+    def create_or_update_secret(**kwargs) -> CSMSecret:
+        pass
+
+    def create_update_rest_proxy_secrets(self, *args, **kwargs):
+        pass
+
+    def find_rest_proxy_users_to_prune(self, rp_secret_name: str, retained_api_keys) -> List[str]:
+        return []
+
+
+# The CCloud caches are filled directly, as their constructors read the inventory from CCloud.
+def _without_init(cls, **kwargs):
+    output = object.__new__(cls)
+    output.__dict__.update(kwargs)
+    return output
+
+
+# Builds the definitions, the CCloud inventory and the secrets for the provided number of API Keys. Every Service
+# Account in the definitions asks for FORCE_ALL_CLUSTERS, so there is one Service Account per clusters_count API
+# Keys. The inventory drifts from the definitions the way a real one does: some Service Accounts, API Keys and
+# secrets are missing, some are extra, and some secrets carry a stale REST Proxy access tag.
+def build_bundles(
+    keys_count: int,
+    clusters_count: int = 100,
+    envs_count: int = 10,
+    seed: int = 42,
+    use_columns: bool = False,
+    use_inventory_store: bool = False,
+):
+    rnd = random.Random(seed)
+    csm_configs = CoreTypes.CSMYAMLConfigs(
+        ccloud=CoreTypes.CSMYAMLCCloudConfigs(
+            api_key="key",
+            api_secret="secret",
+            ccloud_user="user",
+            ccloud_password="password",
+            rest_proxy_secret_name=RP_SECRET_NAME,
+            enable_rest_proxy_user_cleanup=True,
+            inventory_db_path=":memory:" if use_inventory_store else None,
+        ),
+        secretstore=CoreTypes.CSMYAMLSecretStoreConfigs(is_enabled=True, store_type="aws-secretsmanager"),
+    )
+    csm_definitions = CoreTypes.CSMYAMLDefinitions()
+    sa_count = max(keys_count // clusters_count, 1)
+    for i in range(sa_count):
+        csm_definitions.add_service_account(
+            CoreTypes.CSMYAMLServiceAccounts(
+                name=f"sa-name-{i:06d}",
+                description="",
+                email_address=None,
+                cluster_list=["FORCE_ALL_CLUSTERS"],
+                is_rp_user=i == 0,
+                rp_access=i == 0 or rnd.random() < 0.1,
+            )
+        )
+    csm_bundle = CoreTypes.CSMYAMLConfigBundle(csm_definitions=csm_definitions, csm_configs=csm_configs)
+
+    environments = {
+        f"env-{i:04d}": CCloudEnvironment(env_id=f"env-{i:04d}", display_name="", created_at="")
+        for i in range(envs_count)
+    }
+    clusters = {}
+    for i in range(clusters_count):
+        env_id = f"env-{i % envs_count:04d}"
+        clusters[f"lkc-{i:04d}"] = CCloudCluster(
+            env_id=env_id,
+            cluster_id=f"lkc-{i:04d}",
+            cluster_name="",
+            cloud="aws",
+            availability="single-zone",
+            region="us-east-1",
+            bootstrap_url="",
+        )
+    service_accounts = {}
+    # About 2% of the Service Accounts in the definitions are not created yet, and 2% more exist only in CCloud.
+    sa_names = [v for v in csm_definitions.sa if rnd.random() >= 0.02]
+    sa_names.extend([f"sa-extra-{i:06d}" for i in range(max(sa_count // 50, 1))])
+    for i, name in enumerate(sa_names):
+        service_accounts[f"sa-{i:06d}"] = CCloudServiceAccount(
+            resource_id=f"sa-{i:06d}", name=name, description="", created_at="", updated_at="", is_ignored=False
+        )
+    store = csm_bundle.inventory_store
+    if store:
+        store.replace("environments", [(v.env_id, v.display_name, v.created_at) for v in environments.values()])
+        store.replace(
+            "clusters", [(v.cluster_id, v.env_id, v.cluster_name, v.cloud, v.region) for v in clusters.values()]
+        )
+        store.replace(
+            "service_accounts",
+            [(v.resource_id, v.name, v.description, int(v.is_ignored)) for v in service_accounts.values()],
+        )
+    cc_env = _without_init(CCloudEnvironmentList, inventory_store=store, env=environments)
+    cc_clusters = _without_init(CCloudClusterList, inventory_store=store, ccloud_env=cc_env, cluster=clusters)
+    cc_sa = _without_init(CCloudServiceAccountList, inventory_store=store, _csm_bundle=csm_bundle, sa=service_accounts)
+    cc_api_keys = _without_init(
+        CCloudAPIKeyList,
+        inventory_store=store,
+        ccloud_sa=cc_sa,
+        api_keys={},
+        age_index=CCloudAPIKeyAgeIndex(),
+        ccloud_clusters=cc_clusters,
+        use_columns=use_columns,
+        columns=None,
+    )
+    ccloud_bundle = CCloudConfigBundle(
+        cc_environments=cc_env, cc_clusters=cc_clusters, cc_service_accounts=cc_sa, cc_api_keys=cc_api_keys
+    )
+    secret_bundle = CSMBenchmarkSecretsManager(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+
+    key_number = 0
+    for sa in service_accounts.values():
+        sa_definition = csm_definitions.find_service_account(sa.name)
+        for cluster in clusters.values():
+            # About 5% of the API Keys are missing; the rest are mostly old enough to be deletion candidates.
+            if rnd.random() < 0.05:
+                continue
+            key_number += 1
+            api_key = CCloudAPIKey(
+                api_key=f"KEY{key_number:012d}",
+                api_secret=None,
+                api_key_description="",
+                owner_id=sa.resource_id,
+                cluster_id=cluster.cluster_id,
+                created_at=OLD_KEY_CREATED_AT if rnd.random() < 0.9 else NEW_KEY_CREATED_AT,
+            )
+            cc_api_keys.api_keys[api_key.api_key] = api_key
+            cc_api_keys.age_index.add(api_key)
+            if store:
+                store.upsert(
+                    "api_keys",
+                    (
+                        api_key.api_key,
+                        api_key.owner_id,
+                        api_key.cluster_id,
+                        cc_api_keys.age_index.get_created_epoch(api_key.api_key),
+                    ),
+                )
+            # About 3% of the API Keys never made it to the secret store.
+            if rnd.random() < 0.03:
+                continue
+            rp_access = bool(sa_definition and sa_definition.rp_access)
+            secret_bundle.add_secret(
+                CSMSecret(
+                    secret_name=f"/ccloud/{sa.resource_id}/{cluster.env_id}/{cluster.cluster_id}",
+                    secret_value={},
+                    env_id=cluster.env_id,
+                    sa_id=sa.resource_id,
+                    sa_name=sa.name,
+                    cluster_id=cluster.cluster_id,
+                    api_key=api_key.api_key,
+                    # About 1% of the secrets carry a stale REST Proxy access tag.
+                    rp_access=rp_access if rnd.random() >= 0.01 else not rp_access,
+                    sync_needed_for_rp=rnd.random() < 0.01,
+                    api_keys_count="",
+                    is_rp_user=bool(sa_definition and sa_definition.is_rp_user),
+                )
+            )
+    rp_sa = service_accounts["sa-000000"]
+    rp_users_count = len([v for v in csm_definitions.sa.values() if v.rp_access or v.is_rp_user])
+    for cluster in clusters.values():
+        # About 5% of the REST Proxy secrets are missing some users.
+        users_count = rp_users_count if rnd.random() >= 0.05 else rnd.randint(0, rp_users_count - 1)
+        secret_bundle.add_secret(
+            CSMSecret(
+                secret_name=f"/ccloud/{rp_sa.resource_id}/{cluster.env_id}/{cluster.cluster_id}/{RP_SECRET_NAME}",
+                secret_value={},
+                env_id=cluster.env_id,
+                sa_id=rp_sa.resource_id,
+                sa_name=rp_sa.name,
+                cluster_id=cluster.cluster_id,
+                api_key="",
+                rp_access=True,
+                sync_needed_for_rp=False,
+                api_keys_count=f"{users_count}--{users_count}",
+                is_rp_user=True,
+            )
+        )
+    return csm_bundle, ccloud_bundle, secret_bundle
+
+
+# The planning steps that are timed. The task generators are consumed fully, as they plan lazily.
+def create_benchmarks(csm_bundle, ccloud_bundle, secret_bundle) -> Dict[str, Callable]:
+    sa_tasks = CSMServiceAccountTasks(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
+    api_key_tasks = CSMAPIKeyTasks(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle, secret_bundle=secret_bundle)
+    # The secret tasks are planned off the secret requests that the API Key planning computes.
+    list(api_key_tasks.create_api_key_tasks())
+    secret_tasks = CSMSecretManagerTasks(
+        csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle, api_key_tasks=api_key_tasks, secret_bundle=secret_bundle
+    )
+    return {
+        "sa_refresh_set_values": lambda: sa_tasks.refresh_set_values(csm_bundle, ccloud_bundle),
+        "create_service_account_tasks": lambda: list(sa_tasks.create_service_account_tasks()),
+        "delete_service_account_tasks": lambda: list(sa_tasks.delete_service_account_tasks()),
+        "api_key_refresh_set_values": lambda: api_key_tasks.refresh_set_values(csm_bundle, ccloud_bundle),
+        "create_api_key_tasks": lambda: list(api_key_tasks.create_api_key_tasks()),
+        "delete_api_key_tasks": lambda: list(api_key_tasks.delete_api_key_tasks()),
+        "secret_refresh_set_values": lambda: secret_tasks.refresh_set_values(api_key_tasks),
+        "create_secret_tasks": lambda: list(secret_tasks.create_secret_tasks()),
+        "update_secret_tasks": lambda: list(secret_tasks.update_secret_tasks()),
+        "update_secret_tags_tasks": lambda: list(secret_tasks.update_secret_tags_tasks()),
+        "upsert_rest_proxy_secret_tasks": lambda: list(secret_tasks.upsert_rest_proxy_secret_tasks()),
+        "find_api_keys_eligible_for_deletion": lambda: APIKeyReconciliation.find_api_keys_eligible_for_deletion(
+            secret_bundle,
+            ccloud_bundle.cc_api_keys,
+            csm_bundle.csm_configs.ccloud.ignore_service_account_list,
+            older_than_mins=csm_bundle.csm_configs.ccloud.old_api_keys_deletion_wait_mins,
+        ),
+    }
+
+
+# A fixed pure Python workload. The baseline keeps its time as well, so the results from a faster or slower
+# machine are scaled before they are compared with the baseline.
+def run_calibration(repeat: int) -> float:
+    data = [f"name-{i:06d}~lkc-{i % 100:04d}" for i in range(200000)]
+    return min(timeit.repeat(lambda: len(set([v.split("~", 1)[0] for v in data])), number=1, repeat=repeat))
+
+
+def run_benchmarks(
+    keys_count: int, repeat: int, use_columns: bool = False, use_inventory_store: bool = False
+) -> Dict[str, float]:
+    start = time.perf_counter()
+    csm_bundle, ccloud_bundle, secret_bundle = build_bundles(
+        keys_count=keys_count, use_columns=use_columns, use_inventory_store=use_inventory_store
+    )
+    if csm_bundle.inventory_store:
+        csm_bundle.inventory_store.flush()
+    print(
+        f"Scale {keys_count}: {len(csm_bundle.csm_definitions.sa)} SA definition(s), "
+        + f"{len(ccloud_bundle.cc_api_keys.api_keys)} API Key(s), {len(secret_bundle.secret)} secret(s) "
+        + f"built in {time.perf_counter() - start:.1f}s"
+    )
+    output = {}
+    for k, v in create_benchmarks(csm_bundle, ccloud_bundle, secret_bundle).items():
+        output[k] = min(timeit.repeat(v, number=1, repeat=repeat))
+        print("  {:<40} best: {:>12.2f} ms".format(k, output[k] * 1000))
+    return output
+
+
+# Regression check for the task planners. It fails (exit code 1) if any planning step at any scale is slower than
+# the stored baseline (scaled by the calibration run) by more than the allowed regression.
+# Run it as a module from the repository root: python -m benchmarks.task_planner
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU benchmark for the reconciliation task planners.")
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SCALES,
+        help="Numbers of API Keys to plan for. The Service Accounts ask for FORCE_ALL_CLUSTERS across 100 clusters.",
+    )
+    parser.add_argument(
+        "--columnar",
+        default=False,
+        action="store_true",
+        help="Plan with the columnar API Key inventory (enable_columnar_api_key_inventory). Needs numpy.",
+    )
+    parser.add_argument(
+        "--sqlite",
+        default=False,
+        action="store_true",
+        help="Plan with an in-memory SQLite inventory store (inventory_db_path).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed repetitions per planning step.")
+    parser.add_argument("--baseline-file", type=str, default=BASELINE_FILE_PATH, help="Stored baseline timings.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.5,
+        help="Allowed slowdown over the baseline as a fraction (0.5 fails a step that is 50%% slower).",
+    )
+    parser.add_argument(
+        "--max-regression-ms",
+        type=float,
+        default=5,
+        help="Allowed slowdown in ms on top of --max-regression, so that a tiny step does not fail on noise.",
+    )
+    parser.add_argument(
+        "--min-ms",
+        type=float,
+        default=5,
+        help="Steps faster than this in both the run and the baseline are not compared, as they are mostly noise.",
+    )
+    parser.add_argument(
+        "--update-baseline", default=False, action="store_true", help="Write the results as the new baseline."
+    )
+    args = parser.parse_args()
+
+    calibration = run_calibration(repeat=max(args.repeat, 5))
+    print(f"Calibration: {calibration * 1000:.2f} ms")
+    results = {
+        str(v): run_benchmarks(
+            keys_count=v, repeat=args.repeat, use_columns=args.columnar, use_inventory_store=args.sqlite
+        )
+        for v in args.scales
+    }
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.isfile(args.baseline_file):
+            with open(args.baseline_file, "r") as f:
+                baseline = json.load(f)
+        baseline["calibration"] = round(calibration, 6)
+        baseline.setdefault("results", {}).update(
+            {k: {k2: round(v2, 6) for k2, v2 in v.items()} for k, v in results.items()}
+        )
+        with open(args.baseline_file, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline_file}")
+        sys.exit(0)
+
+    if not os.path.isfile(args.baseline_file):
+        print(f"No baseline in {args.baseline_file}. Run with --update-baseline to create it.")
+        sys.exit(1)
+    with open(args.baseline_file, "r") as f:
+        baseline = json.load(f)
+    speed_ratio = calibration / baseline["calibration"]
+    print(f"This machine runs the calibration at {speed_ratio:.2f}x the time of the baseline machine.")
+    failures = []
+    for scale, timings in results.items():
+        for k, v in timings.items():
+            expected = baseline["results"].get(scale, {}).get(k, None)
+            if expected is None or max(v, expected * speed_ratio) * 1000 < args.min_ms:
+                continue
+            if v > expected * speed_ratio * (1 + args.max_regression) + args.max_regression_ms / 1000:
+                failures.append(
+                    f"{k} at scale {scale} took {v * 1000:.2f} ms, over the scaled baseline of "
+                    + f"{expected * speed_ratio * 1000:.2f} ms by more than {args.max_regression:.0%} "
+                    + f"+ {args.max_regression_ms:g} ms."
+                )
+    for item in failures:
+        print(f"FAILED: {item}")
+    sys.exit(1 if failures else 0)
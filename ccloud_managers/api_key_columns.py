@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+# NumPy is optional. It is only needed if enable_columnar_api_key_inventory is turned on in the configurations.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Columnar copy of the API Keys cache. Every API Key is a row; the owner and cluster IDs are dictionary encoded to
+# integer codes and the creation times are kept as epoch seconds, so the owner/cluster filters, the age cutoffs and
+# the joins against the API Keys in the secret store are vectorized comparisons over the arrays instead of Python
+# loops over the cached dataclasses. Only the API Key IDs are returned; the callers turn the (usually few)
+# matching rows back into CCloudAPIKey objects from the cache.
+# New rows are collected in Python lists and appended to the arrays on the next query, and deleted rows are only
+# flagged, so the cache can be updated one API Key at a time while a workflow runs.
+class CCloudAPIKeyColumns:
+    def __init__(self) -> None:
+        if np is None:
+            raise Exception(
+                "enable_columnar_api_key_inventory needs the numpy package. Please install it or turn the setting off."
+            )
+        self.api_key_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.owner_ids: List[str] = []
+        self.owner_codes: Dict[str, int] = {}
+        self.cluster_ids: List[str] = []
+        self.cluster_codes: Dict[str, int] = {}
+        self.owners = np.empty(0, dtype=np.int32)
+        self.clusters = np.empty(0, dtype=np.int32)
+        self.created = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.pending: List[Tuple[int, int, int]] = []
+        self.pending_deletes: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __encode(self, value: str, codes: Dict[str, int], values: List[str]) -> int:
+        code = codes.get(value, None)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def add(self, api_key: str, owner_id: str, cluster_id: str, created_epoch: int) -> None:
+        self.remove(api_key)
+        self.rows[api_key] = len(self.api_key_ids)
+        self.api_key_ids.append(api_key)
+        self.pending.append(
+            (
+                self.__encode(owner_id, self.owner_codes, self.owner_ids),
+                self.__encode(cluster_id, self.cluster_codes, self.cluster_ids),
+                created_epoch,
+            )
+        )
+
+    def remove(self, api_key: str) -> None:
+        row = self.rows.pop(api_key, None)
+        if row is not None:
+            self.pending_deletes.append(row)
+
+    def __flush(self) -> None:
+        if self.pending:
+            owners, clusters, created = zip(*self.pending)
+            self.owners = np.concatenate([self.owners, np.array(owners, dtype=np.int32)])
+            self.clusters = np.concatenate([self.clusters, np.array(clusters, dtype=np.int32)])
+            self.created = np.concatenate([self.created, np.array(created, dtype=np.int64)])
+            self.alive = np.concatenate([self.alive, np.ones(len(self.pending), dtype=bool)])
+            self.pending = []
+        if self.pending_deletes:
+            self.alive[self.pending_deletes] = False
+            self.pending_deletes = []
+
+    # Boolean mask of the rows that match every provided filter. An owner or a cluster that is not in the
+    # inventory matches no row.
+    def __find_mask(
+        self, owner_ids: Iterable[str] = None, cluster_id: str = None, created_before: int = None
+    ) -> "np.ndarray":
+        self.__flush()
+        mask = self.alive.copy()
+        if owner_ids is not None:
+            codes = [self.owner_codes[v] for v in owner_ids if v in self.owner_codes]
+            mask &= np.isin(self.owners, np.array(codes, dtype=np.int32))
+        if cluster_id is not None:
+            mask &= self.clusters == self.cluster_codes.get(cluster_id, -1)
+        if created_before is not None:
+            mask &= self.created < created_before
+        return mask
+
+    def __to_api_key_ids(self, mask: "np.ndarray") -> List[str]:
+        return [self.api_key_ids[v] for v in np.flatnonzero(mask)]
+
+    # API Key IDs in the order they were added to the cache.
+    def find_api_key_ids(
+        self, owner_ids: Iterable[str] = None, cluster_id: str = None, created_before: int = None
+    ) -> List[str]:
+        return self.__to_api_key_ids(self.__find_mask(owner_ids, cluster_id, created_before))
+
+    # Distinct (owner ID, cluster ID) pairs of the API Keys owned by the provided Service Accounts.
+    def find_owner_cluster_pairs(self, owner_ids: Iterable[str]) -> Set[Tuple[str, str]]:
+        mask = self.__find_mask(owner_ids=owner_ids)
+        if not mask.any():
+            return set()
+        pairs = np.unique(self.owners[mask].astype(np.int64) * len(self.cluster_ids) + self.clusters[mask])
+        return set(
+            [(self.owner_ids[v // len(self.cluster_ids)], self.cluster_ids[v % len(self.cluster_ids)]) for v in pairs]
+        )
+
+    # Anti-join with the API Keys in the secret store: the API Key IDs that are not in the provided ones,
+    # optionally only for the keys created before the cutoff, for one owner and outside the ignored owners. The keys
+    # filtered on the creation time are returned oldest first, as the creation time index returns them.
+    def find_api_key_ids_not_in(
+        self,
+        api_key_ids: Iterable[str],
+        created_before: int = None,
+        owner_id: str = None,
+        ignored_owner_ids: Iterable[str] = (),
+    ) -> List[str]:
+        mask = self.__find_mask(owner_ids=[owner_id] if owner_id else None, created_before=created_before)
+        ignored_codes = [self.owner_codes[v] for v in ignored_owner_ids if v in self.owner_codes]
+        if ignored_codes:
+            mask &= ~np.isin(self.owners, np.array(ignored_codes, dtype=np.int32))
+        stored_rows = [self.rows[v] for v in api_key_ids if v in self.rows]
+        mask[np.array(stored_rows, dtype=np.int64)] = False
+        if created_before is None:
+            return self.__to_api_key_ids(mask)
+        rows = np.flatnonzero(mask)
+        return [self.api_key_ids[v] for v in sorted(rows, key=lambda v: (self.created[v], self.api_key_ids[v]))]
@@ -1,15 +1,22 @@
+import logging
 import pprint
 import subprocess
+from bisect import bisect_left, bisect_right, insort
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from json import loads
 from operator import itemgetter
-from typing import Dict, List
+from typing import Dict, Iterable, List, Set, Tuple
 
+import app_managers.rate_limiter as RateLimiter
 import ccloud_managers.service_account as service_account
+from ccloud_managers.api_key_columns import CCloudAPIKeyColumns
+from ccloud_managers.clusters import CCloudClusterList
 from ccloud_managers.connection import CCloudBase
 
 pp = pprint.PrettyPrinter(indent=2)
+LOGGER = logging.getLogger(__name__)
+MAX_SA_API_KEY_LISTINGS = 10
 
 
 @dataclass
@@ -22,10 +29,73 @@ class CCloudAPIKey:
     created_at: str
 
 
+# The CLI reports the creation time in the "%Y-%m-%dT%H:%M:%S%z" format, but fractional seconds have
+# been seen in the API responses as well, so fall back to the ISO parser when the strict format fails.
+def parse_api_key_creation_time(created_at: str) -> datetime:
+    try:
+        return datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+
+
+# Secondary index for the API Keys cache which keeps (created_epoch, api_key) pairs sorted by the creation time.
+# Every age based lookup is then a bisect on the cutoff followed by a slice, instead of a full scan of the cache
+# that parses every creation timestamp again. A per owner index is maintained as well so that the queries like
+# "keys older than X for SA Y" do not need to look at keys for other Service Accounts.
+@dataclass
+class CCloudAPIKeyAgeIndex:
+    created_index: List[Tuple[int, str]] = field(default_factory=list)
+    owner_index: Dict[str, List[Tuple[int, str]]] = field(default_factory=dict)
+    key_details: Dict[str, Tuple[int, str]] = field(default_factory=dict)
+
+    def add(self, api_key: CCloudAPIKey) -> None:
+        if api_key.api_key in self.key_details:
+            self.remove(api_key.api_key)
+        created_epoch = int(parse_api_key_creation_time(api_key.created_at).timestamp())
+        entry = (created_epoch, api_key.api_key)
+        insort(self.created_index, entry)
+        insort(self.owner_index.setdefault(api_key.owner_id, []), entry)
+        self.key_details[api_key.api_key] = (created_epoch, api_key.owner_id)
+
+    def remove(self, api_key: str) -> None:
+        details = self.key_details.pop(api_key, None)
+        if not details:
+            return
+        created_epoch, owner_id = details
+        entry = (created_epoch, api_key)
+        for index in (self.created_index, self.owner_index.get(owner_id, [])):
+            pos = bisect_left(index, entry)
+            if pos < len(index) and index[pos] == entry:
+                index.pop(pos)
+        if not self.owner_index.get(owner_id, True):
+            self.owner_index.pop(owner_id, None)
+
+    # Returns the API Key IDs created strictly before the cutoff epoch, oldest first.
+    def find_created_before(self, cutoff_epoch: int, owner_id: str = None) -> List[str]:
+        index = self.owner_index.get(owner_id, []) if owner_id else self.created_index
+        pos = bisect_left(index, (cutoff_epoch,))
+        return [v for _, v in index[:pos]]
+
+    # Returns the API Key IDs created at or after the cutoff epoch, oldest first.
+    def find_created_since(self, cutoff_epoch: int, owner_id: str = None) -> List[str]:
+        index = self.owner_index.get(owner_id, []) if owner_id else self.created_index
+        pos = bisect_right(index, (cutoff_epoch,))
+        return [v for _, v in index[pos:]]
+
+    def get_created_epoch(self, api_key: str) -> int:
+        return self.key_details[api_key][0]
+
+
 @dataclass
 class CCloudAPIKeyList(CCloudBase):
     ccloud_sa: service_account.CCloudServiceAccountList
     api_keys: Dict[str, CCloudAPIKey] = field(default_factory=dict)
+    age_index: CCloudAPIKeyAgeIndex = field(default_factory=CCloudAPIKeyAgeIndex, init=False)
+    # Only needed for scoped runs, to drop the keys for the clusters outside the scope.
+    ccloud_clusters: CCloudClusterList = field(default=None, repr=False)
+    # The columnar copy of the cache (enable_columnar_api_key_inventory) is built on the first query that uses it.
+    use_columns: bool = field(default=False, init=False)
+    columns: CCloudAPIKeyColumns = field(default=None, init=False, repr=False)
     __CMD_STDERR_TO_STDOUT = " 2>&1 "
 
     # This init function will initiate the base object and then check CCloud
@@ -33,12 +103,19 @@ class CCloudAPIKeyList(CCloudBase):
     # the added to a cache.
     def __post_init__(self) -> None:
         super().__post_init__()
-        print("Gathering list of all API Key(s) for all Service Account(s) in CCloud.")
+        self.url = self._ccloud_connection.get_endpoint_url(key=self._ccloud_connection.uri.api_keys)
+        self.use_columns = self._ccloud_connection.csm_bundle.csm_configs.ccloud.enable_columnar_api_key_inventory
+        self.__replace_store([])
+        LOGGER.info("Gathering list of all API Key(s) for all Service Account(s) in CCloud.")
         self.__read_all_api_keys(self.ccloud_sa)
 
     # This is the base function that will call the command line tool. The command to be
     # executed is passed in as the command parameter.
+    # The CLI calls count against the same CCloud limits, so they share the rate limiter with the REST calls.
     def __execute_subcommand(self, command):
+        return RateLimiter.call("ccloud:cli", self.__run_subcommand, command)
+
+    def __run_subcommand(self, command):
         process = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
         out = process.communicate()[0].strip()
         return out.decode("UTF-8")
@@ -86,15 +163,26 @@ class CCloudAPIKeyList(CCloudBase):
     # access to the secret , you will need to generate new api key/secret pair.
     def __read_all_api_keys(self, ccloud_sa: service_account.CCloudServiceAccountList):
         self.__confluent_cli_login()
-        print("Gathering all API Keys.")
-        cmd_api_key_list = "confluent api-key list -o json "
-        output = loads(self.__execute_subcommand(cmd_api_key_list))
+        output = []
+        for item in self.__api_key_list_commands(ccloud_sa):
+            output.extend(loads(self.__execute_subcommand(item)))
         output = sorted(output, key=itemgetter("created"), reverse=True)
-        sa_list = [item.resource_id for item in ccloud_sa.sa.values()]
+        sa_list = set([item.resource_id for item in ccloud_sa.sa.values()])
+        scope = self._ccloud_connection.csm_bundle.csm_scope
+        ignored_count = 0
         for key in output:
+            if (
+                scope.limits_clusters()
+                and self.ccloud_clusters is not None
+                and key["resource_id"] not in self.ccloud_clusters.cluster
+            ):
+                continue
             if key["owner_resource_id"] in sa_list and key["resource_type"] == "kafka" and key["resource_id"]:
-                print(
-                    f'API Key: {key["key"]} for SA: {key["owner_resource_id"]}, Resource Type: {key["resource_type"]} will be considered.'
+                LOGGER.debug(
+                    "API Key: %s for SA: %s, Resource Type: %s will be considered.",
+                    key["key"],
+                    key["owner_resource_id"],
+                    key["resource_type"],
                 )
                 self.__add_to_cache(
                     CCloudAPIKey(
@@ -107,38 +195,164 @@ class CCloudAPIKeyList(CCloudBase):
                     )
                 )
             else:
-                print(
-                    f'API Key: {key["key"]} for SA: {key["owner_resource_id"]}, Resource Type: {key["resource_type"]} will be ignored.'
+                ignored_count += 1
+                LOGGER.debug(
+                    "API Key: %s for SA: %s, Resource Type: %s will be ignored.",
+                    key["key"],
+                    key["owner_resource_id"],
+                    key["resource_type"],
                 )
+        LOGGER.info("Found %d API Key(s): %d considered, %d ignored.", len(output), len(self.api_keys), ignored_count)
+
+    # A scoped run lists the keys per Service Account (or per cluster) in scope with the CLI filters, instead of
+    # listing every API Key in the organization.
+    def __api_key_list_commands(self, ccloud_sa: service_account.CCloudServiceAccountList) -> List[str]:
+        cmd_api_key_list = "confluent api-key list -o json "
+        scope = self._ccloud_connection.csm_bundle.csm_scope
+        # A CLI call per Service Account only pays off for a few of them, like a --sa scope. The larger scopes (the
+        # shards of a sharded run) list all the API Keys once, which are filtered on the cached Service Accounts.
+        if scope.limits_sa() and len(ccloud_sa.sa) <= MAX_SA_API_KEY_LISTINGS:
+            return [cmd_api_key_list + "--service-account " + v.resource_id for v in ccloud_sa.sa.values()]
+        if scope.cluster_ids:
+            return [cmd_api_key_list + "--resource " + v for v in scope.cluster_ids]
+        return [cmd_api_key_list]
+
+    # Re-reads all the API Keys. The API Secrets cannot be read back from CCloud, so the secrets already known
+    # to this process (for keys that still exist) are carried over to the refreshed cache.
+    def refresh(self):
+        known_secrets = {k: v.api_secret for k, v in self.api_keys.items() if v.api_secret}
+        current = (self.api_keys, self.age_index, self.columns)
+        self.api_keys, self.age_index, self.columns = {}, CCloudAPIKeyAgeIndex(), None
+        self.__replace_store([])
+        try:
+            self.__read_all_api_keys(self.ccloud_sa)
+        except Exception:
+            self.api_keys, self.age_index, self.columns = current
+            self.__replace_store(self.api_keys.values())
+            raise
+        for k, v in known_secrets.items():
+            if k in self.api_keys:
+                self.api_keys[k].api_secret = v
+
+    # The inventory store (if enabled) mirrors the cache.
+    def __store_row(self, api_key: CCloudAPIKey) -> tuple:
+        created_epoch = self.age_index.get_created_epoch(api_key.api_key)
+        return (api_key.api_key, api_key.owner_id, api_key.cluster_id, created_epoch)
+
+    def __replace_store(self, items: Iterable[CCloudAPIKey]) -> None:
+        if self.inventory_store:
+            self.inventory_store.replace("api_keys", [self.__store_row(v) for v in items])
 
     def __add_to_cache(self, api_key: CCloudAPIKey) -> None:
         self.api_keys[api_key.api_key] = api_key
+        self.age_index.add(api_key)
+        if self.columns is not None:
+            self.columns.add(
+                api_key.api_key,
+                api_key.owner_id,
+                api_key.cluster_id,
+                self.age_index.get_created_epoch(api_key.api_key),
+            )
+        if self.inventory_store:
+            self.inventory_store.upsert("api_keys", self.__store_row(api_key))
 
     def delete_keys_from_cache(self, sa_name) -> int:
         count = 0
-        for item in self.api_keys.values():
-            if sa_name == item.owner_id:
-                self.api_keys.pop(item.api_key, None)
-                count += 1
+        for item in [v for v in self.api_keys.values() if sa_name == v.owner_id]:
+            self.__delete_key_from_cache(item.api_key)
+            count += 1
         return count
 
     def __delete_key_from_cache(self, key_id: str) -> int:
         self.api_keys.pop(key_id, None)
+        self.age_index.remove(key_id)
+        if self.columns is not None:
+            self.columns.remove(key_id)
+        if self.inventory_store:
+            self.inventory_store.delete("api_keys", key_id)
+
+    # Returns the columnar copy of the cache if it is enabled, building it from the cache on the first call.
+    def get_columns(self) -> CCloudAPIKeyColumns:
+        if not self.use_columns:
+            return None
+        if self.columns is None:
+            self.columns = CCloudAPIKeyColumns()
+            for item in self.api_keys.values():
+                self.columns.add(
+                    item.api_key, item.owner_id, item.cluster_id, self.age_index.get_created_epoch(item.api_key)
+                )
+        return self.columns
 
     def find_keys_with_sa(self, sa_id: str) -> List[CCloudAPIKey]:
+        if self.get_columns() is not None:
+            return [self.api_keys[v] for v in self.columns.find_api_key_ids(owner_ids=[sa_id])]
         output = []
         for item in self.api_keys.values():
             if sa_id == item.owner_id:
                 output.append(item)
         return output
 
+    # API Key IDs owned by the Service Account, read off the per owner index.
+    def find_api_key_ids_with_sa(self, sa_id: str) -> List[str]:
+        return [v for _, v in self.age_index.owner_index.get(sa_id, [])]
+
+    # Cluster IDs that the Service Account holds at least one API Key for, read off the per owner index.
+    def find_clusters_with_sa(self, sa_id: str) -> Set[str]:
+        return {self.api_keys[v].cluster_id for _, v in self.age_index.owner_index.get(sa_id, [])}
+
     def find_keys_with_sa_and_cluster(self, sa_id: str, cluster_id: str) -> List[CCloudAPIKey]:
+        if self.get_columns() is not None:
+            return [self.api_keys[v] for v in self.columns.find_api_key_ids(owner_ids=[sa_id], cluster_id=cluster_id)]
         output = []
         for item in self.api_keys.values():
             if cluster_id == item.cluster_id and sa_id == item.owner_id:
                 output.append(item)
         return output
 
+    # API Keys owned by any of the provided Service Accounts, in a single pass over the cache.
+    def find_keys_with_sa_ids(self, sa_ids: Iterable[str]) -> List[CCloudAPIKey]:
+        if self.get_columns() is not None:
+            return [self.api_keys[v] for v in self.columns.find_api_key_ids(owner_ids=sa_ids)]
+        sa_ids = set(sa_ids)
+        return [v for v in self.api_keys.values() if v.owner_id in sa_ids]
+
+    # Distinct (Service Account ID, cluster ID) pairs that the provided Service Accounts hold API Keys for.
+    def find_sa_cluster_pairs(self, sa_ids: Iterable[str]) -> Set[Tuple[str, str]]:
+        if self.get_columns() is not None:
+            return self.columns.find_owner_cluster_pairs(sa_ids)
+        return set(
+            [(v, self.api_keys[k].cluster_id) for v in sa_ids for _, k in self.age_index.owner_index.get(v, [])]
+        )
+
+    # API Keys that are not in the provided API Key IDs (the API Keys in the secret store), optionally only the ones
+    # older than the provided minutes, owned by one Service Account and not owned by the ignored Service Accounts.
+    # The keys filtered on the age are returned oldest first.
+    def find_keys_not_in(
+        self,
+        api_key_ids: Iterable[str],
+        older_than_mins: int = None,
+        owner_id: str = None,
+        ignored_sa_ids: Iterable[str] = (),
+    ) -> List[CCloudAPIKey]:
+        cutoff_epoch = None
+        if older_than_mins is not None:
+            cutoff_epoch = int(datetime.now(tz=timezone.utc).timestamp()) - (older_than_mins * 60)
+        if self.get_columns() is not None:
+            return [
+                self.api_keys[v]
+                for v in self.columns.find_api_key_ids_not_in(api_key_ids, cutoff_epoch, owner_id, ignored_sa_ids)
+            ]
+        if cutoff_epoch is not None:
+            candidates = [
+                self.api_keys[k] for k in self.age_index.find_created_before(cutoff_epoch, owner_id=owner_id)
+            ]
+        elif owner_id:
+            candidates = self.find_keys_with_sa(owner_id)
+        else:
+            candidates = list(self.api_keys.values())
+        api_key_ids, ignored_sa_ids = set(api_key_ids), set(ignored_sa_ids)
+        return [v for v in candidates if v.api_key not in api_key_ids and v.owner_id not in ignored_sa_ids]
+
     def create_api_key(self, env_id: str, cluster_id: str, sa_id: str, sa_name: str, description: str = None):
         self.__confluent_cli_set_env(env_id)
         self.__confluent_cli_set_cluster(cluster_id)
@@ -178,8 +392,18 @@ class CCloudAPIKeyList(CCloudBase):
             self.__delete_key_from_cache(api_key)
         return True
 
+    # Deletes the API Key with the IAM API instead of the CLI. It does not need the CLI environment/cluster context,
+    # so it is safe to call concurrently for a batch of keys.
+    def delete_api_key_with_api(self, api_key: str) -> bool:
+        resp = self.http_session.delete(url=str(self.url + "/" + api_key), auth=self.http_connection)
+        if resp.status_code in (202, 204, 404):
+            self.__delete_key_from_cache(api_key)
+            return True
+        else:
+            raise Exception(f"Could not delete the API Key {api_key}. " + resp.text)
+
     def print_api_keys(self, ccloud_sa: service_account.CCloudServiceAccountList, api_keys: List[CCloudAPIKey] = None):
-        print(
+        LOGGER.info(
             "{:<20} {:<25} {:<25} {:<20} {:<20} {:<50}".format(
                 "API Key",
                 "API Key Cluster ID",
@@ -195,7 +419,7 @@ class CCloudAPIKeyList(CCloudBase):
             iter_data = [v for v in self.api_keys.values()]
         for item in iter_data:
             sa_details = ccloud_sa.sa[item.owner_id]
-            print(
+            LOGGER.info(
                 "{:<20} {:<25} {:<25} {:<20} {:<20} {:<50}".format(
                     item.api_key,
                     item.cluster_id,
@@ -207,13 +431,15 @@ class CCloudAPIKeyList(CCloudBase):
             )
 
     def mins_since_api_key_creation(self, api_key: str) -> int:
-        api_key_details = self.api_keys.get(api_key)
-        if not api_key_details:
+        if api_key not in self.api_keys:
             raise Exception(f"API Key {api_key} not found.")
-        api_key_creation_date = datetime.strptime(api_key_details.created_at, "%Y-%m-%dT%H:%M:%S%z")
-        now_date = datetime.now(tz=timezone.utc)
-        if now_date < api_key_creation_date:
-            return 0
-        else:
-            diff = now_date - api_key_creation_date
-            return int(diff.seconds / 60)
+        now_epoch = int(datetime.now(tz=timezone.utc).timestamp())
+        # The full elapsed seconds are used, so keys older than a day do not wrap around to a small value.
+        diff = now_epoch - self.age_index.get_created_epoch(api_key)
+        return 0 if diff < 0 else int(diff / 60)
+
+    # Lists the API Keys that are older than the provided minutes (optionally for a single owner SA),
+    # using the creation time index. Keys are returned oldest first.
+    def find_keys_older_than(self, mins: int, owner_id: str = None) -> List[CCloudAPIKey]:
+        cutoff_epoch = int(datetime.now(tz=timezone.utc).timestamp()) - (mins * 60)
+        return [self.api_keys[k] for k in self.age_index.find_created_before(cutoff_epoch, owner_id=owner_id)]
@@ -1,22 +1,27 @@
+import logging
 from typing import List
 
 from secret_managers.types import CSMSecretsManager
 
 from ccloud_managers.api_key_manager import CCloudAPIKey, CCloudAPIKeyList
 
+LOGGER = logging.getLogger(__name__)
 
+
+# Lists the API Keys that exist in CCloud but are not synced to the Secret Store. If older_than_mins is provided,
+# only the keys older than the cutoff are considered; these are located with the creation time index (or with the
+# columnar inventory, if enabled), so the work done is not a Python loop over every key in the cache.
 def find_api_keys_eligible_for_deletion(
     csm_secret_list: CSMSecretsManager,
     cc_api_keys: CCloudAPIKeyList,
     ignored_sa_list: List[str],
+    older_than_mins: int = None,
+    owner_id: str = None,
 ) -> List[CCloudAPIKey]:
-    print("Finding APi Keys Eligible for Deletion")
-    output: List[CCloudAPIKey] = []
-    api_keys_in_ccloud = set([k for k in cc_api_keys.api_keys.keys()])
-    api_keys_in_secret_store = set([v.api_key for v in csm_secret_list.secret.values()])
-    deletion_eligible_api_keys = api_keys_in_ccloud.difference(api_keys_in_secret_store)
-    for item in deletion_eligible_api_keys:
-        api_key_details = cc_api_keys.api_keys[item]
-        if api_key_details.owner_id not in ignored_sa_list:
-            output.append(cc_api_keys.api_keys[item])
-    return output
+    LOGGER.info("Finding API Keys eligible for deletion.")
+    return cc_api_keys.find_keys_not_in(
+        api_key_ids=csm_secret_list.secret_api_keys.keys(),
+        older_than_mins=older_than_mins,
+        owner_id=owner_id,
+        ignored_sa_ids=ignored_sa_list,
+    )
@@ -1,12 +1,13 @@
+import logging
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, Iterable
 from urllib import parse
 
-import requests
-
 from ccloud_managers.connection import CCloudBase
 from ccloud_managers.environments import CCloudEnvironmentList
 
+LOGGER = logging.getLogger(__name__)
+
 
 @dataclass
 class CCloudCluster:
@@ -27,13 +28,15 @@ class CCloudClusterList(CCloudBase):
     def __post_init__(self) -> None:
         super().__post_init__()
         self.url = self._ccloud_connection.get_endpoint_url(key=self._ccloud_connection.uri.clusters)
+        self.__replace_store([])
         for item in self.ccloud_env.env.values():
-            print("Checking Environment " + item.env_id + " for any provisioned clusters.")
+            LOGGER.debug("Checking Environment %s for any provisioned clusters.", item.env_id)
             self.read_all_clusters(env_id=item.env_id, params={"page_size": 50})
+        LOGGER.info("Found %d cluster(s) in %d environment(s).", len(self.cluster), len(self.ccloud_env.env))
 
     def __str__(self):
         for v in self.cluster.values():
-            print(
+            LOGGER.info(
                 "{:<15} {:<15} {:<25} {:<10} {:<25} {:<50}".format(
                     v.env_id, v.cluster_id, v.cluster_name, v.cloud, v.availability, v.bootstrap_url
                 )
@@ -41,11 +44,14 @@ class CCloudClusterList(CCloudBase):
 
     def read_all_clusters(self, env_id: str, params={"page_size": 50}):
         params["environment"] = env_id
-        resp = requests.get(url=self.url, auth=self.http_connection, params=params)
+        resp = self.http_session.get(url=self.url, auth=self.http_connection, params=params)
         if resp.status_code == 200:
             out_json = resp.json()
+            scope = self._ccloud_connection.csm_bundle.csm_scope
             for item in out_json["data"]:
-                print("Found cluster " + item["id"] + " with name " + item["spec"]["display_name"])
+                if not scope.includes_cluster(item["id"]):
+                    continue
+                LOGGER.debug("Found cluster %s with name %s", item["id"], item["spec"]["display_name"])
                 self.__add_cluster_to_cache(
                     CCloudCluster(
                         env_id=env_id,
@@ -64,8 +70,38 @@ class CCloudClusterList(CCloudBase):
         else:
             raise Exception("Could not connect to Confluent Cloud. Please check your settings. " + resp.text)
 
+    # Re-reads all the clusters for the environments currently in the environment cache.
+    # The current cache is kept if CCloud cannot be reached.
+    def refresh(self):
+        current = self.cluster
+        self.cluster = {}
+        self.__replace_store([])
+        try:
+            for item in self.ccloud_env.env.values():
+                self.read_all_clusters(env_id=item.env_id, params={"page_size": 50})
+        except Exception:
+            self.cluster = current
+            self.__replace_store(current.values())
+            raise
+
+    # The inventory store (if enabled) mirrors the cache.
+    def __store_row(self, ccloud_cluster: CCloudCluster) -> tuple:
+        return (
+            ccloud_cluster.cluster_id,
+            ccloud_cluster.env_id,
+            ccloud_cluster.cluster_name,
+            ccloud_cluster.cloud,
+            ccloud_cluster.region,
+        )
+
+    def __replace_store(self, items: Iterable[CCloudCluster]) -> None:
+        if self.inventory_store:
+            self.inventory_store.replace("clusters", [self.__store_row(v) for v in items])
+
     def __add_cluster_to_cache(self, ccloud_cluster: CCloudCluster) -> None:
         self.cluster[ccloud_cluster.cluster_id] = ccloud_cluster
+        if self.inventory_store:
+            self.inventory_store.upsert("clusters", self.__store_row(ccloud_cluster))
 
     # Read/Find one Cluster from the cache
     def find_cluster(self, cluster_id):
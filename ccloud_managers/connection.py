@@ -1,9 +1,53 @@
 from dataclasses import dataclass, field
+from typing import Dict
+from urllib import parse
 
+import app_managers.rate_limiter as RateLimiter
+import requests
 from app_managers.core.types import CSMYAMLConfigBundle
 from app_managers.helpers import mandatory_check
+from app_managers.inventory_store import CSMInventoryStore
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+# HTTP sessions are pooled per CCloud API Key. Every CCloud object, and every configuration processed by the
+# same process with the same credentials, reuses the keep-alive connections instead of opening new ones.
+_HTTP_SESSIONS: Dict[str, "RateLimitedSession"] = {}
+
+
+# Routes the CCloud calls through the adaptive rate limiter. CCloud throttles per API group, so the limiter
+# endpoint is the HTTP method with the first three path segments (for example "GET /iam/v2/service-accounts").
+# A POST that got a 503 may have been processed, so it is not retried, to avoid creating a duplicate.
+class RateLimitedSession:
+    def __init__(self, session: requests.Session) -> None:
+        self.session = session
+
+    def __endpoint(self, method: str, url: str) -> str:
+        return f"ccloud:{method} " + "/".join(parse.urlsplit(url).path.split("/")[:4])
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return RateLimiter.call(self.__endpoint("GET", url), self.session.get, url=url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return RateLimiter.call(
+            self.__endpoint("POST", url),
+            self.session.post,
+            url=url,
+            throttling_status_codes=RateLimiter.NON_IDEMPOTENT_THROTTLING_STATUS_CODES,
+            **kwargs,
+        )
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return RateLimiter.call(self.__endpoint("DELETE", url), self.session.delete, url=url, **kwargs)
+
+
+def get_http_session(api_key: str, pool_size: int = 10) -> RateLimitedSession:
+    if api_key not in _HTTP_SESSIONS:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        _HTTP_SESSIONS[api_key] = RateLimitedSession(session)
+    return _HTTP_SESSIONS[api_key]
+
 
 class URIDetails:
     base_url = "https://api.confluent.cloud"
@@ -21,6 +65,7 @@ class CCloudConnection:
     csm_bundle: CSMYAMLConfigBundle
     uri: URIDetails = field(default_factory=URIDetails)
     http_connection: HTTPBasicAuth = field(init=False)
+    http_session: RateLimitedSession = field(init=False)
 
     def __post_init__(self) -> None:
         mandatory_check("api_key", self.csm_bundle.csm_configs.ccloud.api_key)
@@ -32,6 +77,7 @@ class CCloudConnection:
             "http_connection",
             HTTPBasicAuth(self.csm_bundle.csm_configs.ccloud.api_key, self.csm_bundle.csm_configs.ccloud.api_secret),
         )
+        object.__setattr__(self, "http_session", get_http_session(self.csm_bundle.csm_configs.ccloud.api_key))
 
     def get_endpoint_url(self, key="/"):
         return self.uri.base_url + key
@@ -42,6 +88,10 @@ class CCloudBase:
     _ccloud_connection: CCloudConnection
     url: str = field(init=False)
     http_connection: HTTPBasicAuth = field(init=False)
+    http_session: RateLimitedSession = field(init=False)
+    inventory_store: CSMInventoryStore = field(init=False, default=None, repr=False)
 
     def __post_init__(self) -> None:
         self.http_connection = self._ccloud_connection.http_connection
+        self.http_session = self._ccloud_connection.http_session
+        self.inventory_store = self._ccloud_connection.csm_bundle.inventory_store
@@ -1,11 +1,12 @@
+import logging
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, Iterable
 from urllib import parse
 
-import requests
-
 from ccloud_managers.connection import CCloudBase
 
+LOGGER = logging.getLogger(__name__)
+
 
 @dataclass
 class CCloudEnvironment:
@@ -21,19 +22,25 @@ class CCloudEnvironmentList(CCloudBase):
     def __post_init__(self) -> None:
         super().__post_init__()
         self.url = self._ccloud_connection.get_endpoint_url(key=self._ccloud_connection.uri.environments)
+        self.__replace_store([])
         self.read_all_env(params={"page_size": 50})
+        LOGGER.info("Found %d environment(s).", len(self.env))
 
     def __str__(self):
-        print("Found " + str(len(self.env)) + " environments.")
+        LOGGER.info("Found %d environment(s).", len(self.env))
         for v in self.env.values():
-            print("{:<15} {:<40}".format(v.env_id, v.display_name))
+            LOGGER.info("{:<15} {:<40}".format(v.env_id, v.display_name))
 
     def read_all_env(self, params={"page_size": 50}):
-        resp = requests.get(url=self.url, auth=self.http_connection, params=params)
+        resp = self.http_session.get(url=self.url, auth=self.http_connection, params=params)
         if resp.status_code == 200:
             out_json = resp.json()
+            scope = self._ccloud_connection.csm_bundle.csm_scope
             for item in out_json["data"]:
-                print("Found environment " + item["id"] + " with name " + item["display_name"])
+                # The clusters are only listed for the environments that are kept here.
+                if not scope.includes_env(item["id"]):
+                    continue
+                LOGGER.debug("Found environment %s with name %s", item["id"], item["display_name"])
                 self.__add_env_to_cache(
                     CCloudEnvironment(
                         env_id=item["id"],
@@ -48,8 +55,29 @@ class CCloudEnvironmentList(CCloudBase):
         else:
             raise Exception("Could not connect to Confluent Cloud. Please check your settings. " + resp.text)
 
+    # Re-reads all the environments. The current cache is kept if CCloud cannot be reached.
+    def refresh(self):
+        current = self.env
+        self.env = {}
+        self.__replace_store([])
+        try:
+            self.read_all_env(params={"page_size": 50})
+        except Exception:
+            self.env = current
+            self.__replace_store(current.values())
+            raise
+
+    # The inventory store (if enabled) mirrors the cache.
+    def __replace_store(self, items: Iterable[CCloudEnvironment]) -> None:
+        if self.inventory_store:
+            self.inventory_store.replace("environments", [(v.env_id, v.display_name, v.created_at) for v in items])
+
     def __add_env_to_cache(self, ccloud_env: CCloudEnvironment) -> None:
         self.env[ccloud_env.env_id] = ccloud_env
+        if self.inventory_store:
+            self.inventory_store.upsert(
+                "environments", (ccloud_env.env_id, ccloud_env.display_name, ccloud_env.created_at)
+            )
 
     # Read/Find one Cluster from the cache
     def find_environment(self, env_id):
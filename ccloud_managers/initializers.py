@@ -20,7 +20,9 @@ def initialize(csm_bundle: CSMYAMLConfigBundle) -> CCloudConfigBundle:
     # Gather Service Account details pre-existing in CCloud
     ccloud_sa_list = CCloudServiceAccountList(_ccloud_connection=ccloud_conn, _csm_bundle=csm_bundle)
     printline()
-    ccloud_api_key_list = CCloudAPIKeyList(_ccloud_connection=ccloud_conn, ccloud_sa=ccloud_sa_list)
+    ccloud_api_key_list = CCloudAPIKeyList(
+        _ccloud_connection=ccloud_conn, ccloud_sa=ccloud_sa_list, ccloud_clusters=ccloud_cluster_list
+    )
     printline()
     ccloud_bundle = CCloudConfigBundle(
         cc_environments=ccloud_env_list,
@@ -1,12 +1,14 @@
+import logging
 from dataclasses import dataclass, field
-from typing import Dict, Tuple
+from typing import Dict, Iterable, List, Tuple
 from urllib import parse
 
 import app_managers.core.types as CSMBundle
-import requests
 
 from ccloud_managers.connection import CCloudBase
 
+LOGGER = logging.getLogger(__name__)
+
 
 @dataclass
 class CCloudServiceAccount:
@@ -23,15 +25,24 @@ class CCloudServiceAccountList(CCloudBase):
 
     _csm_bundle: CSMBundle.CSMYAMLConfigBundle
     sa: Dict[str, CCloudServiceAccount] = field(default_factory=dict)
+    # The ignored Service Account IDs from the configurations, before the detected internal ones are added.
+    configured_ignore_sa_ids: List[str] = field(init=False, default_factory=list)
 
     def __post_init__(self) -> None:
         super().__post_init__()
+        self.configured_ignore_sa_ids = list(self._csm_bundle.csm_configs.ccloud.ignore_service_account_list)
         self.url = self._ccloud_connection.get_endpoint_url(key=self._ccloud_connection.uri.service_accounts)
+        self.__replace_store([])
         self.read_all_sa(params={"page_size": 50}, csm_bundle=self._csm_bundle)
+        LOGGER.info(
+            "Found %d Service Account(s), %d ignored.",
+            len(self.sa),
+            len([v for v in self.sa.values() if v.is_ignored]),
+        )
 
     def __str__(self) -> str:
         for item in self.sa.values():
-            print("{:<15} {:<40} {:<50}".format(item.resource_id, item.name, item.description))
+            LOGGER.info("{:<15} {:<40} {:<50}".format(item.resource_id, item.name, item.description))
 
     def __try_detect_internal_service_accounts(self, sa_name: str) -> bool:
         if sa_name.startswith(("Connect.lcc-", "KSQL.lksqlc-")):
@@ -41,10 +52,14 @@ class CCloudServiceAccountList(CCloudBase):
 
     # Read ALL Service Account details from Confluent Cloud
     def read_all_sa(self, params, csm_bundle: CSMBundle.CSMYAMLConfigBundle):
-        resp = requests.get(url=self.url, auth=self.http_connection, params=params)
+        resp = self.http_session.get(url=self.url, auth=self.http_connection, params=params)
         if resp.status_code == 200:
             out_json = resp.json()
             for item in out_json["data"]:
+                # The IAM API cannot filter on the display name, so the Service Accounts outside the scope are
+                # dropped here. Their API Keys and secrets are then never loaded either.
+                if not csm_bundle.csm_scope.includes_sa(item["display_name"]):
+                    continue
                 is_in_ignored_list = (
                     True if item["id"] in csm_bundle.csm_configs.ccloud.ignore_service_account_list else False
                 )
@@ -52,7 +67,8 @@ class CCloudServiceAccountList(CCloudBase):
                     csm_bundle.csm_configs.ccloud.detect_ignore_ccloud_internal_accounts
                     and self.__try_detect_internal_service_accounts(item["display_name"])
                 ):
-                    csm_bundle.csm_configs.ccloud.ignore_service_account_list.append(item["id"])
+                    if not is_in_ignored_list:
+                        csm_bundle.csm_configs.ccloud.ignore_service_account_list.append(item["id"])
                     is_in_ignored_list = True
                 self.__add_to_cache(
                     CCloudServiceAccount(
@@ -64,16 +80,47 @@ class CCloudServiceAccountList(CCloudBase):
                         is_ignored=is_in_ignored_list,
                     )
                 )
-                print(f"Found SA: {item['id']}; Is Ignored: {is_in_ignored_list} with name {item['display_name']}")
+                LOGGER.debug(
+                    "Found SA: %s; Is Ignored: %s with name %s",
+                    item["id"],
+                    is_in_ignored_list,
+                    item["display_name"],
+                )
             if "next" in out_json["metadata"]:
                 query_params = parse.parse_qs(parse.urlsplit(out_json["metadata"]["next"]).query)
                 params["page_token"] = str(query_params["page_token"][0])
-                self.read_all_sa(params)
+                self.read_all_sa(params, csm_bundle)
         else:
             raise Exception("Could not connect to Confluent Cloud. Please check your settings. " + resp.text)
 
+    # Re-reads all the Service Accounts. The current cache is kept if CCloud cannot be reached. The ignored list is
+    # rebuilt from the configured IDs, so the internal Service Accounts deleted since are not kept in it.
+    def refresh(self):
+        ignore_sa_ids = self._csm_bundle.csm_configs.ccloud.ignore_service_account_list
+        current = (self.sa, list(ignore_sa_ids))
+        self.sa = {}
+        ignore_sa_ids[:] = self.configured_ignore_sa_ids
+        self.__replace_store([])
+        try:
+            self.read_all_sa(params={"page_size": 50}, csm_bundle=self._csm_bundle)
+        except Exception:
+            self.sa = current[0]
+            ignore_sa_ids[:] = current[1]
+            self.__replace_store(current[0].values())
+            raise
+
+    # The inventory store (if enabled) mirrors the cache.
+    def __store_row(self, ccloud_sa: CCloudServiceAccount) -> tuple:
+        return (ccloud_sa.resource_id, ccloud_sa.name, ccloud_sa.description, int(ccloud_sa.is_ignored))
+
+    def __replace_store(self, items: Iterable[CCloudServiceAccount]) -> None:
+        if self.inventory_store:
+            self.inventory_store.replace("service_accounts", [self.__store_row(v) for v in items])
+
     def __add_to_cache(self, ccloud_sa: CCloudServiceAccount) -> None:
         self.sa[ccloud_sa.resource_id] = ccloud_sa
+        if self.inventory_store:
+            self.inventory_store.upsert("service_accounts", self.__store_row(ccloud_sa))
 
     # Read/Find one SA from the cache
     def find_sa(self, sa_name):
@@ -84,6 +131,8 @@ class CCloudServiceAccountList(CCloudBase):
 
     def __delete_from_cache(self, res_id):
         self.sa.pop(res_id, None)
+        if self.inventory_store:
+            self.inventory_store.delete("service_accounts", res_id)
 
     # Create/Find one SA and add it to the cache, so that we do not have to refresh the cache manually
     def create_sa(self, sa_name, description=None) -> Tuple[CCloudServiceAccount, bool]:
@@ -97,7 +146,7 @@ class CCloudServiceAccountList(CCloudBase):
             if not description
             else description,
         }
-        resp = requests.post(
+        resp = self.http_session.post(
             url=self.url,
             auth=self.http_connection,
             json=payload,
@@ -117,13 +166,22 @@ class CCloudServiceAccountList(CCloudBase):
         else:
             raise Exception("Could not connect to Confluent Cloud. Please check your settings. " + resp.text)
 
+    # Deletes the Service Account by its resource ID, without a scan of the cache for the name.
+    def delete_sa_by_id(self, sa_id: str) -> bool:
+        resp = self.http_session.delete(url=str(self.url + "/" + sa_id), auth=self.http_connection)
+        if resp.status_code in (204, 404):
+            self.__delete_from_cache(sa_id)
+            return True
+        else:
+            raise Exception("Could not perform the DELETE operation. Please check your settings. " + resp.text)
+
     def delete_sa(self, sa_name) -> bool:
         temp = self.find_sa(sa_name)
         if not temp:
-            print("Did not find Service Account with name '" + sa_name + "'. Not deleting anything.")
+            LOGGER.warning("Did not find Service Account with name '%s'. Not deleting anything.", sa_name)
             return False
         else:
-            resp = requests.delete(url=str(self.url + "/" + temp.resource_id), auth=self.http_connection)
+            resp = self.http_session.delete(url=str(self.url + "/" + temp.resource_id), auth=self.http_connection)
             if resp.status_code == 204:
                 self.__delete_from_cache(temp.resource_id)
                 return True
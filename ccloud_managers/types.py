@@ -11,3 +11,11 @@ class CCloudConfigBundle:
     cc_clusters: clusters.CCloudClusterList
     cc_service_accounts: service_accounts.CCloudServiceAccountList
     cc_api_keys: api_keys.CCloudAPIKeyList
+
+    # Refreshes all the caches in the dependency order, as clusters are read per environment
+    # and API Keys are only considered for the known Service Accounts.
+    def refresh(self):
+        self.cc_environments.refresh()
+        self.cc_clusters.refresh()
+        self.cc_service_accounts.refresh()
+        self.cc_api_keys.refresh()
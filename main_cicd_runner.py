@@ -1,7 +1,9 @@
 import argparse
+import os
+import sys
 
+import app_managers.logger as CSMLogger
 from app_managers.helpers import printline
-import app_managers.workflow_manager.main as WorkflowManager
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -24,7 +26,8 @@ if __name__ == "__main__":
         type=str,
         default=None,
         metavar="/full/path/of/the/definitions/file.yaml",
-        help="This is the definition file path that will provide the resource definitions for execution in CCloud.",
+        help="This is the definition file path that will provide the resource definitions for execution in CCloud. "
+        + "Could also be a directory of definition files, which are parsed in parallel and merged.",
     )
     conf_args.add_argument(
         "--csm-generate-definitions-file",
@@ -32,12 +35,26 @@ if __name__ == "__main__":
         action="store_true",
         help="This switch can be used for the initial runs where the team does not have a definitions file and would like to auto generate one from the existing ccloud resource mappings.",
     )
+    conf_args.add_argument(
+        "--csm-generated-definitions-file-path",
+        type=str,
+        default="generated_definitions.yaml",
+        metavar="/full/path/of/the/generated/definitions/file.yaml",
+        help="Output file path for --csm-generate-definitions-file. Defaults to generated_definitions.yaml.",
+    )
     conf_args.add_argument(
         "--dry-run",
         default=False,
         action="store_true",
         help="This switch can be used to invoke a dry run and list all the action that will be preformed, but not performing them.",
     )
+    conf_args.add_argument(
+        "--estimate-plan",
+        default=False,
+        action="store_true",
+        help="Estimates the CCloud and AWS calls and the duration of every phase of the run, then exits without "
+        + "changing anything. Implies --dry-run.",
+    )
     conf_args.add_argument(
         "--disable-api-key-creation",
         default=False,
@@ -51,7 +68,288 @@ if __name__ == "__main__":
         help="This switch can be used to print the API keys which are not synced to the Secret store and (potentially) not used.",
     )
 
+    scope_args = parser.add_argument_group(
+        "scope-args",
+        "Arguments for limiting the run to some environments, clusters or Service Accounts. Nothing outside the scope is loaded or considered for deletion.",
+    )
+    scope_args.add_argument(
+        "--env",
+        type=str,
+        default=[],
+        action="append",
+        dest="scope_env_ids",
+        metavar="env-abc123",
+        help="Environment ID in scope. Could be provided multiple times.",
+    )
+    scope_args.add_argument(
+        "--cluster",
+        type=str,
+        default=[],
+        action="append",
+        dest="scope_cluster_ids",
+        metavar="lkc-abc123",
+        help="Cluster ID in scope. Could be provided multiple times.",
+    )
+    scope_args.add_argument(
+        "--sa",
+        type=str,
+        default=[],
+        action="append",
+        dest="scope_sa_names",
+        metavar="service_account_name",
+        help="Service Account name in scope. Could be provided multiple times.",
+    )
+
+    shard_args = parser.add_argument_group(
+        "shard-args",
+        "Arguments for splitting a run between multiple runners that lease Service Account and cluster shards",
+    )
+    shard_args.add_argument(
+        "--shard-count",
+        type=int,
+        default=0,
+        help="Number of Service Account shards (and REST Proxy cluster shards) of a sharded run. 0 runs unsharded.",
+    )
+    shard_args.add_argument(
+        "--shard-run-id",
+        type=str,
+        default=None,
+        metavar="pipeline-run-id",
+        help="ID of the sharded run, the same for all its runners. A shard is run once per run ID.",
+    )
+    shard_args.add_argument(
+        "--runner-id",
+        type=str,
+        default=None,
+        help="ID of this runner in the shard leases. Defaults to the host name and the process ID.",
+    )
+    shard_args.add_argument(
+        "--shard-lease-dir",
+        type=str,
+        default=None,
+        metavar="/full/path/of/the/lease/dir",
+        help="Keep the shard leases as files in this (shared) directory instead of the secret store.",
+    )
+    shard_args.add_argument(
+        "--shard-lease-ttl-secs",
+        type=float,
+        default=300,
+        help="A shard lease that is not renewed for this long is taken over by another runner.",
+    )
+    shard_args.add_argument(
+        "--shard-poll-interval-secs",
+        type=float,
+        default=10,
+        help="Interval for checking the shards leased by the other runners.",
+    )
+    # Set for the runs of the single shards only.
+    parser.set_defaults(scope_cluster_shard=None, shard_phase=None)
+
+    diff_args = parser.add_argument_group(
+        "definitions-diff-args", "Arguments for reconciling only the Service Accounts changed in the definitions"
+    )
+    diff_args.add_argument(
+        "--changed-only",
+        default=False,
+        action="store_true",
+        help="Reconcile only the Service Accounts added, removed or changed since the last applied definitions (and the REST Proxy users they affect).",
+    )
+    diff_args.add_argument(
+        "--csm-applied-definitions-rev",
+        type=str,
+        default=None,
+        metavar="git-revision",
+        help="Compare with the definitions at this git revision instead of the snapshot recorded by the last successful run.",
+    )
+    diff_args.add_argument(
+        "--full-reconcile-interval-hours",
+        type=float,
+        default=24,
+        help="--changed-only runs a full reconcile if the last one recorded is older than this. 0 disables the periodic full reconcile.",
+    )
+
+    journal_args = parser.add_argument_group("journal-args", "Arguments for the run journal")
+    journal_args.add_argument(
+        "--resume",
+        default=False,
+        action="store_true",
+        help="Resume from the run journal: the API Secrets of the API Keys created by an earlier run that were not written to the secret store are recovered instead of creating new API Keys.",
+    )
+    journal_args.add_argument(
+        "--csm-journal-dir",
+        type=str,
+        default=".csm_journal",
+        metavar="/full/path/of/the/journal/dir",
+        help="Directory for the run journal files. One journal file is kept per configuration file.",
+    )
+
+    multi_args = parser.add_argument_group(
+        "multi-config-args", "Arguments for processing multiple configuration & definition files in one invocation"
+    )
+    multi_args.add_argument(
+        "--csm-config-dir",
+        type=str,
+        default=None,
+        metavar="/full/path/of/the/configurations/dir",
+        help="Directory with one sub directory per organization/team, each containing a config.yaml and a definitions.yaml file.",
+    )
+    multi_args.add_argument(
+        "--csm-config-pair",
+        type=str,
+        default=[],
+        action="append",
+        dest="csm_config_pairs",
+        metavar="/path/config.yaml,/path/definitions.yaml",
+        help="A configuration & definitions file pair to process. Could be provided multiple times.",
+    )
+    multi_args.add_argument(
+        "--csm-max-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Maximum number of worker processes used when multiple configurations are processed.",
+    )
+    multi_args.add_argument(
+        "--csm-log-dir",
+        type=str,
+        default="logs",
+        metavar="/full/path/of/the/log/dir",
+        help="Directory for the per configuration log files when multiple configurations are processed.",
+    )
+
+    daemon_args = parser.add_argument_group(
+        "daemon-args", "Arguments for running as a long running reconcile daemon with a warm inventory cache"
+    )
+    daemon_args.add_argument(
+        "--daemon",
+        default=False,
+        action="store_true",
+        help="Keep running, refresh the inventory on an interval and reconcile whenever the configuration or definitions file changes.",
+    )
+    daemon_args.add_argument(
+        "--daemon-refresh-interval-secs",
+        type=int,
+        default=300,
+        help="Interval for refreshing the CCloud and Secret Store inventory in daemon mode.",
+    )
+    daemon_args.add_argument(
+        "--daemon-poll-interval-secs",
+        type=int,
+        default=5,
+        help="Interval for checking the configuration and definitions files for changes in daemon mode.",
+    )
+
+    server_args = parser.add_argument_group(
+        "server-args", "Arguments for running as an HTTP reconcile service with a warm inventory cache"
+    )
+    server_args.add_argument(
+        "--serve",
+        default=False,
+        action="store_true",
+        help="Run an HTTP service with POST /reconcile, POST /plan (dry run), GET /status and GET /runs/<run_id> endpoints.",
+    )
+    server_args.add_argument(
+        "--serve-host",
+        type=str,
+        default="127.0.0.1",
+        help="Address the HTTP reconcile service binds to.",
+    )
+    server_args.add_argument(
+        "--serve-port",
+        type=int,
+        default=8080,
+        help="Port the HTTP reconcile service listens on.",
+    )
+    server_args.add_argument(
+        "--serve-debounce-secs",
+        type=float,
+        default=10,
+        help="Triggers of the same kind arriving within this window are merged into a single run.",
+    )
+
+    log_args = parser.add_argument_group("log-args", "Arguments for the application logs")
+    log_args.add_argument(
+        "--log-level",
+        type=str,
+        default="info",
+        choices=CSMLogger.LOG_LEVELS,
+        help="Level of the application logs. debug adds a line for every API Key, Service Account, secret and task.",
+    )
+    log_args.add_argument(
+        "--log-format",
+        type=str,
+        default="text",
+        choices=CSMLogger.LOG_FORMATS,
+        help="Format of the application logs. json writes one JSON object per line.",
+    )
+
+    profile_args = parser.add_argument_group("profile-args", "Arguments for profiling the application startup")
+    profile_args.add_argument(
+        "--import-profile",
+        default=False,
+        action="store_true",
+        help="Report the import time per module for every phase of the run and exit without running any workflow.",
+    )
+    profile_args.add_argument(
+        "--import-profile-top",
+        type=int,
+        default=25,
+        help="Number of the slowest modules to list in the import profile.",
+    )
+
     args = parser.parse_args()
+    CSMLogger.setup_logging(level=args.log_level, log_format=args.log_format)
+    # The estimate goes through the same planning as a dry run; no journal or applied snapshot is written.
+    if args.estimate_plan:
+        args.dry_run = True
+
+    if args.import_profile:
+        import app_managers.import_profile as ImportProfile
+
+        sys.exit(ImportProfile.print_import_profile(top_n=args.import_profile_top))
+
+    if args.csm_config_dir or args.csm_config_pairs:
+        import app_managers.workflow_manager.multi_runner as MultiRunner
+
+        targets = []
+        if args.csm_config_dir:
+            targets.extend(MultiRunner.find_targets_in_dir(args.csm_config_dir))
+        targets.extend(MultiRunner.find_targets_in_pairs(args.csm_config_pairs))
+        results = MultiRunner.trigger_multi_config_workflows(
+            args=args, targets=targets, max_workers=args.csm_max_workers, log_dir=args.csm_log_dir
+        )
+        sys.exit(MultiRunner.print_run_summary(results))
+
+    if args.shard_count > 0:
+        import app_managers.workflow_manager.shard_runner as ShardRunner
+
+        ShardRunner.trigger_sharded_workflows(args=args)
+        sys.exit(0)
+
+    if args.serve:
+        import app_managers.workflow_manager.daemon as ReconcileDaemon
+        import app_managers.workflow_manager.server as ReconcileServer
+
+        ReconcileServer.serve(
+            daemon=ReconcileDaemon.CSMReconcileDaemon(
+                args=args, refresh_interval_secs=args.daemon_refresh_interval_secs
+            ),
+            host=args.serve_host,
+            port=args.serve_port,
+            debounce_secs=args.serve_debounce_secs,
+        )
+        sys.exit(0)
+
+    if args.daemon:
+        import app_managers.workflow_manager.daemon as ReconcileDaemon
+
+        ReconcileDaemon.CSMReconcileDaemon(
+            args=args,
+            refresh_interval_secs=args.daemon_refresh_interval_secs,
+            poll_interval_secs=args.daemon_poll_interval_secs,
+        ).run_forever()
+        sys.exit(0)
+
+    import app_managers.workflow_manager.main as WorkflowManager
 
     printline()
     # Trigger Workflows
@@ -1,11 +1,17 @@
+import contextlib
+import fcntl
 import hashlib
 import itertools
+import logging
+import os
 import pprint
+import time
 from dataclasses import dataclass
 from json import dumps, loads
-from typing import Dict, List
+from typing import Dict, List, Set
 
 import app_managers.core.types as CSMBundle
+import app_managers.rate_limiter as RateLimiter
 import boto3
 from botocore.client import Config
 from ccloud_managers.clusters import CCloudCluster
@@ -13,9 +19,87 @@ from ccloud_managers.service_account import CCloudServiceAccount
 import ccloud_managers.types as CCloudBundle
 from botocore.exceptions import ClientError
 from ccloud_managers.api_key_manager import CCloudAPIKey
+from secret_managers.rest_proxy_users import (
+    RP_FE_USERS_KEY,
+    RP_KAFKA_USERS_KEY,
+    RestProxyShardManifest,
+    RestProxyUsers,
+    add_users_counts,
+)
 from secret_managers.types import CSMSecret, CSMSecretsManager
 
 pp = pprint.PrettyPrinter(indent=2)
+LOGGER = logging.getLogger(__name__)
+
+# boto3 clients are thread safe and are pooled per set of login configurations, so that the configurations
+# processed by the same process with the same credentials reuse the client and its connection pool.
+_CLIENTS: Dict[str, object] = {}
+# The secrets created up to this long before the last listing are listed again by the delta listing, so that a
+# clock difference with AWS does not hide them.
+SNAPSHOT_WATERMARK_SKEW_SECS = 300
+
+
+def get_client(secretstore_configs: Dict) -> RateLimiter.RateLimitedClient:
+    # AWS makes it pretty simple and all it needs is a few ENV variables.
+    # Details here: https://boto3.amazonaws.com/v1/documentation/api/latest/guide/configuration.html#guide-configuration
+    login_kwargs = dict(secretstore_configs)
+    login_kwargs["service_name"] = "secretsmanager"
+    client_key = dumps(login_kwargs, sort_keys=True, default=str)
+    if client_key not in _CLIENTS:
+        # The Additional Configs are not entertained by boto3 as kwargs.
+        # We need to create a separate botocore Config object and then pass as
+        extra_configs = login_kwargs.pop("config", None)
+        if extra_configs:
+            extra_configs = Config(**extra_configs)
+        # Every call goes through the adaptive rate limiter, which backs off on ThrottlingException.
+        _CLIENTS[client_key] = RateLimiter.RateLimitedClient(
+            boto3.client(config=extra_configs, **login_kwargs), prefix="aws:secretsmanager"
+        )
+    return _CLIENTS[client_key]
+
+
+# The lease records of a sharded run, kept as plain JSON secrets. They do not carry the tags of the managed
+# secrets, so they are never listed as CCloud secrets. Secrets Manager has no conditional write, so the last writer
+# wins: a lease is only held once it reads back with the runner as the owner after the settle time.
+class AWSLeaseStore:
+    settle_secs = 2.0
+
+    def __init__(self, csm_configs: CSMBundle.CSMYAMLConfigs, namespace: str) -> None:
+        self.client_reference = get_client(csm_configs.secretstore.configs)
+        self.separator = csm_configs.secretstore.separator
+        self.name_prefix = self.separator.join(
+            [v for v in [csm_configs.secretstore.prefix, "csm-leases", namespace] if v]
+        )
+
+    def __secret_name(self, lease_name: str) -> str:
+        return self.name_prefix + self.separator + lease_name
+
+    # The writes are checked by reading back the lease, so there is nothing to lock.
+    def lock(self):
+        return contextlib.nullcontext()
+
+    def read(self, lease_name: str) -> Dict:
+        try:
+            resp = self.client_reference.get_secret_value(SecretId=self.__secret_name(lease_name))
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ResourceNotFoundException":
+                return None
+            raise
+        return loads(resp["SecretString"])
+
+    def write(self, lease_name: str, record: Dict):
+        try:
+            self.client_reference.put_secret_value(
+                SecretId=self.__secret_name(lease_name), SecretString=dumps(record, sort_keys=True)
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
+            self.client_reference.create_secret(
+                Name=self.__secret_name(lease_name),
+                Description="Shard lease of the CCloud Secrets Manager sharded runs.",
+                SecretString=dumps(record, sort_keys=True),
+            )
 
 
 @dataclass(kw_only=True)
@@ -27,26 +111,29 @@ class AWSSecret(CSMSecret):
 class AWSSecretsList(CSMSecretsManager):
     secret: Dict[str, AWSSecret]
     client_reference = ""
+    # Secret name -> tags, last change, creation time and version IDs, as kept in the metadata snapshot.
+    secret_metadata: Dict[str, Dict]
 
     def __init__(
         self, csm_bundle: CSMBundle.CSMYAMLConfigBundle, ccloud_bundle: CCloudBundle.CCloudConfigBundle
     ) -> None:
         super().__init__(csm_bundle=csm_bundle, ccloud_bundle=ccloud_bundle)
         self.secret = {}
+        self.secret_metadata = {}
+        # Start of the last listing and of the last full listing, for the metadata snapshot.
+        self.listed_at, self.full_sweep_at = None, None
+        # The secrets added, changed (their metadata) or deleted (None) since the snapshot was last written. A scoped
+        # run merges them into the snapshot by name, as it does not list all the secrets.
+        self.metadata_changes: Dict[str, Dict] = {}
+        # Whether the cached tags could be older than the store: loaded from the metadata snapshot, or kept by a delta
+        # listing instead of a full listing.
+        self.is_snapshot_loaded = False
+        self._replace_secret_store([])
         self.login()
-        self.read_all_secrets()
+        self.load_secrets()
 
     def login(self):
-        # AWS makes it pretty simple and all it needs is a few ENV variables.
-        # Details here: https://boto3.amazonaws.com/v1/documentation/api/latest/guide/configuration.html#guide-configuration
-        login_kwargs = self.csm_bundle.csm_configs.secretstore.configs
-        login_kwargs["service_name"] = "secretsmanager"
-        # The Additional Configs are not entertained by boto3 as kwargs.
-        # We need to create a separate botocore Config object and then pass as
-        extra_configs = login_kwargs.pop("config", None)
-        if extra_configs:
-            extra_configs = Config(**extra_configs)
-        self.client_reference = boto3.client(config=extra_configs, **login_kwargs)
+        self.client_reference = get_client(self.csm_bundle.csm_configs.secretstore.configs)
         if not self.test_login():
             raise Exception("Cannot set up a connection with AWS Secrets Manager. Will not be able to proceed.")
 
@@ -61,6 +148,15 @@ class AWSSecretsList(CSMSecretsManager):
             output_filter.append({"Key": "tag-value", "Values": v})
         return output_filter
 
+    # The clusters (or environments) in scope are pushed down to the listing as a tag value filter, which is ANDed
+    # with the other filters. A filter takes at most 10 values, so larger scopes are only filtered after listing.
+    def __create_scope_filter(self):
+        scope = self.csm_bundle.csm_scope
+        values = scope.cluster_ids or scope.env_ids
+        if values and len(values) <= 10:
+            return [{"Key": "tag-value", "Values": list(values)}]
+        return []
+
     def __render_secret_tags_format(self, tags: dict):
         return [{"Key": str(k), "Value": str(v)} for k, v in tags.items()]
 
@@ -71,12 +167,25 @@ class AWSSecretsList(CSMSecretsManager):
         output = hashlib.md5(dumps(json_object_data, sort_keys=True).encode("utf-8")).hexdigest()
         return output
 
+    def __cache_listed_secret(self, item: Dict):
+        secret_tags = self.__flatten_secret_tags(item["Tags"])
+        if not self._is_secret_in_scope(item["Name"], secret_tags):
+            return
+        self.add_to_cache(item["Name"], None, secret_tags)
+        self.secret_metadata[item["Name"]].update(
+            {
+                "last_changed": item["LastChangedDate"].timestamp() if item.get("LastChangedDate") else None,
+                "created": item["CreatedDate"].timestamp() if item.get("CreatedDate") else None,
+                "versions": sorted(item.get("SecretVersionsToStages", {}).keys()),
+            }
+        )
+
     def read_all_secrets(
         self,
         filter: Dict[str, List[str]] = {"secret_manager": ["confluent_cloud"]},
         **kwargs,
     ):
-        out_filter = self.__create_filter_tags(filter)
+        out_filter = self.__create_filter_tags(filter) + self.__create_scope_filter()
         resp = self.client_reference.list_secrets(Filters=out_filter, **kwargs)
         if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
             raise Exception(
@@ -84,11 +193,196 @@ class AWSSecretsList(CSMSecretsManager):
             )
         else:
             for item in resp["SecretList"]:
-                self.add_to_cache(item["Name"], None, self.__flatten_secret_tags(item["Tags"]))
+                self.__cache_listed_secret(item)
             next_token = resp.get("NextToken", False)
             if next_token:
                 self.read_all_secrets(filter=filter, NextToken=next_token)
 
+    # Lists the managed secrets newest first and stops at the first one created before the watermark. AWS only sorts
+    # the listing on the creation date, so the changes to the older secrets are caught by the periodic full sweep.
+    def __read_secrets_created_since(self, watermark: float) -> int:
+        out_filter = self.__create_filter_tags({"secret_manager": ["confluent_cloud"]})
+        kwargs, listed_count = {}, 0
+        while True:
+            resp = self.client_reference.list_secrets(Filters=out_filter, SortOrder="desc", **kwargs)
+            for item in resp["SecretList"]:
+                if item["CreatedDate"].timestamp() < watermark - SNAPSHOT_WATERMARK_SKEW_SECS:
+                    return listed_count
+                self.__cache_listed_secret(item)
+                listed_count += 1
+            if not resp.get("NextToken", None):
+                return listed_count
+            kwargs["NextToken"] = resp["NextToken"]
+
+    # The snapshot is only used by the runs that cover all the secrets, with the same store and the same listing.
+    def __is_snapshot_enabled(self) -> bool:
+        snapshot_path = self.csm_bundle.csm_configs.secretstore.metadata_snapshot_path
+        return bool(snapshot_path) and not self.csm_bundle.csm_scope.is_scoped()
+
+    def __find_snapshot_key(self) -> str:
+        secretstore = self.csm_bundle.csm_configs.secretstore
+        return self.__create_digest(
+            {"configs": secretstore.configs, "filter": {"secret_manager": ["confluent_cloud"]}}
+        )
+
+    # The snapshot is written by the unscoped runs and merged into by the scoped runs, which could run in parallel.
+    @contextlib.contextmanager
+    def __lock_metadata_snapshot(self, file_path: str):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __read_metadata_snapshot(self, file_path: str) -> Dict:
+        if not os.path.isfile(file_path):
+            return None
+        with open(file_path, "r") as f:
+            snapshot = loads(f.read())
+        return snapshot if snapshot.get("key", None) == self.__find_snapshot_key() else None
+
+    def __write_metadata_snapshot(self, file_path: str, snapshot: Dict):
+        with open(file_path + ".tmp", "w") as f:
+            f.write(dumps(snapshot, sort_keys=True))
+        os.replace(file_path + ".tmp", file_path)
+
+    def __is_full_sweep_due(self, full_sweep_at: float) -> bool:
+        hours = self.csm_bundle.csm_configs.secretstore.metadata_full_sweep_hours
+        return not full_sweep_at or (hours > 0 and time.time() - full_sweep_at > hours * 3600)
+
+    def __load_metadata_snapshot(self) -> Dict:
+        file_path = self.csm_bundle.csm_configs.secretstore.metadata_snapshot_path
+        if not self.__is_snapshot_enabled() or not os.path.isfile(file_path):
+            return None
+        with self.__lock_metadata_snapshot(file_path):
+            snapshot = self.__read_metadata_snapshot(file_path)
+        if snapshot is None:
+            LOGGER.info("The secret metadata snapshot is for another secret store. All the secrets are listed.")
+            return None
+        if self.__is_full_sweep_due(snapshot.get("full_sweep_at", None)):
+            LOGGER.info("A full sweep of the secret store is due. All the secrets are listed.")
+            return None
+        return snapshot
+
+    # Loads the secrets from the metadata snapshot plus the ones created since, or from a full listing if there is no
+    # usable snapshot. The listing start is the watermark of the next delta listing.
+    def load_secrets(self):
+        snapshot = self.__load_metadata_snapshot()
+        listing_started_at = time.time()
+        if snapshot is None:
+            self.read_all_secrets()
+            self.full_sweep_at = listing_started_at
+        else:
+            for k, v in snapshot["secrets"].items():
+                self.add_to_cache(k, None, v["tags"])
+                self.secret_metadata[k].update(v)
+            listed_count = self.__read_secrets_created_since(snapshot["listed_at"])
+            self.full_sweep_at = snapshot["full_sweep_at"]
+            self.is_snapshot_loaded = True
+            LOGGER.info(
+                "%d secret(s) loaded from the metadata snapshot of %s and %d listed since.",
+                len(snapshot["secrets"]),
+                time.ctime(snapshot["listed_at"]),
+                listed_count,
+            )
+        self.listed_at = listing_started_at
+        self.save_metadata_snapshot()
+
+    # An unscoped run writes the metadata of all the secrets. A scoped run only knows the secrets in its scope, so it
+    # merges the secrets it added, changed or deleted into the existing snapshot by name, and leaves the rest as is.
+    def save_metadata_snapshot(self):
+        file_path = self.csm_bundle.csm_configs.secretstore.metadata_snapshot_path
+        if not file_path:
+            return
+        with self.__lock_metadata_snapshot(file_path):
+            if self.__is_snapshot_enabled():
+                if self.listed_at is None:
+                    return
+                snapshot = {
+                    "key": self.__find_snapshot_key(),
+                    "listed_at": self.listed_at,
+                    "full_sweep_at": self.full_sweep_at,
+                    "secrets": self.secret_metadata,
+                }
+            else:
+                snapshot = self.__read_metadata_snapshot(file_path)
+                # Without a snapshot, the next unscoped run lists all the secrets anyway.
+                if snapshot is None or not self.metadata_changes:
+                    self.metadata_changes = {}
+                    return
+                for k, v in self.metadata_changes.items():
+                    if v is None:
+                        snapshot["secrets"].pop(k, None)
+                    else:
+                        snapshot["secrets"][k] = v
+                LOGGER.info("%d secret change(s) merged into the metadata snapshot.", len(self.metadata_changes))
+            self.__write_metadata_snapshot(file_path, snapshot)
+        self.metadata_changes = {}
+
+    def __drop_secret_metadata(self, secret_name: str):
+        self.secret_metadata.pop(secret_name, None)
+        self.metadata_changes[secret_name] = None
+
+    # Re-lists all the managed secrets, or only the ones created since the last listing if the metadata snapshot is
+    # enabled and no full sweep is due. The current cache is kept if the listing fails.
+    def refresh(self):
+        if self.__is_snapshot_enabled() and not self.__is_full_sweep_due(self.full_sweep_at):
+            listing_started_at = time.time()
+            self.__read_secrets_created_since(self.listed_at)
+            self.listed_at = listing_started_at
+            self.is_snapshot_loaded = True
+            self.save_metadata_snapshot()
+            return
+        current = (self.secret, self.secret_api_keys, self.secret_metadata)
+        self.secret, self.secret_api_keys, self.secret_metadata = {}, {}, {}
+        self._replace_secret_store([])
+        listing_started_at = time.time()
+        try:
+            self.read_all_secrets()
+        except Exception:
+            self.secret, self.secret_api_keys, self.secret_metadata = current
+            self._replace_secret_store(self.secret.values())
+            raise
+        self.listed_at, self.full_sweep_at = listing_started_at, listing_started_at
+        self.is_snapshot_loaded = False
+        self.save_metadata_snapshot()
+
+    # The tags loaded from the metadata snapshot are only as recent as the last run that wrote it, so the live tags of
+    # the secrets for the Service Account and cluster of every API Key are read before the API Key is confirmed to be
+    # in no secret. A secret found holding the API Key is cached again with its live tags.
+    def confirm_api_keys_not_in_store(self, api_key_ids: List[str]) -> List[str]:
+        if not self.is_snapshot_loaded or not api_key_ids:
+            return api_key_ids
+        output = []
+        for item in api_key_ids:
+            api_key = self.ccloud_bundle.cc_api_keys.api_keys.get(item, None)
+            if api_key is None or not self.__is_api_key_in_live_tags(api_key):
+                output.append(item)
+        return output
+
+    def __is_api_key_in_live_tags(self, api_key: CCloudAPIKey) -> bool:
+        for item in list(self.secret.values()):
+            if item.sa_id != api_key.owner_id or item.cluster_id != api_key.cluster_id:
+                continue
+            try:
+                resp = self.client_reference.describe_secret(SecretId=item.secret_name)
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                    raise e
+                continue
+            secret_tags = self.__flatten_secret_tags(resp.get("Tags", []))
+            if secret_tags.get("api_key", None) == api_key.api_key:
+                LOGGER.warning(
+                    "The secret %s holds the API Key %s, which the metadata snapshot did not know. Not deleting it.",
+                    item.secret_name,
+                    api_key.api_key,
+                )
+                self.add_to_cache(item.secret_name, None, secret_tags)
+                return True
+        return False
+
     def add_to_cache(self, secret_name: str, secret_value: Dict[str, str], secret_tags: Dict[str, str]) -> AWSSecret:
         if secret_tags.get("is_rest_proxy_user", "False") == "True":
             sync_needed = False
@@ -96,9 +390,12 @@ class AWSSecretsList(CSMSecretsManager):
             sync_needed = True
         else:
             sync_needed = False
+        self._remove_secret_api_key_index(secret_name)
+        # Any value cached for the secret is stale once the secret is added again after a write.
+        self.value_cache.invalidate(secret_name)
         self.secret[secret_name] = AWSSecret(
             secret_name=secret_name,
-            secret_value=secret_value,
+            secret_value=None,
             env_id=secret_tags["env_id"],
             sa_id=secret_tags["sa_id"],
             sa_name=secret_tags["sa_name"],
@@ -107,7 +404,20 @@ class AWSSecretsList(CSMSecretsManager):
             api_key=secret_tags.get("api_key", ""),
             sync_needed_for_rp=sync_needed,
             api_keys_count=secret_tags.get("api_keys_count", "0--0"),
+            rp_shard_of=secret_tags.get("rest_proxy_shard_of", ""),
+            is_rp_user=secret_tags.get("is_rest_proxy_user", "False") == "True",
         )
+        self._add_secret_api_key_index(self.secret[secret_name])
+        self._add_secret_to_store(self.secret[secret_name])
+        # The listing details are only known for the listed secrets; the ones written by the run get them from the
+        # next full sweep.
+        self.secret_metadata[secret_name] = {
+            "tags": {str(k): str(v) for k, v in secret_tags.items()},
+            "last_changed": None,
+            "created": None,
+            "versions": [],
+        }
+        self.metadata_changes[secret_name] = self.secret_metadata[secret_name]
         return self.secret[secret_name]
 
     def find_secret(self, sa_name: str, cluster_id: str = None, **kwargs) -> List[AWSSecret]:
@@ -122,7 +432,7 @@ class AWSSecretsList(CSMSecretsManager):
             resp = self.client_reference.get_secret_value(SecretId=secret_name)
         except ClientError as e:
             if e.response["Error"]["Code"] == "ResourceNotFoundException":
-                print("Secret Not Found.")
+                LOGGER.debug("Secret Not Found.")
                 return {}
             else:
                 raise e
@@ -132,10 +442,9 @@ class AWSSecretsList(CSMSecretsManager):
             )
         return resp
 
-    def get_parsed_secret_value(self, secret_name: str) -> Dict[str, str]:
-        secret_value = self.get_secret(secret_name=secret_name)
-        resp = loads(secret_value["SecretString"])
-        return resp
+    def _read_secret_value(self, secret_name: str) -> Dict[str, str]:
+        secret_data = self.get_secret(secret_name=secret_name)
+        return loads(secret_data["SecretString"]) if secret_data else None
 
     def __render_secret_tags(
         self, env_name, env_id, cluster_name, cluster_id, sa_name, sa_id, rest_proxy_access, **kwargs
@@ -190,42 +499,77 @@ class AWSSecretsList(CSMSecretsManager):
             self.add_to_cache(secret_name, secret_value, secret_tags)
         return self.secret.get(secret_name)
 
+    # All the secret writes go through here, so that the cached value of the secret is dropped on every write.
+    def __put_secret_value(self, secret_name: str, secret_values: dict):
+        try:
+            return self.client_reference.put_secret_value(SecretId=secret_name, SecretString=dumps(secret_values))
+        finally:
+            self.value_cache.invalidate(secret_name)
+
+    # The secrets are deleted with the default AWS recovery window unless forced, e.g. for the REST Proxy users
+    # shards, whose users are already in the other shards.
+    def __delete_secret(self, secret_name: str, force: bool = False):
+        try:
+            if force:
+                return self.client_reference.delete_secret(SecretId=secret_name, ForceDeleteWithoutRecovery=True)
+            return self.client_reference.delete_secret(SecretId=secret_name)
+        finally:
+            self.value_cache.invalidate(secret_name)
+
     def __create_secret(self, secret_name: str, secret_values: dict, secret_tags: list):
         # print("Trying to create a secret with the following details:")
         # pp.pprint({"Secret Name": secret_name, "Secret Tags": secret_tags})
-        resp = self.client_reference.create_secret(
-            Name=secret_name,
-            Description="API Key & Secret generated by the CI/CD process.",
-            SecretString=dumps(secret_values),
-            Tags=secret_tags,
-        )
+        try:
+            resp = self.client_reference.create_secret(
+                Name=secret_name,
+                Description="API Key & Secret generated by the CI/CD process.",
+                SecretString=dumps(secret_values),
+                Tags=secret_tags,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "InvalidRequestException":
+                raise e
+            current = self.client_reference.describe_secret(SecretId=secret_name)
+            if not current.get("DeletedDate", None):
+                raise e
+            resp = self.__restore_deleted_secret(secret_name, secret_values, secret_tags, current.get("Tags", []))
         # print("Secret Created Successfully. Secret Details as follows:")
         return resp
 
+    # A secret deleted with a recovery window keeps its name until the window ends, so creating it again fails. The
+    # secret is restored and overwritten instead, with the tags of the new secret only.
+    def __restore_deleted_secret(self, secret_name: str, secret_values: dict, secret_tags: list, current_tags: list):
+        LOGGER.info("Restoring the secret %s, which is scheduled for deletion, to write it again.", secret_name)
+        self.client_reference.restore_secret(SecretId=secret_name)
+        resp = self.__put_secret_value(secret_name, secret_values)
+        stale_tag_keys = set([v["Key"] for v in current_tags]).difference([v["Key"] for v in secret_tags])
+        if stale_tag_keys:
+            self.client_reference.untag_resource(SecretId=secret_name, TagKeys=sorted(stale_tag_keys))
+        self.client_reference.tag_resource(SecretId=secret_name, Tags=secret_tags)
+        return resp
+
     def __update_secret(
         self, secret_name: str, old_secret_values: str, new_secret_values: dict, new_secret_tags: list
     ):
         old_hash = self.__create_digest(loads(old_secret_values))
         new_hash = self.__create_digest(new_secret_values)
         if old_hash == new_hash:
-            print("Not updating Secret with the provided value as current value is same as the older value.")
+            LOGGER.debug("Not updating Secret with the provided value as current value is same as the older value.")
         else:
-            print(
-                f'Updating {secret_name} with the new API Key & Secret values. API Key ID: {new_secret_values["username"]}'
-            )
-            resp = self.client_reference.put_secret_value(
-                SecretId=secret_name,
-                SecretString=dumps(new_secret_values),
+            LOGGER.debug(
+                "Updating %s with the new API Key & Secret values. API Key ID: %s",
+                secret_name,
+                new_secret_values["username"],
             )
-            print("Updated secret successfully with new API Key/Secret. Secret Details:")
-            pp.pprint(resp)
-        print("Adding/Updating Tags as follows:")
+            resp = self.__put_secret_value(secret_name, new_secret_values)
+            LOGGER.debug("Updated secret successfully with new API Key/Secret. Secret Details: %s", resp)
+        LOGGER.debug("Adding/Updating Tags as follows:")
         # pp.pprint(new_secret_tags)
         resp = self.client_reference.tag_resource(SecretId=secret_name, Tags=new_secret_tags)
         if resp["ResponseMetadata"]["HTTPStatusCode"] != 200:
-            print("Was not able to update the secret tags.")
+            LOGGER.error("Was not able to update the secret tags.")
         else:
-            print("Tags Added successfully.")
+            LOGGER.debug("Tags Added successfully.")
         return
 
     # The function could be used to update the REST Proxy Users secret for adding all the api-keys to AWS Secret.
@@ -240,53 +584,212 @@ class AWSSecretsList(CSMSecretsManager):
         new_api_keys: List[CCloudAPIKey],
         secrets_with_rp_access: List[CSMSecret],
         is_rp_secret_new: bool,
+        retained_api_keys: Set[str] = None,
         **kwargs,
     ):
-        basic_key_string = "basic.txt"
-        jaas_key_string = "restProxyUsers.jaas"
+        basic_key_string = RP_FE_USERS_KEY
+        jaas_key_string = RP_KAFKA_USERS_KEY
         if not is_rp_secret_new:
             rp_secret = self.get_parsed_secret_value(secret_name=rp_secret_name)
         else:
             rp_secret = dict()
 
-        update_triggered, rp_secret, secrets_pending_tag_update = self._add_users_to_rest_proxy_secret_string(
-            rp_secret_name=rp_secret_name,
-            rp_secret_value=rp_secret,
-            new_api_keys=new_api_keys,
-            secrets_with_rp_access=secrets_with_rp_access,
-            is_rp_secret_new=is_rp_secret_new,
-            fe_users_key=basic_key_string,
-            kafka_users_key=jaas_key_string,
+        if (
+            self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_shards > 1
+            or RestProxyShardManifest.parse(rp_secret) is not None
+        ):
+            secrets_pending_tag_update = self.__create_update_sharded_rest_proxy_secrets(
+                rp_secret_name=rp_secret_name,
+                rp_sa_details=rp_sa_details,
+                rp_cluster_details=rp_cluster_details,
+                new_api_keys=new_api_keys,
+                secrets_with_rp_access=secrets_with_rp_access,
+                is_rp_secret_new=is_rp_secret_new,
+                rp_secret_value=rp_secret,
+                retained_api_keys=retained_api_keys,
+            )
+        else:
+            update_triggered, rp_secret, secrets_pending_tag_update = self._add_users_to_rest_proxy_secret_string(
+                rp_secret_name=rp_secret_name,
+                rp_secret_value=rp_secret,
+                new_api_keys=new_api_keys,
+                secrets_with_rp_access=secrets_with_rp_access,
+                is_rp_secret_new=is_rp_secret_new,
+                fe_users_key=basic_key_string,
+                kafka_users_key=jaas_key_string,
+                retained_api_keys=retained_api_keys,
+            )
+            if update_triggered:
+                api_keys_count = self._get_rp_users_count(
+                    secret_value=rp_secret, fe_users_key=basic_key_string, kafka_users_key=jaas_key_string
+                )
+                if is_rp_secret_new:
+                    secret_tags = self.__render_rest_proxy_secret_tags(
+                        rp_sa_details, rp_cluster_details, api_keys_count=api_keys_count["api_keys_count"]
+                    )
+                    self.__create_secret(rp_secret_name, rp_secret, self.__render_secret_tags_format(secret_tags))
+                    self.add_to_cache(rp_secret_name, rp_secret, secret_tags)
+                else:
+                    response = self.__put_secret_value(rp_secret_name, rp_secret)
+                    self.add_tags(secret_name=rp_secret_name, tags=api_keys_count)
+                    LOGGER.debug("Secret Successfully updated. Response\n %s", response)
+        RateLimiter.map_concurrently(
+            lambda v: self.add_tags(secret_name=v, tags={"sync_needed_for_rp": "False"}),
+            dict.fromkeys(v.secret_name for v in itertools.chain(secrets_with_rp_access, secrets_pending_tag_update)),
+        )
+
+    def __render_rest_proxy_secret_tags(
+        self, rp_sa_details: CCloudServiceAccount, rp_cluster_details: CCloudCluster, **kwargs
+    ) -> Dict[str, str]:
+        env_details = self.ccloud_bundle.cc_environments.find_environment(rp_cluster_details.env_id)
+        return self.__render_secret_tags(
+            env_name=env_details.display_name,
+            env_id=env_details.env_id,
+            cluster_name=rp_cluster_details.cluster_name,
+            cluster_id=rp_cluster_details.cluster_id,
+            sa_name=rp_sa_details.name,
+            sa_id=rp_sa_details.resource_id,
+            rest_proxy_access=False,
+            is_rest_proxy_user=True,
+            **kwargs,
         )
 
-        if update_triggered:
-            api_keys_count = self._get_rp_users_count(
-                secret_value=rp_secret, fe_users_key=basic_key_string, kafka_users_key=jaas_key_string
+    def find_rest_proxy_users_to_prune(self, rp_secret_name: str, retained_api_keys: Set[str]) -> List[str]:
+        if rp_secret_name not in self.secret:
+            return []
+        rp_secret = self.get_parsed_secret_value(secret_name=rp_secret_name)
+        manifest = RestProxyShardManifest.parse(rp_secret)
+        if manifest is None:
+            rp_users_list = [RestProxyUsers.parse(rp_secret)]
+        else:
+            rp_users_list = self.__read_rest_proxy_shards(manifest.shards)
+        return [v for rp_users in rp_users_list for v in rp_users.api_keys() if v not in retained_api_keys]
+
+    def __read_rest_proxy_shard(self, shard_name: str) -> RestProxyUsers:
+        secret_value = self.get_parsed_secret_value(shard_name) if shard_name in self.secret else None
+        return RestProxyUsers.parse(secret_value or dict())
+
+    # The shards are read concurrently; the calls in flight are bounded by the rate limiter for GetSecretValue.
+    def __read_rest_proxy_shards(self, shard_names: List[str]) -> List[RestProxyUsers]:
+        return RateLimiter.map_concurrently(self.__read_rest_proxy_shard, shard_names)
+
+    # Sharded layout for the REST Proxy users. The REST Proxy secret only holds the manifest with the list of shard
+    # secrets and every user is stored in the shard picked by a stable hash of its API Key. Only the shards that
+    # own a new or changed user are read and written; the api_keys_count tag on the manifest is the sum of the
+    # counts tagged on the shards. A legacy (single secret) payload or a change in the shard count redistributes
+    # all the existing users across the new shards once.
+    def __create_update_sharded_rest_proxy_secrets(
+        self,
+        rp_secret_name: str,
+        rp_sa_details: CCloudServiceAccount,
+        rp_cluster_details: CCloudCluster,
+        new_api_keys: List[CCloudAPIKey],
+        secrets_with_rp_access: List[CSMSecret],
+        is_rp_secret_new: bool,
+        rp_secret_value: Dict[str, str],
+        retained_api_keys: Set[str] = None,
+    ) -> List[CSMSecret]:
+        current_manifest = RestProxyShardManifest.parse(rp_secret_value)
+        manifest = RestProxyShardManifest.create(
+            manifest_secret_name=rp_secret_name,
+            rp_secret_name_postfix=self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name,
+            separator=self.csm_bundle.csm_configs.secretstore.separator,
+            shard_count=self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_shards,
+        )
+        is_manifest_changed = current_manifest is None or current_manifest.shards != manifest.shards
+        shards: Dict[str, RestProxyUsers] = dict()
+        if is_manifest_changed:
+            if current_manifest is None:
+                LOGGER.info("Moving the REST Proxy users in %s to %s shard(s).", rp_secret_name, manifest.shard_count)
+                existing_users = [RestProxyUsers.parse(rp_secret_value)]
+            else:
+                LOGGER.info(
+                    "Resharding %s from %s to %s.",
+                    rp_secret_name,
+                    current_manifest.shard_count,
+                    manifest.shard_count,
+                )
+                existing_users = self.__read_rest_proxy_shards(current_manifest.shards)
+            prepend = existing_users[0].jaas_prepend if existing_users else RestProxyUsers().jaas_prepend
+            for shard_name in manifest.shards:
+                shards[shard_name] = RestProxyUsers(jaas_prepend=prepend, is_modified=True)
+            for users in existing_users:
+                for k, v in users.fe_users.items():
+                    shards[manifest.shard_for(k)].fe_users[k] = v
+                for k, v in users.kafka_users.items():
+                    shards[manifest.shard_for(k)].kafka_users[k] = v
+
+        secrets_pending_tag_update: List[CSMSecret] = list()
+        rp_users_list = self._collect_rest_proxy_users(new_api_keys, secrets_with_rp_access)
+        for api_key, api_secret, secret in rp_users_list:
+            shard_name = manifest.shard_for(api_key)
+            if shard_name not in shards:
+                shards[shard_name] = self.__read_rest_proxy_shard(shard_name)
+            if shards[shard_name].upsert_user(api_key, api_secret) and secret:
+                secrets_pending_tag_update.append(secret)
+        # Pruning needs to look at every shard, not only the ones that own the added users.
+        if retained_api_keys is not None:
+            missing_shards = [v for v in manifest.shards if v not in shards]
+            shards.update(zip(missing_shards, self.__read_rest_proxy_shards(missing_shards)))
+            self._prune_rest_proxy_users(
+                rp_secret_name, list(shards.values()), retained_api_keys.union([v[0] for v in rp_users_list])
             )
-            if is_rp_secret_new:
-                env_details = self.ccloud_bundle.cc_environments.find_environment(rp_cluster_details.env_id)
-                secret_tags = self.__render_secret_tags(
-                    env_name=env_details.display_name,
-                    env_id=env_details.env_id,
-                    cluster_name=rp_cluster_details.cluster_name,
-                    cluster_id=rp_cluster_details.cluster_id,
-                    sa_name=rp_sa_details.name,
-                    sa_id=rp_sa_details.resource_id,
-                    rest_proxy_access=False,
-                    is_rest_proxy_user=True,
+
+        for shard_name, users in shards.items():
+            if not users.is_modified:
+                continue
+            LOGGER.debug("Writing REST Proxy users shard %s with %s user(s).", shard_name, len(users.fe_users))
+            shard_value, api_keys_count = users.render(), users.users_count()
+            if shard_name in self.secret:
+                self.__put_secret_value(shard_name, shard_value)
+                self.add_tags(secret_name=shard_name, tags=api_keys_count)
+            else:
+                secret_tags = self.__render_rest_proxy_secret_tags(
+                    rp_sa_details,
+                    rp_cluster_details,
+                    rest_proxy_shard_of=rp_secret_name,
                     api_keys_count=api_keys_count["api_keys_count"],
-                    # api_key=api_key.api_key,
                 )
-                self.__create_secret(rp_secret_name, rp_secret, self.__render_secret_tags_format(secret_tags))
-                self.add_to_cache(rp_secret_name, rp_secret, secret_tags)
-            else:
-                response = self.client_reference.put_secret_value(
-                    SecretId=rp_secret_name, SecretString=dumps(rp_secret)
+                self.__create_secret(shard_name, shard_value, self.__render_secret_tags_format(secret_tags))
+                self.add_to_cache(shard_name, None, secret_tags)
+        if current_manifest is not None:
+            for shard_name in set(current_manifest.shards).difference(manifest.shards):
+                LOGGER.info(
+                    "Deleting REST Proxy users shard %s as it is not part of the manifest anymore.", shard_name
                 )
-                self.add_tags(secret_name=rp_secret_name, tags=api_keys_count)
-                print(f"Secret Successfully updated. Response\n {response}")
-        for secret in itertools.chain(secrets_with_rp_access, secrets_pending_tag_update):
-            self.add_tags(secret_name=secret.secret_name, tags={"sync_needed_for_rp": "False"})
+                self.__delete_secret(shard_name, force=True)
+                self.secret.pop(shard_name, None)
+                self.__drop_secret_metadata(shard_name)
+                self._remove_secret_from_store(shard_name)
+
+        api_keys_count = add_users_counts(
+            [self.secret[v].api_keys_count if v in self.secret else "0--0" for v in manifest.shards]
+        )
+        if is_rp_secret_new:
+            secret_tags = self.__render_rest_proxy_secret_tags(
+                rp_sa_details, rp_cluster_details, rest_proxy_layout="sharded", api_keys_count=api_keys_count
+            )
+            self.__create_secret(rp_secret_name, manifest.render(), self.__render_secret_tags_format(secret_tags))
+            self.add_to_cache(rp_secret_name, None, secret_tags)
+        else:
+            if is_manifest_changed:
+                self.__put_secret_value(rp_secret_name, manifest.render())
+            if self.secret[rp_secret_name].api_keys_count != api_keys_count:
+                self.add_tags(secret_name=rp_secret_name, tags={"api_keys_count": api_keys_count})
+        return secrets_pending_tag_update
+
+    # The secret is scheduled for deletion with the default AWS recovery window, so it could still be restored.
+    def delete_secret(self, secret_name: str) -> bool:
+        try:
+            self.__delete_secret(secret_name)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise e
+        self._remove_secret_api_key_index(secret_name)
+        self.secret.pop(secret_name, None)
+        self.__drop_secret_metadata(secret_name)
+        self._remove_secret_from_store(secret_name)
+        return True
 
     def add_tags(self, secret_name: str, tags: Dict[str, str]):
         aws_tags = self.__render_secret_tags_format(tags=tags)
@@ -294,3 +797,7 @@ class AWSSecretsList(CSMSecretsManager):
             SecretId=secret_name,
             Tags=aws_tags,
         )
+        self._apply_tags_to_cache(secret_name, tags)
+        if secret_name in self.secret_metadata:
+            self.secret_metadata[secret_name]["tags"].update({v["Key"]: v["Value"] for v in aws_tags})
+            self.metadata_changes[secret_name] = self.secret_metadata[secret_name]
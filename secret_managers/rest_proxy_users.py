@@ -0,0 +1,175 @@
+import re
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+RP_FE_USERS_KEY = "basic.txt"
+RP_KAFKA_USERS_KEY = "restProxyUsers.jaas"
+RP_FE_USER_ROLE = "krp-users"
+RP_KAFKA_LOGIN_MODULE = "org.apache.kafka.common.security.plain.PlainLoginModule"
+RP_DEFAULT_JAAS_PREPEND = """KafkaRest {
+    org.eclipse.jetty.jaas.spi.PropertyFileLoginModule required
+    debug="true"
+    file="/mnt/secrets/5g-ndc-int-rp-users/basic.txt";
+};
+
+"""
+
+# The patterns are compiled once on import instead of being rebuilt for every JAAS entry.
+# Every Kafka user entry is the login module keyword followed by the quoted username and password.
+_KAFKA_USER_PATTERN = re.compile(
+    re.escape(RP_KAFKA_LOGIN_MODULE) + r'\s+required\s+[^"]*"(.*?)"[^"]*"(.*?)"',
+    re.DOTALL,
+)
+_KAFKA_CLIENT_PATTERN = re.compile(r"KafkaClient")
+
+
+def parse_fe_users(users_string: str) -> Dict[str, str]:
+    result = dict()
+    for item in users_string.splitlines():
+        if not item:
+            continue
+        secret, _, _ = item.partition("," + RP_FE_USER_ROLE)
+        key, _, value = secret.partition(":")
+        result[key.strip()] = value.strip()
+    return result
+
+
+def render_fe_user(api_key: str, api_secret: str, role: str = RP_FE_USER_ROLE) -> str:
+    return f"{api_key}: {api_secret},{role}"
+
+
+def render_fe_users(fe_users: Dict[str, str]) -> str:
+    return "\n".join(render_fe_user(k, v) for k, v in fe_users.items())
+
+
+# Splits the JAAS file into the data before the KafkaClient block (returned as is), the closing brace and
+# the username/password pairs for all the Kafka users inside the KafkaClient block.
+def parse_kafka_users(users_string: str) -> Tuple[str, str, Dict[str, str]]:
+    if not users_string:
+        return (RP_DEFAULT_JAAS_PREPEND + "KafkaClient {\n", "};\n", dict())
+    match = _KAFKA_CLIENT_PATTERN.search(users_string)
+    if not match:
+        return (users_string + "KafkaClient {\n", "};\n", dict())
+    prepend = users_string[: match.end()] + " {\n"
+    return_data = {m.group(1): m.group(2) for m in _KAFKA_USER_PATTERN.finditer(users_string, match.end())}
+    return prepend, "};\n", return_data
+
+
+def render_kafka_user(api_key: str, api_secret: str, key_type: str = RP_KAFKA_LOGIN_MODULE) -> str:
+    return f'  {key_type} required\n  username="{api_key}"\n  password="{api_secret}";\n\n'
+
+
+def render_kafka_users(prepend: str, postpend: str, kafka_users: Dict[str, str]) -> str:
+    return "".join((prepend, "".join(render_kafka_user(k, v) for k, v in kafka_users.items()), postpend))
+
+
+# In memory view of the REST Proxy users secret. Both the basic.txt and the JAAS payloads are parsed once into
+# insertion ordered maps, all the additions/updates are applied to the maps and the payloads are rendered once
+# at the end. This keeps adding N keys to a secret with M users at O(N + M) instead of re-parsing and
+# re-rendering the whole payload for every key.
+@dataclass
+class RestProxyUsers:
+    fe_users: Dict[str, str] = field(default_factory=dict)
+    kafka_users: Dict[str, str] = field(default_factory=dict)
+    jaas_prepend: str = field(default=RP_DEFAULT_JAAS_PREPEND + "KafkaClient {\n")
+    jaas_postpend: str = field(default="};\n")
+    fe_users_key: str = field(default=RP_FE_USERS_KEY)
+    kafka_users_key: str = field(default=RP_KAFKA_USERS_KEY)
+    is_modified: bool = field(default=False)
+
+    @classmethod
+    def parse(
+        cls,
+        secret_value: Dict[str, str],
+        fe_users_key: str = RP_FE_USERS_KEY,
+        kafka_users_key: str = RP_KAFKA_USERS_KEY,
+    ) -> "RestProxyUsers":
+        prepend, postpend, kafka_users = parse_kafka_users(secret_value.get(kafka_users_key, ""))
+        return cls(
+            fe_users=parse_fe_users(secret_value.get(fe_users_key, "")),
+            kafka_users=kafka_users,
+            jaas_prepend=prepend,
+            jaas_postpend=postpend,
+            fe_users_key=fe_users_key,
+            kafka_users_key=kafka_users_key,
+        )
+
+    # Adds or updates the user in both the payloads. Returns True if either of the payloads was changed.
+    def upsert_user(self, api_key: str, api_secret: str) -> bool:
+        is_updated = False
+        if self.fe_users.get(api_key, None) != api_secret:
+            self.fe_users[api_key] = api_secret
+            is_updated = True
+        if self.kafka_users.get(api_key, None) != api_secret:
+            self.kafka_users[api_key] = api_secret
+            is_updated = True
+        self.is_modified = self.is_modified or is_updated
+        return is_updated
+
+    def upsert_users(self, users: Iterable[Tuple[str, str]]) -> List[str]:
+        return [api_key for api_key, api_secret in users if self.upsert_user(api_key, api_secret)]
+
+    # Removes the user from both the payloads. Returns True if the user was present in either of them.
+    def remove_user(self, api_key: str) -> bool:
+        is_removed = self.fe_users.pop(api_key, None) is not None
+        is_removed = (self.kafka_users.pop(api_key, None) is not None) or is_removed
+        self.is_modified = self.is_modified or is_removed
+        return is_removed
+
+    def api_keys(self) -> List[str]:
+        return list(dict.fromkeys([*self.fe_users.keys(), *self.kafka_users.keys()]))
+
+    def render(self, secret_value: Dict[str, str] = None) -> Dict[str, str]:
+        output = dict(secret_value) if secret_value else dict()
+        output[self.fe_users_key] = render_fe_users(self.fe_users)
+        output[self.kafka_users_key] = render_kafka_users(self.jaas_prepend, self.jaas_postpend, self.kafka_users)
+        return output
+
+    def users_count(self) -> Dict[str, str]:
+        return {"api_keys_count": str(f"{len(self.fe_users)}--{len(self.kafka_users)}")}
+
+
+# Stable shard assignment for a REST Proxy user. crc32 is used instead of hash() as the string hash is
+# randomized per process and the assignment has to be the same across every run.
+def rp_shard_index(api_key: str, shard_count: int) -> int:
+    return zlib.crc32(api_key.encode("utf-8")) % shard_count
+
+
+def add_users_counts(counts: Iterable[str]) -> str:
+    fe_count, kafka_count = 0, 0
+    for item in counts:
+        fe, _, kafka = item.partition("--")
+        fe_count, kafka_count = fe_count + int(fe or 0), kafka_count + int(kafka or 0)
+    return str(f"{fe_count}--{kafka_count}")
+
+
+# The manifest secret for the sharded REST Proxy users layout. The manifest is stored under the usual REST Proxy
+# secret name and only lists the shard secrets; the users are spread across the shard secrets by a stable hash
+# of the API Key, so adding a user only rewrites the shard that owns it.
+@dataclass
+class RestProxyShardManifest:
+    shard_count: int
+    shards: List[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, secret_value: Dict[str, str]) -> "RestProxyShardManifest":
+        if secret_value and secret_value.get("layout", None) == "sharded":
+            return cls(shard_count=int(secret_value["shard_count"]), shards=list(secret_value["shards"]))
+        return None
+
+    @classmethod
+    def create(
+        cls, manifest_secret_name: str, rp_secret_name_postfix: str, separator: str, shard_count: int
+    ) -> "RestProxyShardManifest":
+        base_name = manifest_secret_name[: len(manifest_secret_name) - len(rp_secret_name_postfix)]
+        return cls(
+            shard_count=shard_count,
+            shards=[f"{base_name}shard-{i:03d}{separator}{rp_secret_name_postfix}" for i in range(shard_count)],
+        )
+
+    def shard_for(self, api_key: str) -> str:
+        return self.shards[rp_shard_index(api_key, self.shard_count)]
+
+    def render(self) -> Dict[str, str]:
+        return {"layout": "sharded", "shard_count": self.shard_count, "shards": self.shards}
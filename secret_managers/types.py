@@ -1,19 +1,23 @@
+import logging
 from dataclasses import dataclass
-import re
 from abc import ABC, abstractmethod
-from tokenize import String
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Set, Tuple
 
 from ccloud_managers.api_key_manager import CCloudAPIKey
 from ccloud_managers.clusters import CCloudCluster
 from ccloud_managers.service_account import CCloudServiceAccount
 import ccloud_managers.types as CCloudBundle
 import app_managers.core.types as CSMBundle
+from secret_managers.rest_proxy_users import RP_FE_USERS_KEY, RP_KAFKA_USERS_KEY, RestProxyUsers
+from secret_managers.value_cache import CSMSecretValueCache
+
+LOGGER = logging.getLogger(__name__)
 
 
 @dataclass(kw_only=True)
 class CSMSecret:
     secret_name: str
+    # The plaintext values are not kept on the secret objects; they live in the value cache of the secrets manager.
     secret_value: Dict[str, str]
     env_id: str
     sa_id: str
@@ -23,6 +27,10 @@ class CSMSecret:
     rp_access: bool
     sync_needed_for_rp: bool
     api_keys_count: str
+    # Name of the REST Proxy manifest secret if this secret is one of its shards.
+    rp_shard_of: str = ""
+    # Set from the is_rest_proxy_user tag for the secrets of Service Accounts that are REST Proxy users.
+    is_rp_user: bool = False
 
     def __post_init__(self) -> None:
         pass
@@ -32,12 +40,20 @@ class CSMSecretsManager(ABC):
     csm_bundle: CSMBundle.CSMYAMLConfigBundle
     ccloud_bundle: CCloudBundle.CCloudConfigBundle
     secret: Dict[str, CSMSecret]
+    # API Key ID -> Secret Name index, kept in sync with the secret cache by the implementations.
+    secret_api_keys: Dict[str, str]
+    value_cache: CSMSecretValueCache
 
     def __init__(
         self, csm_bundle: CSMBundle.CSMYAMLConfigBundle, ccloud_bundle: CCloudBundle.CCloudConfigBundle
     ) -> None:
         self.csm_bundle = csm_bundle
         self.ccloud_bundle = ccloud_bundle
+        self.secret_api_keys = {}
+        self.value_cache = CSMSecretValueCache(
+            max_entries=csm_bundle.csm_configs.secretstore.value_cache_max_entries,
+            ttl_secs=csm_bundle.csm_configs.secretstore.value_cache_ttl_secs,
+        )
 
     @abstractmethod
     def login(self):
@@ -55,6 +71,77 @@ class CSMSecretsManager(ABC):
     def add_tags(self, secret_name: str, tags: Dict[str, str]):
         pass
 
+    # Deletes the secret from the store and from the cache.
+    @abstractmethod
+    def delete_secret(self, secret_name: str) -> bool:
+        pass
+
+    # Keeps the cached secret in line with the tags written by add_tags, so that a long running process does not
+    # plan the same tag updates again on its next reconcile.
+    def _apply_tags_to_cache(self, secret_name: str, tags: Dict[str, str]) -> None:
+        secret = self.secret.get(secret_name, None)
+        if secret is None:
+            return
+        if "rest_proxy_access" in tags:
+            secret.rp_access = str(tags["rest_proxy_access"]) == "True"
+        if "sync_needed_for_rp" in tags and not secret.is_rp_user:
+            secret.sync_needed_for_rp = str(tags["sync_needed_for_rp"]) == "True"
+        if "api_keys_count" in tags:
+            secret.api_keys_count = str(tags["api_keys_count"])
+
+    # The secrets for the clusters and Service Accounts outside the run scope are not cached, so no task is generated
+    # for them. The REST Proxy secrets (and their shards) of the clusters in scope are kept for any Service Account.
+    def _is_secret_in_scope(self, secret_name: str, secret_tags: Dict[str, str]) -> bool:
+        scope = self.csm_bundle.csm_scope
+        cluster_id = secret_tags.get("cluster_id", None)
+        if scope.limits_clusters() and cluster_id not in self.ccloud_bundle.cc_clusters.cluster:
+            return False
+        rp_secret_name = self.csm_bundle.csm_configs.ccloud.rest_proxy_secret_name
+        if (rp_secret_name and secret_name.endswith(rp_secret_name)) or secret_tags.get("rest_proxy_shard_of", ""):
+            return True
+        return scope.includes_sa(secret_tags.get("sa_name", None))
+
+    # Secret names per Service Account ID for the provided Service Accounts, gathered in a single pass.
+    def find_secret_names_with_sa_ids(self, sa_ids: Iterable[str]) -> Dict[str, List[str]]:
+        output: Dict[str, List[str]] = {v: [] for v in sa_ids}
+        for item in self.secret.values():
+            if item.sa_id in output:
+                output[item.sa_id].append(item.secret_name)
+        return output
+
+    # Reads and decodes the secret value from the store. Returns None if the secret does not exist.
+    @abstractmethod
+    def _read_secret_value(self, secret_name: str) -> Dict[str, str]:
+        pass
+
+    # The value is loaded from the store on the first access and served from the value cache after that, until
+    # it is written, evicted or expired. A copy is returned so the callers cannot change the cached value.
+    def get_parsed_secret_value(self, secret_name: str) -> Dict[str, str]:
+        secret_value = self.value_cache.get(secret_name)
+        if secret_value is None:
+            secret_value = self._read_secret_value(secret_name)
+            if secret_value is None:
+                return None
+            self.value_cache.put(secret_name, secret_value)
+        return dict(secret_value)
+
+    # Drops the plaintext values of the provided secrets (or of all the secrets) once the work on them is done.
+    def evict_secret_values(self, secret_names: Iterable[str] = None) -> int:
+        return self.value_cache.evict(secret_names)
+
+    @abstractmethod
+    def refresh(self):
+        pass
+
+    # Writes the metadata of the cached secrets for the next runs, if the implementation keeps a snapshot.
+    def save_metadata_snapshot(self):
+        pass
+
+    # The API Keys of the provided ones that are confirmed to be in no secret, before they are deleted as not synced.
+    # The implementations that could have cached stale tags check the live tags of the secrets.
+    def confirm_api_keys_not_in_store(self, api_key_ids: List[str]) -> List[str]:
+        return api_key_ids
+
     @abstractmethod
     def find_secret(self, sa_name: str, cluster_id: str = None, **kwargs) -> List[CSMSecret]:
         pass
@@ -72,10 +159,51 @@ class CSMSecretsManager(ABC):
         new_api_keys: List[CCloudAPIKey],
         secrets_with_rp_access: List[CSMSecret],
         is_rp_secret_new: bool,
+        retained_api_keys: Set[str] = None,
         **kwargs,
     ):
         pass
 
+    @abstractmethod
+    def find_rest_proxy_users_to_prune(self, rp_secret_name: str, retained_api_keys: Set[str]) -> List[str]:
+        pass
+
+    def _add_secret_api_key_index(self, secret: CSMSecret) -> None:
+        if secret.api_key:
+            self.secret_api_keys[secret.api_key] = secret.secret_name
+
+    def _remove_secret_api_key_index(self, secret_name: str) -> None:
+        secret = self.secret.get(secret_name, None)
+        if secret and self.secret_api_keys.get(secret.api_key, None) == secret_name:
+            self.secret_api_keys.pop(secret.api_key, None)
+
+    # The inventory store (if enabled) keeps the secret metadata (never the values) next to the CCloud inventory.
+    def _replace_secret_store(self, secrets: Iterable[CSMSecret]) -> None:
+        if self.csm_bundle.inventory_store:
+            self.csm_bundle.inventory_store.replace("secrets", [self.__store_row(v) for v in secrets])
+
+    def _add_secret_to_store(self, secret: CSMSecret) -> None:
+        if self.csm_bundle.inventory_store:
+            self.csm_bundle.inventory_store.upsert("secrets", self.__store_row(secret))
+
+    def _remove_secret_from_store(self, secret_name: str) -> None:
+        if self.csm_bundle.inventory_store:
+            self.csm_bundle.inventory_store.delete("secrets", secret_name)
+
+    def __store_row(self, secret: CSMSecret) -> tuple:
+        return (
+            secret.secret_name,
+            secret.env_id,
+            secret.sa_id,
+            secret.sa_name,
+            secret.cluster_id,
+            secret.api_key,
+            secret.rp_shard_of,
+        )
+
+    def is_api_key_in_store(self, api_key: str) -> bool:
+        return api_key in self.secret_api_keys
+
     def _create_secret_name_string(
         self,
         secret_name_prefix: str,
@@ -95,20 +223,18 @@ class CSMSecretsManager(ABC):
 
     # This method will list all the newly created API Keys that have been flagged as needed REST Proxy access
     def _get_new_rest_proxy_api_keys(self) -> List[CCloudAPIKey]:
-        sa_names = [v for v in self.csm_bundle.csm_definitions.sa if v.rp_access]
+        sa_names = [v for v in self.csm_bundle.csm_definitions.sa.values() if v.rp_access]
         sa_id: List[str] = []
         for item in sa_names:
             sa_details = self.ccloud_bundle.cc_service_accounts.find_sa(sa_name=item.name)
             if sa_details:
                 sa_id.append(sa_details.resource_id)
-        api_key_details = [
-            v for v in self.ccloud_bundle.cc_api_keys.api_keys.values() if v.owner_id in sa_id and v.api_secret
-        ]
+        api_key_details = [v for v in self.ccloud_bundle.cc_api_keys.find_keys_with_sa_ids(sa_id) if v.api_secret]
         return api_key_details
 
     # This method locates the actual REST proxy Service Accounts, they are necessary
     def _get_rest_proxy_users(self) -> List[CCloudAPIKey]:
-        sa_names = [v for v in self.csm_bundle.csm_definitions.sa if v.is_rp_user]
+        sa_names = [v for v in self.csm_bundle.csm_definitions.sa.values() if v.is_rp_user]
         api_key_details = [
             v for v in self.ccloud_bundle.cc_api_keys.api_keys.values() if v.owner_id in sa_names and v.api_secret
         ]
@@ -127,111 +253,28 @@ class CSMSecretsManager(ABC):
         )
         return (rp_secret_name, sa_details, cluster_details)
 
-    def _render_rp_fe_user_string(self, api_key: str, api_secret: str, postfix: str) -> String:
-        return f"{api_key}: {api_secret},{postfix}"
-
-    def _read_rp_fe_users(self, users_string: str) -> Dict[str, str]:
-        output = [v for v in users_string.splitlines() if v]
-        result = dict()
-        for i, item in enumerate(output):
-            secret, _, _ = item.partition(",krp-users")
-            key, _, value = secret.partition(":")
-            key, value = key.strip(), value.strip()
-            result[key] = value
-        return result
-
-    def _add_front_end_user_to_rp_secret_string(
-        self, secret_name: str, curr_secret_string: str, new_api_key: str, new_api_secret: str
-    ) -> Tuple[bool, str]:
-        basic_users = self._read_rp_fe_users(curr_secret_string)
-        no_update_required, found_update_required = False, False
-        # Determine what needs to be done -- Add, Update or Skip adding the new key.
-        for key, secret in basic_users.items():
-            if new_api_key == key and new_api_secret == secret:
-                no_update_required = True
-                break
-            if new_api_key == key and new_api_secret != secret:
-                basic_users[key] = self._render_rp_fe_user_string(new_api_key, new_api_secret, "krp-users")
-                found_update_required = True
-        # If no update is required return the same string and pass back the modified parameter as False.
-        if no_update_required:
-            print(f"Found the API Key in 'basic.txt' key in {secret_name} secret")
-            return (False, curr_secret_string)
-        elif found_update_required:
-            print("API Key located but the secret value was different.")
-            output_string = "\n".join(
-                self._render_rp_fe_user_string(k, v, "krp-users") for k, v in basic_users.items()
+    # Lists the (api_key, api_secret, secret) entries that need to be present in the REST Proxy users secret.
+    # The secret is the Secret Store entry holding the API Key (if any) whose tags need an update after the sync.
+    def _collect_rest_proxy_users(
+        self, new_api_keys: List[CCloudAPIKey], secrets_with_rp_access: List[CSMSecret]
+    ) -> List[Tuple[str, str, CSMSecret]]:
+        output = []
+        for api_key in new_api_keys:
+            output.append(
+                (
+                    api_key.api_key,
+                    api_key.api_secret,
+                    self.secret.get(self.secret_api_keys.get(api_key.api_key, ""), None),
+                )
             )
-            return (True, output_string)
-        else:
-            print("API Key not found in the secret. Updating the secret now.")
-            basic_users[new_api_key] = new_api_secret
-            output_string = "\n".join(
-                self._render_rp_fe_user_string(k, v, "krp-users") for k, v in basic_users.items()
-            )
-            return (True, output_string)
-
-    def _read_rp_kafka_users(self, users_string: str) -> Tuple[str, str, Dict[str, str]]:
-        # Partition the data before and after the KafkaClient keyword.
-        # Any data before this keyword will not be edited and returned as is.
-        prepend, kclient, data = users_string.partition("KafkaClient")
-        if not users_string:
-            prepend = """KafkaRest {
-    org.eclipse.jetty.jaas.spi.PropertyFileLoginModule required
-    debug="true"
-    file="/mnt/secrets/5g-ndc-int-rp-users/basic.txt";
-};
-
-"""
-            kclient = "KafkaClient"
-        # Now split all the usernames/passwords to a list for ease of parsing.
-        # The first item is the bracket right before the first pair start and hence is ignored.
-        data = data.split("org.apache.kafka.common.security.plain.PlainLoginModule required")[1:]
-        return_data = {}
-        # Find all the usernames and password using quote based regex.
-        # Anything inside quotes will be regarded as a value.
-        for item in data:
-            pair = re.findall(r'"(.*?)"', item)
-            return_data[pair[0]] = pair[1]
-            # return_data.append({"username": pair[0], "password": pair[1]})
-        # Change the prepend to whatever was ignored or stripped while formatting data.
-        prepend = str(prepend + kclient + " {\n")
-        # The closing braces that will be required after all the username/passwords are added.
-        postpend = "};\n"
-        return prepend, postpend, return_data
-
-    def _render_rp_kafka_user_string(
-        self, api_key: str, api_secret: str, key_type: str = "org.apache.kafka.common.security.plain.PlainLoginModule"
-    ) -> String:
-        return f'  {key_type} required\n  username="{api_key}"\n  password="{api_secret}";\n\n'
-
-    def _add_kafka_users_to_rp_secret_string(
-        self, secret_name: str, curr_secret_string: str, new_api_key: str, new_api_secret: str
-    ) -> Tuple[bool, str]:
-        prepend, postpend, jaas_users = self._read_rp_kafka_users(curr_secret_string)
-        no_update_required, found_update_required = False, False
-        for key, value in jaas_users.items():
-            if key == new_api_key and value == new_api_secret:
-                no_update_required = True
-                break
-            if key == new_api_key and value != new_api_secret:
-                jaas_users[key] = new_api_secret
-                found_update_required = True
-        if no_update_required:
-            print(f"Found the API Key in 'restProxyUsers.jaas' key in {secret_name} secret")
-            return (False, curr_secret_string)
-        elif found_update_required:
-            print("API Key located but the secret value was different.")
-            in_string = "".join(self._render_rp_kafka_user_string(k, v) for k, v in jaas_users.items())
-            output_string = "".join((prepend, in_string, postpend))
-            return (True, output_string)
-        else:
-            print("API Key not found in the secret. Updating the secret now.")
-            jaas_users[new_api_key] = new_api_secret
-            in_string = "".join(self._render_rp_kafka_user_string(k, v) for k, v in jaas_users.items())
-            output_string = "".join((prepend, in_string, postpend))
-            return (True, output_string)
+        for secret in secrets_with_rp_access:
+            secret_value = self.get_parsed_secret_value(secret_name=secret.secret_name)
+            output.append((secret_value["username"], secret_value["password"], secret))
+        return output
 
+    # Merges all the new API Keys and the secrets with REST Proxy access into the REST Proxy users secret in a
+    # single pass. Both the payloads are parsed once, every add/update is applied to the parsed maps and the
+    # payloads are only rendered again if anything actually changed.
     def _add_users_to_rest_proxy_secret_string(
         self,
         rp_secret_name: str,
@@ -239,64 +282,52 @@ class CSMSecretsManager(ABC):
         new_api_keys: List[CCloudAPIKey],
         secrets_with_rp_access: List[CSMSecret],
         is_rp_secret_new: bool,
-        fe_users_key: str = "basic.txt",
-        kafka_users_key: str = "restProxyUsers.jaas",
+        fe_users_key: str = RP_FE_USERS_KEY,
+        kafka_users_key: str = RP_KAFKA_USERS_KEY,
+        retained_api_keys: Set[str] = None,
     ) -> Tuple[bool, Dict[str, str], List[CSMSecret]]:
-        current_fe_users = self._read_rp_fe_users(users_string=rp_secret_value.get(fe_users_key, ""))
-        _, _, current_k_users = self._read_rp_kafka_users(users_string=rp_secret_value.get(kafka_users_key, ""))
+        rp_users = RestProxyUsers.parse(rp_secret_value, fe_users_key=fe_users_key, kafka_users_key=kafka_users_key)
         secrets_pending_tag_update: List[CSMSecret] = list()
-        update_triggered = False
+        updated_users_count = 0
+        rp_users_list = self._collect_rest_proxy_users(new_api_keys, secrets_with_rp_access)
 
-        for api_key in [v for v in new_api_keys if v.api_key not in current_fe_users.keys()]:
-            is_fe_updated, rp_secret_value[fe_users_key] = self._add_front_end_user_to_rp_secret_string(
-                rp_secret_name, rp_secret_value.get(fe_users_key, ""), api_key.api_key, api_key.api_secret
+        for api_key, api_secret, secret in rp_users_list:
+            if rp_users.upsert_user(api_key, api_secret):
+                updated_users_count += 1
+                if secret:
+                    secrets_pending_tag_update.append(secret)
+        if retained_api_keys is not None:
+            self._prune_rest_proxy_users(
+                rp_secret_name, [rp_users], retained_api_keys.union([v[0] for v in rp_users_list])
             )
-            if is_fe_updated:
-                update_triggered = True
-                secret_name = [v for v in self.secret.values() if v.api_key == api_key.api_key]
-                secrets_pending_tag_update.append(secret_name)
-        for api_key in [v for v in new_api_keys if v.api_key not in current_k_users.keys()]:
-            is_ku_updated, rp_secret_value[kafka_users_key] = self._add_kafka_users_to_rp_secret_string(
-                rp_secret_name, rp_secret_value.get(kafka_users_key, ""), api_key.api_key, api_key.api_secret
-            )
-            if is_ku_updated:
-                update_triggered = True
-                secret_name = [v for v in self.secret.values() if v.api_key == api_key.api_key]
-                secrets_pending_tag_update.append(secret_name)
-        for secret in [v for v in secrets_with_rp_access if v.api_key not in current_fe_users.keys()]:
-            if not secret.secret_value:
-                secret.secret_value = self.get_parsed_secret_value(secret_name=secret.secret_name)
-            is_fe_updated, rp_secret_value[fe_users_key] = self._add_front_end_user_to_rp_secret_string(
-                secret_name=rp_secret_name,
-                curr_secret_string=rp_secret_value.get(fe_users_key, ""),
-                new_api_key=secret.secret_value["username"],
-                new_api_secret=secret.secret_value["password"],
-            )
-            if is_fe_updated:
-                update_triggered = True
-                secrets_pending_tag_update.append(secret)
-        for secret in [v for v in secrets_with_rp_access if v.api_key not in current_k_users.keys()]:
-            if not secret.secret_value:
-                secret.secret_value = self.get_parsed_secret_value(secret_name=secret.secret_name)
-            is_ku_updated, rp_secret_value[kafka_users_key] = self._add_kafka_users_to_rp_secret_string(
-                secret_name=rp_secret_name,
-                curr_secret_string=rp_secret_value.get(kafka_users_key, ""),
-                new_api_key=secret.secret_value["username"],
-                new_api_secret=secret.secret_value["password"],
-            )
-            if is_ku_updated:
-                update_triggered = True
-                secrets_pending_tag_update.append(secret)
 
-        return (update_triggered, rp_secret_value, secrets_pending_tag_update)
+        if rp_users.is_modified:
+            LOGGER.debug("Updating %s with %s new or changed REST Proxy user(s).", rp_secret_name, updated_users_count)
+            rp_secret_value = rp_users.render(rp_secret_value)
+        else:
+            LOGGER.debug("All the REST Proxy users are already present in the %s secret.", rp_secret_name)
+        return (rp_users.is_modified, rp_secret_value, secrets_pending_tag_update)
+
+    # Removes the users that are not part of the retained API Keys from the parsed REST Proxy payloads.
+    # The removed API Keys are returned so that they can be listed for the dry run as well.
+    def _prune_rest_proxy_users(
+        self, rp_secret_name: str, rp_users_list: List[RestProxyUsers], retained_api_keys: Set[str]
+    ) -> List[str]:
+        output = []
+        for rp_users in rp_users_list:
+            for api_key in [v for v in rp_users.api_keys() if v not in retained_api_keys]:
+                rp_users.remove_user(api_key)
+                output.append(api_key)
+        if output:
+            LOGGER.info("Pruning %s REST Proxy user(s) from %s: %s", len(output), rp_secret_name, ', '.join(output))
+        return output
 
     def _get_rp_users_count(
         self,
         secret_value: Dict[str, str],
-        fe_users_key: str = "basic.txt",
-        kafka_users_key: str = "restProxyUsers.jaas",
+        fe_users_key: str = RP_FE_USERS_KEY,
+        kafka_users_key: str = RP_KAFKA_USERS_KEY,
     ) -> Dict[str, str]:
-        fe_user_count = len(self._read_rp_fe_users(users_string=secret_value.get(fe_users_key, "")))
-        _, _, kafka_users = self._read_rp_kafka_users(users_string=secret_value.get(kafka_users_key, ""))
-        kafka_users_count = len(kafka_users)
-        return {"api_keys_count": str(f"{fe_user_count}--{kafka_users_count}")}
+        return RestProxyUsers.parse(
+            secret_value, fe_users_key=fe_users_key, kafka_users_key=kafka_users_key
+        ).users_count()
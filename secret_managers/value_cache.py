@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Tuple
+
+
+# Bounded LRU cache for the decoded secret values. An entry is dropped once it is older than the TTL or when it is
+# the least recently used entry and the cache is full, so the plaintext values held by a long running process stay
+# bounded. The cache is shared by the worker threads that read the secrets concurrently.
+@dataclass
+class CSMSecretValueCache:
+    max_entries: int = 256
+    ttl_secs: float = 300
+    entries: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = field(default_factory=OrderedDict, repr=False)
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self, secret_name: str) -> Dict[str, str]:
+        with self.lock:
+            entry = self.entries.get(secret_name, None)
+            if entry and time.monotonic() - entry[0] < self.ttl_secs:
+                self.entries.move_to_end(secret_name)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.entries[secret_name]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, secret_name: str, secret_value: Dict[str, str]):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[secret_name] = (time.monotonic(), secret_value)
+            self.entries.move_to_end(secret_name)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, secret_name: str):
+        with self.lock:
+            self.entries.pop(secret_name, None)
+
+    # Drops the provided entries, or every entry if no names are provided.
+    def evict(self, secret_names: Iterable[str] = None) -> int:
+        with self.lock:
+            if secret_names is None:
+                names = list(self.entries.keys())
+            else:
+                names = [v for v in secret_names if v in self.entries]
+            for item in names:
+                del self.entries[item]
+            self.evictions += len(names)
+            return len(names)
+
+    def stats(self) -> str:
+        return (
+            f"{len(self.entries)} cached, {self.hits} hit(s), {self.misses} miss(es), {self.evictions} eviction(s)"
+        )